@@ -0,0 +1,71 @@
+"""Synthetic models and objects for the benchmarks (runs offline)."""
+from pathlib import Path
+
+import numpy as np
+
+# the architecture of the "tiny" model of the benchmark suite: a small
+# unet st. the timings show the overhead around the network, and it runs
+# in seconds on a CPU
+TINY_CONFIG = dict(
+    unet_n_depth=2, unet_n_filter_base=8, net_conv_after_unet=32
+)
+
+
+def create_model(basedir, n_control_points=8, **config_kwargs):
+    """create a randomly initialized splinedist model
+
+    Args:
+        basedir (str|Path): the directory the model directory is created in
+        n_control_points (int, optional): the number of control points
+        **config_kwargs: passed to `Config2D` (the default architecture
+            when not given, see `TINY_CONFIG` for a small one)
+
+    Returns:
+        Path: the model directory
+    """
+    from splinedist.models import Config2D, SplineDist2D
+    from splinedist.utils import phi_generator
+
+    name = f"random_{n_control_points}"
+    conf = Config2D(
+        n_params=2 * n_control_points, grid=(2, 2), **config_kwargs
+    )
+    model_path = Path(basedir) / name
+    model_path.mkdir()
+    phi_generator(n_control_points, conf.contoursize_max, str(model_path))
+    model = SplineDist2D(conf, name=name, basedir=str(basedir))
+    model.keras_model.save_weights(str(model_path / "weights_best.h5"))
+    return model_path
+
+
+def n_objects(shape, density):
+    """the number of objects for a density in objects per 100x100 pixels"""
+    return int(round(density * np.prod(shape) / 1e4))
+
+
+def object_coefs(n_objects, shape, n_control_points=8, seed=0):
+    """spline coefficients of random star shaped objects
+
+    Returns:
+        np.ndarray: the (N, 2, M) coefficients (as splinedist returns them)
+    """
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_control_points, endpoint=False)
+    centers = rng.uniform(0, 1, (n_objects, 2, 1)) * np.reshape(shape, (2, 1))
+    radii = rng.uniform(3, 8, (n_objects, 1, n_control_points))
+    directions = np.stack([np.sin(angles), np.cos(angles)])
+    return (centers + radii * directions).astype("float32")
+
+
+def blob_image(shape, n_objects, seed=0):
+    """a uint8 image with bright gaussian blobs on a noisy background"""
+    rng = np.random.default_rng(seed)
+    image = rng.normal(20, 5, shape)
+    yy, xx = np.ogrid[0 : shape[0], 0 : shape[1]]
+    for y, x in rng.uniform((0, 0), shape, (n_objects, 2)):
+        y0, y1 = int(max(y - 16, 0)), int(min(y + 16, shape[0]))
+        x0, x1 = int(max(x - 16, 0)), int(min(x + 16, shape[1]))
+        image[y0:y1, x0:x1] += 200 * np.exp(
+            -((yy[y0:y1] - y) ** 2 + (xx[:, x0:x1] - x) ** 2) / 32
+        )
+    return np.clip(image, 0, 255).astype("uint8")
@@ -0,0 +1,79 @@
+"""Throughput of batched prediction for different batch sizes.
+
+A randomly initialized splinedist model (with the default architecture)
+is created in a temporary directory, st. this runs offline. Usage:
+
+    python benchmarks/batch_size.py --image-size 256 --n-images 64
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+from _synthetic import create_model
+
+
+def _images(n_images, image_size, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        rng.integers(0, 255, size=(image_size, image_size), dtype="uint8")
+        for _ in range(n_images)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument("--n-images", type=int, default=64)
+    parser.add_argument(
+        "--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+    )
+    args = parser.parse_args()
+
+    from napari_splinedist.config.config import ModelModel
+    from napari_splinedist.model.predict import (
+        build_model,
+        predict,
+        predict_batched,
+    )
+
+    parameters = dict(
+        normalize_image=True,
+        percentile_low=1.0,
+        percentile_high=99.8,
+        invert_image=False,
+        # a high threshold st. the timing is dominated by the network
+        prob_thresh=0.99,
+        nms_thresh=0.5,
+        model_meta=ModelModel(name="random", in_channels=1, sources=[]),
+    )
+    images = _images(args.n_images, args.image_size)
+
+    with tempfile.TemporaryDirectory() as basedir:
+        model_path = create_model(basedir)
+        parameters["model_path"] = model_path
+
+        # warm up
+        build_model(model_path)
+        predict_batched(images[0:2], batch_size=2, **parameters)
+
+        t0 = time.perf_counter()
+        for image in images:
+            predict(image, **parameters)
+        reference = time.perf_counter() - t0
+        print(
+            f"predict (one by one): {args.n_images / reference:8.2f} images/s"
+        )
+
+        for batch_size in args.batch_sizes:
+            t0 = time.perf_counter()
+            predict_batched(images, batch_size=batch_size, **parameters)
+            duration = time.perf_counter() - t0
+            print(
+                f"{batch_size=:4d}: {args.n_images / duration:8.2f} images/s"
+                f" (speedup {reference / duration:.2f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
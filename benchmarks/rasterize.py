@@ -0,0 +1,67 @@
+"""Speed of the spline-to-labels rasterizer compared to `to_labels`.
+
+Random star shaped contours (like the interpolated splines of splinedist
+results) are rasterized with the `to_labels` of splineit's
+interpolated layer and with `napari_splinedist.utils.rasterize`. Usage:
+
+    python benchmarks/rasterize.py --image-size 2048 --n-objects 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+
+def _polygons(n_objects, image_size, n_vertices=64, seed=0):
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    polygons = []
+    for _ in range(n_objects):
+        center = rng.uniform(0, image_size, 2)
+        radii = rng.uniform(6, 12) * (1 + 0.2 * np.sin(3 * angles))
+        polygons.append(
+            center
+            + np.stack([radii * np.sin(angles), radii * np.cos(angles)], 1)
+        )
+    return polygons
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-size", type=int, default=2048)
+    parser.add_argument("--n-objects", type=int, nargs="+", default=[500])
+    parser.add_argument(
+        "--skip-to-labels",
+        action="store_true",
+        help="only time the fast rasterizer (to_labels takes minutes "
+        "for many objects)",
+    )
+    args = parser.parse_args()
+
+    from napari_splineit.layer._interpolated_layer import InterpolatedLayer
+
+    from napari_splinedist.utils.rasterize import labels_from_shapes
+
+    shape = (args.image_size, args.image_size)
+    for n_objects in args.n_objects:
+        polygons = _polygons(n_objects, args.image_size)
+        layer = InterpolatedLayer(polygons, shape_type="polygon", ndim=2)
+
+        t0 = time.perf_counter()
+        labels = labels_from_shapes(layer, shape)
+        fast = time.perf_counter() - t0
+        print(f"{n_objects=:6d} rasterize: {fast:8.3f} s")
+
+        if not args.skip_to_labels:
+            t0 = time.perf_counter()
+            expected = layer.to_labels(labels_shape=shape)
+            reference = time.perf_counter() - t0
+            assert np.array_equal(labels, expected)
+            print(
+                f"{n_objects=:6d} to_labels: {reference:8.3f} s"
+                f" (speedup {reference / fast:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
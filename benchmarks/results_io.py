@@ -0,0 +1,116 @@
+"""Saving and loading results as json/png compared to the `.npz` container.
+
+Random star shaped objects are rasterized and the labels and control
+points are written / read with `write_splineit` plus a png (a tif for
+more than 65535 objects) and with `napari_splinedist.utils.results_io`.
+Usage:
+
+    python benchmarks/results_io.py --image-size 4096 --n-objects 1000 100000
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _polygons(n_objects, image_size, n_vertices=8, seed=0):
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    centers = rng.uniform(0, image_size, (n_objects, 1, 2))
+    radii = rng.uniform(3, 8, (n_objects, n_vertices, 1))
+    return list(
+        centers + radii * np.stack([np.sin(angles), np.cos(angles)], -1)
+    )
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--image-size", type=int, default=4096)
+    parser.add_argument(
+        "--n-objects", type=int, nargs="+", default=[1000, 100000]
+    )
+    args = parser.parse_args()
+
+    from skimage import io as skimage_io
+
+    from napari_splinedist.utils.rasterize import rasterize_polygons
+    from napari_splinedist.utils.results_io import (
+        labels_image_path,
+        max_label,
+        read_results,
+        write_labels_image,
+        write_results,
+    )
+    from napari_splinedist.utils.splineit_io import write_splineit
+
+    shape = (args.image_size, args.image_size)
+    for n_objects in args.n_objects:
+        data = _polygons(n_objects, args.image_size)
+        labels = rasterize_polygons(data, shape)
+        z_index = np.arange(n_objects)
+        colors = np.tile([1.0, 0.0, 0.0, 1.0], (n_objects, 1))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            png = labels_image_path(tmp / "labels.png", max_label(labels))
+
+            def write_json():
+                write_splineit(
+                    tmp / "results.splineit",
+                    data,
+                    z_index=z_index,
+                    edge_color=colors,
+                    face_color=colors,
+                )
+                write_labels_image(png, labels)
+
+            def read_json():
+                with open(tmp / "results.splineit") as f:
+                    splines = json.load(f)
+                return [np.array(p) for p in splines["data"]], (
+                    skimage_io.imread(png)
+                )
+
+            def write_npz():
+                write_results(
+                    tmp / "results.npz",
+                    labels=labels,
+                    data=data,
+                    z_index=z_index,
+                    edge_color=colors,
+                    face_color=colors,
+                )
+
+            json_write, _ = _timed(write_json)
+            json_read, _ = _timed(read_json)
+            npz_write, _ = _timed(write_npz)
+            npz_read, results = _timed(
+                lambda: read_results(tmp / "results.npz")
+            )
+            assert np.array_equal(results["labels"], labels)
+
+            json_size = (tmp / "results.splineit").stat().st_size
+            json_size += png.stat().st_size
+            npz_size = (tmp / "results.npz").stat().st_size
+
+        print(
+            f"{n_objects=:7d} json+{png.suffix[1:]}: write {json_write:7.3f} s"
+            f" read {json_read:7.3f} s {json_size / 2**20:8.2f} MB"
+        )
+        print(
+            f"{n_objects=:7d} npz:      write {npz_write:7.3f} s"
+            f" read {npz_read:7.3f} s {npz_size / 2**20:8.2f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
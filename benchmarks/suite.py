@@ -0,0 +1,233 @@
+"""Timings of the prediction pipeline with a tiny synthetic model.
+
+Each stage (preprocessing, the end to end `predict`, `transform_results`,
+`make_colormap`, label rasterization and saving as splineit json plus a
+png) is timed over a grid of image sizes, tile counts and object
+densities (objects per 100x100 pixels). The model is a tiny randomly
+initialized splinedist model created in a temporary directory and the
+objects are synthetic, st. this runs offline on a CPU. Usage:
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --quick --json timings.json
+    python benchmarks/suite.py --stages predict --n-tiles 1 2 4 8
+
+Every case runs once untimed (keras traces the network for each new
+shape) and then `--repeat` times, the best and the median are reported
+(in ms, the json holds seconds).
+With `--json` the timings are written to a file, eg to compare commits.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from _synthetic import (
+    TINY_CONFIG,
+    blob_image,
+    create_model,
+    n_objects,
+    object_coefs,
+)
+
+STAGES = (
+    "preprocess",
+    "predict",
+    "transform_results",
+    "make_colormap",
+    "rasterize",
+    "save",
+)
+
+# the grid of `--quick` (eg for CI)
+QUICK = dict(image_sizes=[128, 256], n_tiles=[1, 2], densities=[1, 10])
+
+
+def _preprocess_cases(args, context):
+    from napari_splinedist.model.preprocess import preprocess
+
+    for size in args.image_sizes:
+        image = blob_image((size, size), n_objects((size, size), 1))
+        for mode in ("exact", "fast"):
+            yield dict(size=size, mode=mode), lambda: preprocess(
+                image,
+                model_in_channels=1,
+                normalize_image=True,
+                percentile_low=1.0,
+                percentile_high=99.8,
+                invert_image=False,
+                normalize_mode=mode,
+            )
+
+
+def _predict_cases(args, context):
+    from napari_splinedist.config.config import ModelModel
+    from napari_splinedist.model.predict import predict
+
+    for size in args.image_sizes:
+        image = blob_image((size, size), n_objects((size, size), 1))
+        for tiles in args.n_tiles:
+            yield dict(size=size, n_tiles=tiles), lambda: predict(
+                image,
+                model_path=context["model_path"],
+                normalize_image=True,
+                percentile_low=1.0,
+                percentile_high=99.8,
+                invert_image=False,
+                prob_thresh=args.prob_thresh,
+                nms_thresh=0.5,
+                model_meta=ModelModel(name="tiny", in_channels=1, sources=[]),
+                n_tiles=(tiles, tiles),
+            )
+
+
+def _objects(args):
+    # the labels and the details (as `predict` returns them) and the
+    # control points of synthetic objects for each size and density
+    from napari_splinedist.utils.rasterize import rasterize_polygons
+    from napari_splinedist.utils.splines import knots_from_coefs_batched
+
+    for size in args.image_sizes:
+        shape = (size, size)
+        for density in args.densities:
+            coefs = object_coefs(n_objects(shape, density), shape)
+            polygons = list(knots_from_coefs_batched(coefs))
+            labels = rasterize_polygons(polygons, shape, dtype="int32")
+            yield dict(size=size, density=density), (
+                labels,
+                dict(coord=coefs),
+                polygons,
+            )
+
+
+def _transform_results_cases(args, context):
+    from napari_splinedist.model.results import transform_results
+
+    for params, (labels, details, _) in _objects(args):
+        yield params, lambda: transform_results(labels, details)
+
+
+def _make_colormap_cases(args, context):
+    from napari_splinedist.utils.colormap import make_colormap
+
+    for params, (_, _, polygons) in _objects(args):
+        yield params, lambda: make_colormap(len(polygons))
+
+
+def _rasterize_cases(args, context):
+    from napari_splinedist.utils.rasterize import rasterize_polygons
+
+    for params, (labels, _, polygons) in _objects(args):
+        yield params, lambda: rasterize_polygons(polygons, labels.shape)
+
+
+def _save_cases(args, context):
+    from napari_splinedist.utils.results_io import (
+        labels_image_path,
+        max_label,
+        write_labels_image,
+    )
+    from napari_splinedist.utils.splineit_io import write_splineit
+
+    tmp = context["tmp"]
+    for params, (labels, _, polygons) in _objects(args):
+        png = labels_image_path(tmp / "labels.png", max_label(labels))
+        colors = np.tile([1.0, 0.0, 0.0, 1.0], (len(polygons), 1))
+
+        def save():
+            write_splineit(
+                tmp / "results.splineit",
+                polygons,
+                z_index=list(range(len(polygons))),
+                edge_color=colors,
+                face_color=colors,
+            )
+            write_labels_image(png, labels)
+
+        yield params, save
+
+
+def _timings(fn, repeat):
+    # the untimed first run
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--stages", nargs="+", choices=STAGES, default=list(STAGES)
+    )
+    parser.add_argument(
+        "--image-sizes", type=int, nargs="+", default=[256, 512, 1024]
+    )
+    parser.add_argument("--n-tiles", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--densities",
+        type=float,
+        nargs="+",
+        default=[1, 10, 30],
+        help="objects per 100x100 pixels",
+    )
+    parser.add_argument(
+        "--prob-thresh",
+        type=float,
+        default=0.99,
+        help="the random model finds objects everywhere, a high "
+        "threshold keeps the non-maximum suppression bounded",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--quick", action="store_true", help=f"use the grid {QUICK}"
+    )
+    parser.add_argument("--json", type=Path, help="write the timings here")
+    args = parser.parse_args()
+    if args.quick:
+        for key, value in QUICK.items():
+            setattr(args, key, value)
+
+    cases = dict(
+        preprocess=_preprocess_cases,
+        predict=_predict_cases,
+        transform_results=_transform_results_cases,
+        make_colormap=_make_colormap_cases,
+        rasterize=_rasterize_cases,
+        save=_save_cases,
+    )
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        context = dict(tmp=Path(tmp))
+        if "predict" in args.stages:
+            context["model_path"] = create_model(tmp, **TINY_CONFIG)
+
+        for stage in args.stages:
+            for params, fn in cases[stage](args, context):
+                times = _timings(fn, args.repeat)
+                timings.append(
+                    dict(
+                        stage=stage,
+                        params=params,
+                        best=min(times),
+                        median=float(np.median(times)),
+                    )
+                )
+                description = " ".join(f"{k}={v}" for k, v in params.items())
+                print(
+                    f"{stage:18s} {description:28s}"
+                    f" best {1000 * min(times):10.2f} ms"
+                    f" median {1000 * np.median(times):10.2f} ms"
+                )
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(timings, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
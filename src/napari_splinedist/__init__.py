@@ -1,9 +1,24 @@
 __version__ = "0.0.1"
 from ._sample_data import sample_data_bbbc038, sample_data_conic
-from ._widget import SplineDistWidget
 
 __all__ = (
     "sample_data_conic",
     "sample_data_bbbc038",
     "SplineDistWidget",
+    "run_batch",
 )
+
+
+def __getattr__(name):
+    # the widget pulls in napari and Qt. We only import it
+    # on first access st. the headless api (ie `run_batch`)
+    # can be used without napari / Qt
+    if name == "SplineDistWidget":
+        from ._widget import SplineDistWidget
+
+        return SplineDistWidget
+    elif name == "run_batch":
+        from .model.batch import run_batch
+
+        return run_batch
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
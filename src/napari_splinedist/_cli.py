@@ -0,0 +1,274 @@
+import argparse
+import sys
+
+from ._logging import logger
+from .model.batch import DEFAULT_PARAMETERS, OUTPUT_FORMATS, run_batch
+from .model.resolve import DEFAULT_PREFETCH_WORKERS, prefetch_models
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(
+        prog="napari-splinedist-predict",
+        description="run splinedist on many images without napari",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="input images: directories, glob patterns or files",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", required=True, help="where to write the results"
+    )
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=OUTPUT_FORMATS,
+        default="splineit",
+        help="png labels plus .splineit json (default), or both "
+        "in one compressed .npz",
+    )
+
+    model = parser.add_argument_group("model")
+    model.add_argument(
+        "--model",
+        dest="model_name",
+        help="name of a model from the config (ie `bbbc038` or `conic`)",
+    )
+    model.add_argument(
+        "--n-control-points",
+        type=int,
+        default=None,
+        help="number of control points of the model",
+    )
+    model.add_argument(
+        "--model-path",
+        default=None,
+        help="directory of a model (instead of --model)",
+    )
+    model.add_argument(
+        "--in-channels",
+        type=int,
+        default=1,
+        help="number of input channels of the model at --model-path",
+    )
+    model.add_argument(
+        "--download-dir",
+        default=None,
+        help="where models are downloaded to (defaults to the appdir)",
+    )
+
+    parallel = parser.add_argument_group("parallelism")
+    parallel.add_argument(
+        "-j",
+        "--workers",
+        dest="n_workers",
+        type=int,
+        default=1,
+        help="number of worker processes (each holds its own model)",
+    )
+    parallel.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="number of images a worker processes in one go",
+    )
+    parallel.add_argument(
+        "--threads-per-worker",
+        dest="n_threads_per_worker",
+        type=int,
+        default=None,
+        help="number of tensorflow threads per worker",
+    )
+    parallel.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="number of (same-shaped) images passed through "
+        "the network in one call",
+    )
+
+    params = parser.add_argument_group("prediction")
+    params.add_argument(
+        "--no-normalize",
+        dest="normalize_image",
+        action="store_false",
+        help="do not normalize the images",
+    )
+    params.add_argument(
+        "--percentile-low",
+        type=float,
+        default=DEFAULT_PARAMETERS["percentile_low"],
+    )
+    params.add_argument(
+        "--percentile-high",
+        type=float,
+        default=DEFAULT_PARAMETERS["percentile_high"],
+    )
+    params.add_argument(
+        "--fast-normalize",
+        dest="normalize_mode",
+        action="store_const",
+        const="fast",
+        default=DEFAULT_PARAMETERS["normalize_mode"],
+        help="estimate the percentiles in a single streaming pass",
+    )
+    params.add_argument(
+        "--invert",
+        dest="invert_image",
+        action="store_true",
+        help="invert the (gray) images",
+    )
+    params.add_argument(
+        "--prob-thresh",
+        type=float,
+        default=DEFAULT_PARAMETERS["prob_thresh"],
+    )
+    params.add_argument(
+        "--nms-thresh",
+        type=float,
+        default=DEFAULT_PARAMETERS["nms_thresh"],
+    )
+    params.add_argument(
+        "--n-tiles",
+        type=int,
+        nargs=2,
+        default=None,
+        metavar=("Y", "X"),
+        help="number of tiles per axis",
+    )
+    params.add_argument(
+        "--auto-tiles",
+        dest="n_tiles",
+        action="store_const",
+        const="auto",
+        help="choose the number of tiles from the memory budget",
+    )
+    params.add_argument(
+        "--memory-budget",
+        type=float,
+        default=None,
+        metavar="GB",
+        help="memory budget for --auto-tiles "
+        "(defaults to half of the available memory)",
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.model_name is None and args.model_path is None:
+        parser.error("either --model or --model-path is required")
+
+    n_tiles = args.n_tiles
+    if n_tiles is not None and n_tiles != "auto":
+        n_tiles = tuple(n_tiles)
+    memory_budget = None
+    if args.memory_budget is not None:
+        memory_budget = int(args.memory_budget * 1024**3)
+
+    summaries = run_batch(
+        inputs=args.inputs,
+        output_dir=args.output_dir,
+        model_name=args.model_name,
+        n_control_points=args.n_control_points,
+        model_path=args.model_path,
+        in_channels=args.in_channels,
+        n_workers=args.n_workers,
+        chunk_size=args.chunk_size,
+        n_threads_per_worker=args.n_threads_per_worker,
+        download_dir=args.download_dir,
+        batch_size=args.batch_size,
+        output_format=args.output_format,
+        normalize_image=args.normalize_image,
+        percentile_low=args.percentile_low,
+        percentile_high=args.percentile_high,
+        normalize_mode=args.normalize_mode,
+        invert_image=args.invert_image,
+        prob_thresh=args.prob_thresh,
+        nms_thresh=args.nms_thresh,
+        n_tiles=n_tiles,
+        memory_budget=memory_budget,
+    )
+    n_objects = sum(summary["n_objects"] for summary in summaries)
+    logger.info(
+        f"segmented {n_objects} objects in {len(summaries)} images, "
+        f"results are in `{args.output_dir}`"
+    )
+    return 0
+
+
+def _build_models_parser():
+    parser = argparse.ArgumentParser(
+        prog="napari-splinedist-models",
+        description="download the models of the config or move them "
+        "to nodes without internet access",
+    )
+    parser.add_argument(
+        "--download-dir",
+        default=None,
+        help="where models are downloaded to (defaults to the appdir)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prefetch = commands.add_parser(
+        "prefetch", help="download all models of the config"
+    )
+    prefetch.add_argument(
+        "-j",
+        "--workers",
+        dest="max_workers",
+        type=int,
+        default=DEFAULT_PREFETCH_WORKERS,
+        help="number of concurrent downloads",
+    )
+
+    export = commands.add_parser(
+        "export", help="write the downloaded models into a bundle"
+    )
+    export.add_argument("bundle", help="the bundle to write (a .zip)")
+
+    import_ = commands.add_parser(
+        "import", help="add the models of a bundle to the download dir"
+    )
+    import_.add_argument(
+        "bundle",
+        help="a .zip with model directories and / or model zips",
+    )
+    return parser
+
+
+def models_main(argv=None):
+    from .config.config import APPDIR, load_config
+    from .model.bundle import export_bundle, import_bundle
+
+    args = _build_models_parser().parse_args(argv)
+    download_dir = APPDIR if args.download_dir is None else args.download_dir
+    models_meta = load_config().models
+
+    if args.command == "prefetch":
+
+        ready = [0]
+
+        def status(progress, n_models, n_done):
+            if n_done > ready[0]:
+                ready[0] = n_done
+                logger.info(f"{n_done} of {n_models} models are ready")
+
+        for _ in prefetch_models(
+            models_meta, download_dir, status, max_workers=args.max_workers
+        ):
+            pass
+        logger.info(f"all models are in `{download_dir}`")
+    elif args.command == "export":
+        names = export_bundle(args.bundle, models_meta, download_dir)
+        logger.info(f"exported {len(names)} models to `{args.bundle}`")
+    else:
+        names = import_bundle(args.bundle, models_meta, download_dir)
+        logger.info(f"imported {len(names)} models to `{download_dir}`")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
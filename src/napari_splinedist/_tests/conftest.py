@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope="session")
+def tiny_model_path(tmp_path_factory):
+    """a tiny, randomly initialized splinedist model
+
+    This allows to test the prediction without
+    downloading any of the pretrained models.
+    """
+    from splinedist.models import Config2D, SplineDist2D
+    from splinedist.utils import phi_generator
+
+    basedir = tmp_path_factory.mktemp("models")
+    name = "tiny_6"
+    n_control_points = 6
+    conf = Config2D(
+        n_params=2 * n_control_points,
+        grid=(2, 2),
+        n_channel_in=1,
+        contoursize_max=20,
+        unet_n_depth=1,
+        unet_n_filter_base=4,
+        train_patch_size=(64, 64),
+    )
+    model_path = basedir / name
+    model_path.mkdir()
+    phi_generator(n_control_points, conf.contoursize_max, str(model_path))
+
+    model = SplineDist2D(conf, name=name, basedir=str(basedir))
+    model.keras_model.save_weights(str(model_path / "weights_best.h5"))
+    return model_path
+
+
+@pytest.fixture
+def blobs_image():
+    """a gray image with a few bright blobs"""
+    rng = np.random.default_rng(42)
+    yy, xx = np.mgrid[0:96, 0:96]
+    image = np.zeros((96, 96), dtype="float32")
+    for cy, cx in rng.integers(10, 86, size=(8, 2)):
+        image[(yy - cy) ** 2 + (xx - cx) ** 2 < 36] = 1.0
+    image += rng.normal(scale=0.05, size=image.shape).astype("float32")
+    return np.clip(image * 255, 0, 255).astype("uint8")
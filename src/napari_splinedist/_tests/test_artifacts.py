@@ -0,0 +1,76 @@
+import numpy as np
+from splinedist.utils import grid_generator, phi_generator
+
+from napari_splinedist.model import artifacts
+from napari_splinedist.model.artifacts import prepare_model_dir
+
+
+def _model_dir(tmp_path):
+    model_path = tmp_path / "models" / "my_model"
+    model_path.mkdir(parents=True)
+    (model_path / "config.json").write_text("{}")
+    return model_path
+
+
+def test_tables_are_stored_once(tmp_path, monkeypatch):
+    model_path = _model_dir(tmp_path)
+    store = tmp_path / "store"
+
+    result = prepare_model_dir(
+        model_path, 4, 16, (32, 32), (2, 2), store_dir=store
+    )
+    assert result == model_path.resolve()
+    assert (store / "phi_M4_n16.npy").exists()
+    assert (store / "grid_M4_p32x32_g2x2.npy").exists()
+
+    # same content as the tables splinedist would write itself
+    reference = tmp_path / "reference"
+    reference.mkdir()
+    phi_generator(4, 16, str(reference))
+    grid_generator(4, (32, 32), (2, 2), str(reference))
+    for name in ("phi_4.npy", "grid_4.npy"):
+        np.testing.assert_array_equal(
+            np.load(model_path / name), np.load(reference / name)
+        )
+
+    # a second model with the same parameters only copies the tables
+    def fail(*args, **kwargs):
+        raise AssertionError("tables must not be recomputed")
+
+    monkeypatch.setattr("splinedist.utils.phi_generator", fail)
+    monkeypatch.setattr("splinedist.utils.grid_generator", fail)
+    other = tmp_path / "models" / "other_model"
+    other.mkdir()
+    prepare_model_dir(other, 4, 16, (32, 32), (2, 2), store_dir=store)
+    assert (other / "phi_4.npy").exists()
+
+
+def test_read_only_model_dir(tmp_path, monkeypatch):
+    model_path = _model_dir(tmp_path).resolve()
+
+    # simulate a read-only model directory
+    # (chmod does not help when the tests run as root)
+    place = artifacts._place
+
+    def read_only_place(src, dst):
+        if dst.parent == model_path:
+            raise PermissionError(f"read-only: {dst}")
+        return place(src, dst)
+
+    monkeypatch.setattr(artifacts, "_place", read_only_place)
+
+    result = prepare_model_dir(
+        model_path,
+        4,
+        16,
+        (32, 32),
+        (2, 2),
+        store_dir=tmp_path / "store",
+        shadow_dir=tmp_path / "shadow",
+    )
+    assert result != model_path
+    assert result.name == model_path.name
+    assert (result / "config.json").read_text() == "{}"
+    assert (result / "phi_4.npy").exists()
+    assert (result / "grid_4.npy").exists()
+    assert not (model_path / "phi_4.npy").exists()
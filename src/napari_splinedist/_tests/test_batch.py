@@ -0,0 +1,150 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from skimage import io as skimage_io
+
+from napari_splinedist import run_batch
+from napari_splinedist._cli import main
+from napari_splinedist.config.config import ModelModel
+from napari_splinedist.model.predict import predict, predict_batched
+from napari_splinedist.utils.results_io import read_results
+
+
+def _write_images(directory, image, n):
+    directory.mkdir()
+    for i in range(n):
+        skimage_io.imsave(directory / f"img_{i}.png", image)
+
+
+def test_run_batch(tmp_path, tiny_model_path, blobs_image):
+    _write_images(tmp_path / "in", blobs_image, 3)
+
+    summaries = run_batch(
+        tmp_path / "in",
+        tmp_path / "out",
+        model_path=tiny_model_path,
+        prob_thresh=0.3,
+        batch_size=2,
+    )
+
+    assert [s["image"] for s in summaries] == [
+        str(tmp_path / "in" / f"img_{i}.png") for i in range(3)
+    ]
+    for summary in summaries:
+        labels = skimage_io.imread(summary["labels"])
+        assert labels.shape == blobs_image.shape
+        with open(summary["splines"]) as f:
+            splines = json.load(f)
+        assert splines["method"]["name"] == "UhlmannSplines"
+        assert len(splines["data"]) == summary["n_objects"]
+        assert np.all(np.array(splines["data"]).shape[1:] == (6, 2))
+
+
+def test_predict_batched_matches_predict(tiny_model_path, blobs_image):
+    images = [
+        blobs_image,
+        blobs_image[3:93, 5:75],
+        blobs_image[::-1],
+        blobs_image[1:, 2:],
+    ]
+    parameters = dict(
+        model_path=tiny_model_path,
+        normalize_image=True,
+        percentile_low=1.0,
+        percentile_high=99.8,
+        invert_image=False,
+        prob_thresh=0.4,
+        nms_thresh=0.5,
+        model_meta=ModelModel(name="tiny", in_channels=1, sources=[]),
+    )
+
+    results = predict_batched(images, batch_size=3, **parameters)
+    assert len(results) == len(images)
+    for image, (labels, details) in zip(images, results):
+        expected_labels, expected = predict(image, **parameters)
+        assert labels.shape == image.shape
+        np.testing.assert_array_equal(labels, expected_labels)
+        np.testing.assert_allclose(
+            details["coord"], expected["coord"], rtol=1e-5, atol=1e-4
+        )
+
+
+def test_cli_with_glob_and_workers(tmp_path, tiny_model_path, blobs_image):
+    _write_images(tmp_path / "in", blobs_image, 4)
+
+    ret = main(
+        [
+            str(tmp_path / "in" / "img_*.png"),
+            "-o",
+            str(tmp_path / "out"),
+            "--model-path",
+            str(tiny_model_path),
+            "--workers",
+            "2",
+            "--threads-per-worker",
+            "1",
+        ]
+    )
+    assert ret == 0
+    assert len(list((tmp_path / "out").glob("*.png"))) == 4
+    assert len(list((tmp_path / "out").glob("*.splineit"))) == 4
+
+
+def test_batch_is_qt_free():
+    code = (
+        "import sys\n"
+        "import napari_splinedist.model.batch\n"
+        "bad = [m for m in ('napari', 'qtpy', 'napari_splineit')"
+        " if m in sys.modules]\n"
+        "assert not bad, bad\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_run_batch_npz(tmp_path, tiny_model_path, blobs_image):
+    _write_images(tmp_path / "in", blobs_image, 2)
+
+    summaries = run_batch(
+        tmp_path / "in",
+        tmp_path / "out",
+        model_path=tiny_model_path,
+        prob_thresh=0.3,
+        output_format="npz",
+    )
+    for summary in summaries:
+        assert summary["labels"] == summary["splines"]
+        results = read_results(summary["splines"])
+        assert results["labels"].shape == blobs_image.shape
+        assert len(results["data"]) == summary["n_objects"]
+        assert results["method"]["name"] == "UhlmannSplines"
+
+
+def test_run_batch_same_names(tmp_path, tiny_model_path, blobs_image):
+    for directory in ("a", "b/c"):
+        (tmp_path / "in" / directory).mkdir(parents=True)
+        skimage_io.imsave(tmp_path / "in" / directory / "img.png", blobs_image)
+
+    # the directories are mirrored in the output directory
+    summaries = run_batch(
+        str(tmp_path / "in" / "**" / "*.png"),
+        tmp_path / "out",
+        model_path=tiny_model_path,
+    )
+    assert [s["splines"] for s in summaries] == [
+        str(tmp_path / "out" / "a" / "img.splineit"),
+        str(tmp_path / "out" / "b" / "c" / "img.splineit"),
+    ]
+    for summary in summaries:
+        assert skimage_io.imread(summary["labels"]).shape == blobs_image.shape
+
+    # images which only differ in the extension
+    skimage_io.imsave(tmp_path / "in" / "a" / "img.tif", blobs_image)
+    with pytest.raises(ValueError, match="img.splineit"):
+        run_batch(
+            tmp_path / "in" / "a",
+            tmp_path / "out",
+            model_path=tiny_model_path,
+        )
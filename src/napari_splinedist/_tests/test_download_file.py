@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from napari_splinedist.exceptions import ChecksumMismatch
+from napari_splinedist.utils.download_file import download_file, part_path
+
+CONTENT = np.random.default_rng(0).bytes(300_000)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # serves `CONTENT`, with support for `Range: bytes=<start>-`
+    # unless the server has `ranges = False`
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.get("Range"))
+        start = 0
+        if self.server.ranges and self.headers.get("Range"):
+            start = int(self.headers["Range"][len("bytes=") : -1])
+            if start >= len(CONTENT):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}",
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.end_headers()
+        self.wfile.write(CONTENT[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(params=[True, False], ids=["ranges", "no-ranges"])
+def server(request):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.ranges = request.param
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/model.zip"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _status(progress, total, downloaded):
+    assert total == len(CONTENT)
+    assert 0 <= progress <= 100
+
+
+def test_download_file(server, tmp_path):
+    path = tmp_path / "model.zip"
+    checksum = f"sha256:{hashlib.sha256(CONTENT).hexdigest()}"
+    for _ in download_file(server.url, path, _status, checksum=checksum):
+        pass
+    assert path.read_bytes() == CONTENT
+    assert not part_path(path).exists()
+
+    # a complete partial file (ie cancelled before the rename)
+    part_path(path).write_bytes(CONTENT)
+    for _ in download_file(server.url, path, _status, checksum=checksum):
+        pass
+    assert path.read_bytes() == CONTENT
+
+
+def test_download_file_resumes(server, tmp_path):
+    path = tmp_path / "model.zip"
+    # cancel after the first chunk
+    download = download_file(server.url, path, _status, chunk_size=2**16)
+    next(download)
+    download.close()
+    assert not path.exists()
+    assert part_path(path).stat().st_size == 2**16
+
+    checksum = f"md5:{hashlib.md5(CONTENT).hexdigest()}"
+    for _ in download_file(server.url, path, _status, checksum=checksum):
+        pass
+    assert path.read_bytes() == CONTENT
+    assert server.requests[-1] == f"bytes={2**16}-"
+
+
+def test_download_file_checksum_mismatch(server, tmp_path):
+    path = tmp_path / "model.zip"
+    with pytest.raises(ChecksumMismatch):
+        for _ in download_file(server.url, path, _status, checksum="md5:0"):
+            pass
+    # the next download starts from scratch
+    assert not path.exists()
+    assert not part_path(path).exists()
@@ -0,0 +1,68 @@
+import re
+import subprocess
+import sys
+
+import pytest
+
+# dependencies which are only imported on first use
+# (plugin discovery and the headless api do not need them)
+DEFERRED_MODULES = (
+    "tensorflow",
+    "csbdeep",
+    "splinedist",
+    "stardist",
+    "skimage",
+    "napari",
+    "napari_splineit",
+    "qtpy",
+    "requests",
+    "pydantic",
+)
+
+# the budget (in ms) for the modules of this package (their self time,
+# ie without numpy & co), generous st. it holds on slow machines
+IMPORT_BUDGET_MS = 100
+
+
+def _import_times(module):
+    """the self and cumulative import time (in us) of each module
+    imported by `import <module>` (see `python -X importtime`)
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    times = {}
+    for match in re.finditer(
+        r"^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)$", stderr, re.MULTILINE
+    ):
+        times[match[3]] = (int(match[1]), int(match[2]))
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "napari_splinedist",
+        "napari_splinedist._cli",
+        "napari_splinedist.model.batch",
+        "napari_splinedist.utils.saving",
+    ],
+)
+def test_import_time(module):
+    times = _import_times(module)
+    assert module in times
+
+    imported = {name.split(".")[0] for name in times}
+    assert imported.isdisjoint(DEFERRED_MODULES), sorted(
+        imported.intersection(DEFERRED_MODULES)
+    )
+
+    own = sum(
+        self_time
+        for name, (self_time, _) in times.items()
+        if name.split(".")[0] == "napari_splinedist"
+    )
+    assert own / 1000 < IMPORT_BUDGET_MS
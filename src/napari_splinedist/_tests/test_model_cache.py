@@ -0,0 +1,167 @@
+import gc
+import shutil
+import threading
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+from napari_splinedist.model.cache import ModelCache
+from napari_splinedist.model.predict import _build_model
+
+
+class FakeModel:
+    def __init__(self, model_path, grid):
+        self.model_path = model_path
+        self.grid = grid
+
+
+def _make_cache(sizes, builder=None, **kwargs):
+    built = []
+    evicted = []
+    idle = []
+
+    def fake_builder(model_path, grid):
+        built.append((model_path, grid))
+        return FakeModel(model_path, grid)
+
+    cache = ModelCache(
+        builder=fake_builder if builder is None else builder,
+        size_of=lambda model: sizes[model.model_path],
+        on_evict=lambda: evicted.append(True),
+        on_idle=lambda: idle.append(True),
+        **kwargs,
+    )
+    return cache, built, evicted, idle
+
+
+def test_hits_and_misses(tmp_path):
+    sizes = {tmp_path / "a": 10, tmp_path / "b": 10}
+    cache, built, _, _ = _make_cache(sizes, max_models=2, max_bytes=100)
+
+    a = cache.get(tmp_path / "a")
+    b = cache.get(tmp_path / "b", grid=[2, 2])
+    assert cache.get(tmp_path / "a", grid=(2, 2)) is a
+    assert cache.get(tmp_path / "b") is b
+    assert len(built) == 2
+
+    info = cache.info()
+    assert info["hits"] == 2
+    assert info["misses"] == 2
+    assert info["evictions"] == 0
+    assert info["n_bytes"] == 20
+
+
+def test_evict_by_count_lru_order(tmp_path):
+    sizes = {tmp_path / n: 1 for n in "abc"}
+    cache, built, _, _ = _make_cache(sizes, max_models=2, max_bytes=100)
+
+    cache.get(tmp_path / "a")
+    cache.get(tmp_path / "b")
+    # touch "a" st. "b" is the least recently used
+    cache.get(tmp_path / "a")
+    cache.get(tmp_path / "c")
+
+    assert (tmp_path / "a", (2, 2)) in cache
+    assert (tmp_path / "b", (2, 2)) not in cache
+    assert (tmp_path / "c", (2, 2)) in cache
+    assert cache.evictions == 1
+
+
+def test_evict_by_memory_budget(tmp_path):
+    sizes = {tmp_path / "a": 60, tmp_path / "b": 60, tmp_path / "c": 200}
+    cache, _, evicted, idle = _make_cache(sizes, max_models=10, max_bytes=100)
+
+    cache.get(tmp_path / "a")
+    cache.get(tmp_path / "b")
+    assert len(cache) == 1
+    assert cache.n_bytes == 60
+
+    # a model larger than the budget is still kept (alone)
+    cache.get(tmp_path / "c")
+    assert len(cache) == 1
+    assert cache.evictions == 2
+
+    cache.clear()
+    assert len(cache) == 0
+    assert evicted == [True] * 3
+    # the global state is only freed once no model is cached anymore
+    assert idle == [True]
+
+
+def test_build_outside_of_the_lock(tmp_path):
+    sizes = {tmp_path / "a": 1, tmp_path / "b": 1}
+    release = threading.Event()
+    built = []
+
+    def builder(model_path, grid):
+        built.append(model_path)
+        if model_path == tmp_path / "a":
+            release.wait(10)
+        return FakeModel(model_path, grid)
+
+    cache, _, _, _ = _make_cache(sizes, builder=builder)
+    b = cache.get(tmp_path / "b")
+
+    results = []
+
+    def get_a():
+        results.append(cache.get(tmp_path / "a"))
+
+    threads = [threading.Thread(target=get_a) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while tmp_path / "a" not in built:
+        time.sleep(0.01)
+
+    # "a" is being built, the other models do not wait for it
+    assert cache.get(tmp_path / "b") is b
+    assert cache.info()["n_models"] == 1
+
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    # "a" is built once and both lookups get it
+    assert built.count(tmp_path / "a") == 1
+    assert len(results) == 2 and results[0] is results[1]
+    assert cache.misses == 2
+
+
+def test_failed_build_is_retried(tmp_path):
+    sizes = {tmp_path / "a": 1}
+    calls = []
+
+    def builder(model_path, grid):
+        calls.append(model_path)
+        if len(calls) == 1:
+            raise OSError("no weights")
+        return FakeModel(model_path, grid)
+
+    cache, _, _, _ = _make_cache(sizes, builder=builder)
+    with pytest.raises(OSError):
+        cache.get(tmp_path / "a")
+    assert cache.get(tmp_path / "a").model_path == tmp_path / "a"
+    assert len(calls) == 2
+
+
+def test_evicted_model_is_released(tiny_model_path, tmp_path):
+    other_path = tmp_path / "other_6"
+    shutil.copytree(tiny_model_path, other_path)
+    cache = ModelCache(builder=_build_model, max_models=2)
+    x = np.zeros((1, 64, 64, 1), dtype="float32")
+
+    keras_model = weakref.ref(cache.get(tiny_model_path).keras_model)
+    kept = cache.get(other_path)
+    expected = kept.keras_model.predict(x, verbose=0)
+
+    cache.configure(max_models=1)
+    gc.collect()
+    # the keras model (and with it the weights) of the evicted model
+    # is gone
+    assert keras_model() is None
+    assert (tiny_model_path, (2, 2)) not in cache
+    # the kept model still works
+    assert cache.get(other_path) is kept
+    for out, exp in zip(kept.keras_model.predict(x, verbose=0), expected):
+        np.testing.assert_array_equal(out, exp)
@@ -0,0 +1,36 @@
+import time
+
+from napari_splinedist._tests.test_prefetch import _models_meta, url  # noqa
+from napari_splinedist.widgets.model_download_widget import (
+    ModelDownloadWidget,
+)
+
+
+def _part_sizes(path):
+    return {part: part.stat().st_size for part in path.glob("*.part")}
+
+
+def test_cancel_prefetch(qtbot, url, tmp_path):  # noqa: F811
+    widget = ModelDownloadWidget(tmp_path)
+    qtbot.addWidget(widget)
+    available = []
+    widget.model_availablity_changed.connect(available.append)
+    widget.setModelsMeta(_models_meta(f"{url}/slow"))
+    # the download of the selected model is running
+    qtbot.waitUntil(lambda: len(_part_sizes(tmp_path)) == 1, timeout=10000)
+
+    widget._prefetch_button.click()
+    qtbot.waitUntil(lambda: len(_part_sizes(tmp_path)) == 3, timeout=10000)
+    widget._cancel_button.click()
+    qtbot.waitUntil(widget._restart_button.isEnabled, timeout=10000)
+
+    # all download threads are done once the prefetch finished
+    sizes = _part_sizes(tmp_path)
+    time.sleep(0.5)
+    assert _part_sizes(tmp_path) == sizes
+    assert widget._prefetch_button.isEnabled()
+
+    # the selected model continues where the prefetch stopped
+    widget._restart_button.click()
+    qtbot.waitUntil(lambda: available and available[-1], timeout=20000)
+    assert (tmp_path / "a_6" / "weights_best.h5").read_text() == "a_6" * 1000
@@ -0,0 +1,57 @@
+import numpy as np
+
+from napari_splinedist.model.multiscale import (
+    choose_level,
+    full_resolution_slicing,
+    level_slicing,
+)
+from napari_splinedist.model.results import transform_results
+from napari_splinedist.utils.rasterize import (
+    rasterize_polygons,
+    scaled_polygons,
+)
+from napari_splinedist.utils.splines import knots_from_coefs
+
+FACTORS = [(1, 1), (2, 2), (4, 4), (8, 8)]
+
+
+def test_choose_level():
+    # without a known pixel size we take the full resolution
+    assert choose_level(FACTORS) == 0
+    assert choose_level(FACTORS, 0.25, None) == 0
+    # the level with the closest pixel size
+    assert choose_level(FACTORS, 0.25, 1.0) == 2
+    assert choose_level(FACTORS, 0.25, 0.6) == 1
+    assert choose_level(FACTORS, 0.25, 100.0) == 3
+    assert choose_level(FACTORS, 1.0, 0.1) == 0
+
+
+def test_slicing_between_levels():
+    slicing = (slice(None), slice(10, 101), slice(0, 64))
+    level = level_slicing(slicing, (4, 4))
+    # the level covers at least the region
+    assert level == (slice(None), slice(2, 26), slice(0, 16))
+    full = full_resolution_slicing(level, (4, 4))
+    assert full == (slice(None), slice(8, 104), slice(0, 64))
+
+
+def test_coordinates_back_to_full_resolution():
+    rng = np.random.default_rng(0)
+    coefs = rng.uniform(5, 20, size=(4, 2, 6)).astype("float32")
+    labels = np.zeros((40, 30), dtype="int32")
+    slicing = (slice(8, 48), slice(4, 34))
+    _, coords_list = transform_results(
+        labels, dict(coord=coefs), slicing, (64, 64), downsample=(4, 2)
+    )
+    for coords, c in zip(coords_list, coefs):
+        expected = (knots_from_coefs(c.T) + [8, 4]) * [4, 2]
+        np.testing.assert_allclose(coords, expected, rtol=1e-6)
+
+    # the full resolution splines are drawn into the labels of the level
+    square = np.array([[4, 4], [4, 16], [16, 16], [16, 4]], dtype=float)
+    polygons = [square]
+    assert scaled_polygons(polygons) is polygons
+    labels = rasterize_polygons(scaled_polygons([square], (4, 2)), (8, 12))
+    expected = np.zeros((8, 12), dtype=int)
+    expected[1:5, 2:9] = 1
+    np.testing.assert_array_equal(labels, expected)
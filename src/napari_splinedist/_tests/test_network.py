@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from napari_splinedist.exceptions import PredictionCancelled
+from napari_splinedist.model.network import TiledNetwork, run_network
+from napari_splinedist.model.predict import build_model
+
+
+@pytest.mark.parametrize("n_tiles", [None, (1, 1), (2, 3)])
+def test_tiled_network_same_as_predict(tiny_model_path, blobs_image, n_tiles):
+    model = build_model(tiny_model_path)
+    # a shape which is not divisible by the grid (ie it is padded)
+    img = blobs_image[:, :90].astype("float32") / 255
+
+    prob, dist = run_network(model, img, n_tiles=n_tiles)
+    expected_prob, expected_dist = model.predict(
+        img, n_tiles=n_tiles, show_tile_progress=False
+    )
+    np.testing.assert_allclose(prob, expected_prob, atol=1e-5)
+    np.testing.assert_allclose(dist, expected_dist, atol=1e-5)
+
+
+def test_run_network_reports_and_stops(
+    tiny_model_path, blobs_image, monkeypatch
+):
+    model = build_model(tiny_model_path)
+    img = blobs_image.astype("float32") / 255
+
+    reported = []
+    run_network(
+        model,
+        img,
+        n_tiles=(2, 2),
+        progress_callback=lambda name, p: reported.append((name, p)),
+    )
+    assert reported == [
+        ("predict", 25),
+        ("predict", 50),
+        ("predict", 75),
+        ("predict", 100),
+    ]
+
+    # the callback stops the run after the first tile
+    predict = model.keras_model.predict
+    n_calls = []
+
+    def counting_predict(*args, **kwargs):
+        n_calls.append(True)
+        return predict(*args, **kwargs)
+
+    def cancel(name, progress):
+        raise PredictionCancelled()
+
+    monkeypatch.setattr(model.keras_model, "predict", counting_predict)
+    with pytest.raises(PredictionCancelled):
+        run_network(model, img, n_tiles=(2, 2), progress_callback=cancel)
+    assert len(n_calls) == 1
+
+
+def test_outputs_need_all_tiles(tiny_model_path, blobs_image):
+    model = build_model(tiny_model_path)
+    img = blobs_image.astype("float32") / 255
+
+    network = TiledNetwork(model, img, n_tiles=(2, 2))
+    assert network.predict_next()
+    assert network.n_done == 1
+    with pytest.raises(RuntimeError):
+        network.outputs()
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from csbdeep.utils import normalize as csbdeep_normalize
+
+from napari_splinedist.model.normalize import (
+    compute_percentiles,
+    normalize,
+    percentile_deviation,
+)
+
+
+@pytest.mark.parametrize("shape", [(64, 80), (64, 80, 3)])
+def test_exact_mode_matches_csbdeep(shape):
+    rng = np.random.default_rng(0)
+    image = rng.gamma(2.0, size=shape).astype("float32")
+
+    expected = csbdeep_normalize(image, 1.0, 99.8, axis=(0, 1))
+    result, info = normalize(image.copy(), 1.0, 99.8, mode="exact")
+
+    assert result.dtype == np.float32
+    assert info["rank_error"] == 0.0
+    np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize("dtype", ["uint8", "uint16", "int16"])
+def test_fast_mode_integer_histogram(dtype):
+    rng = np.random.default_rng(1)
+    info = np.iinfo(dtype)
+    image = rng.integers(info.min, info.max, size=(300, 200), dtype=dtype)
+
+    lo, hi, rank_error = compute_percentiles(
+        image, 2.0, 99.5, mode="fast", chunk_bytes=1000
+    )
+    exact_lo, exact_hi = np.percentile(image, (2.0, 99.5))
+    assert rank_error == 0.0
+    np.testing.assert_allclose(lo, exact_lo)
+    np.testing.assert_allclose(hi, exact_hi)
+
+
+def test_fast_mode_subsample_is_within_bound():
+    rng = np.random.default_rng(2)
+    image = rng.normal(size=(1000, 1000)).astype("float32")
+
+    deviation = percentile_deviation(
+        image, 1.0, 99.8, max_samples=100_000, chunk_bytes=100_000
+    )
+    assert 0 < deviation["rank_error"] < 1.0
+    assert deviation["low_relative"] < 0.01
+    assert deviation["high_relative"] < 0.01
+
+
+def test_fast_mode_subsample_is_not_strided():
+    # a regular stride which divides the rows would only see
+    # the values of a few columns
+    image = np.tile(np.arange(16, dtype="float32"), (1000, 100))
+
+    lo, hi, rank_error = compute_percentiles(
+        image, 1.0, 99.8, mode="fast", max_samples=100_000
+    )
+    assert 0 < rank_error < 1.0
+    np.testing.assert_array_equal(lo, 0)
+    np.testing.assert_array_equal(hi, 15)
+    # the subsample is seeded
+    again = compute_percentiles(
+        image, 1.0, 99.8, mode="fast", max_samples=100_000
+    )
+    np.testing.assert_array_equal(again[0], lo)
+    np.testing.assert_array_equal(again[1], hi)
+
+
+def test_inplace_rescale():
+    rng = np.random.default_rng(3)
+    image = rng.random((50, 60)).astype("float32")
+    result, _ = normalize(image, 1.0, 99.0, inplace=True)
+    assert result is image
+
+    original = image.copy()
+    result, _ = normalize(image, 1.0, 99.0, inplace=False)
+    assert result is not image
+    np.testing.assert_array_equal(image, original)
+
+
+def test_fast_mode_on_memmap(tmp_path):
+    rng = np.random.default_rng(4)
+    data = rng.integers(0, 4096, size=(500, 400), dtype="uint16")
+    mm = np.lib.format.open_memmap(
+        tmp_path / "img.npy", mode="w+", dtype=data.dtype, shape=data.shape
+    )
+    mm[:] = data
+
+    lo, hi, _ = compute_percentiles(mm, 1.0, 99.8, mode="fast")
+    np.testing.assert_allclose(lo, np.percentile(data, 1.0))
+    np.testing.assert_allclose(hi, np.percentile(data, 99.8))
@@ -0,0 +1,107 @@
+import numpy as np
+
+from napari_splinedist.config.config import ModelModel
+from napari_splinedist.model.outputs import OutputCache, data_fingerprint
+from napari_splinedist.model.predict import build_model, predict
+from napari_splinedist.model.preprocess import preprocess
+
+PARAMETERS = dict(
+    normalize_image=True,
+    percentile_low=1.0,
+    percentile_high=99.8,
+    invert_image=False,
+    model_meta=ModelModel(name="tiny", in_channels=1, sources=[]),
+)
+
+
+def _preprocessed(image):
+    return preprocess(
+        image,
+        model_in_channels=1,
+        normalize_image=True,
+        percentile_low=1.0,
+        percentile_high=99.8,
+        invert_image=False,
+    )
+
+
+def _outputs(n_bytes):
+    return (1, 1), np.zeros(n_bytes // 4, "float32"), np.zeros(0, "float32")
+
+
+def test_output_cache_lru():
+    cache = OutputCache(max_entries=2, max_bytes=100)
+    cache.put("a", _outputs(40))
+    cache.put("b", _outputs(40))
+    assert cache.get("a") is not None
+    cache.put("c", _outputs(40))
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # bounded by memory, the most recent outputs are always kept
+    cache.put("d", _outputs(80))
+    assert len(cache) == 1
+    cache.put("e", _outputs(400))
+    assert list(cache._outputs) == ["e"]
+    # cached outputs are read only
+    assert not cache.get("e")[1].flags.writeable
+
+
+def test_data_fingerprint():
+    data = np.arange(100, dtype="uint8").reshape(10, 10)
+    assert data_fingerprint(data) == data_fingerprint(data.copy())
+    assert data_fingerprint(data) != data_fingerprint(data.T)
+    assert data_fingerprint(data) != data_fingerprint(data.astype("int16"))
+    changed = data.copy()
+    changed[5, 5] += 1
+    assert data_fingerprint(data) != data_fingerprint(changed)
+
+
+def test_thresholds_only_rerun_nms(tiny_model_path, blobs_image):
+    model = build_model(tiny_model_path)
+    n_calls = []
+    original_predict = model.keras_model.predict
+
+    # count the forward passes of the network
+    def counting_predict(*args, **kwargs):
+        n_calls.append(True)
+        return original_predict(*args, **kwargs)
+
+    model.keras_model.predict = counting_predict
+    try:
+        cache = OutputCache()
+        for prob_thresh, nms_thresh in [(0.5, 0.5), (0.3, 0.4), (0.6, 0.2)]:
+            labels, details = predict(
+                blobs_image,
+                model_path=tiny_model_path,
+                prob_thresh=prob_thresh,
+                nms_thresh=nms_thresh,
+                output_cache=cache,
+                **PARAMETERS,
+            )
+            reference = model.predict_instances(
+                _preprocessed(blobs_image),
+                prob_thresh=prob_thresh,
+                nms_thresh=nms_thresh,
+            )
+            np.testing.assert_array_equal(labels, reference[0])
+            np.testing.assert_allclose(details["coord"], reference[1]["coord"])
+        # one forward pass for the cached predictions, plus one
+        # for each reference
+        assert len(n_calls) == 1 + 3
+        assert cache.hits == 2
+
+        # other normalization parameters need a new forward pass
+        predict(
+            blobs_image,
+            model_path=tiny_model_path,
+            prob_thresh=0.5,
+            nms_thresh=0.5,
+            output_cache=cache,
+            **dict(PARAMETERS, percentile_high=99.0),
+        )
+        assert len(n_calls) == 5
+        assert len(cache) == 2
+    finally:
+        del model.keras_model.predict
@@ -0,0 +1,210 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from napari_splinedist.config.config import ModelModel, SourceModel
+from napari_splinedist.exceptions import ChecksumMismatch
+from napari_splinedist.model.bundle import export_bundle, import_bundle
+from napari_splinedist.model.resolve import download_model, prefetch_models
+
+
+def _model_zip(name):
+    # a zip as the models are downloaded: `<name>/` with the files
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        zf.writestr(f"{name}/config.json", "{}")
+        zf.writestr(f"{name}/weights_best.h5", name * 1000)
+        # st. the downloads from `/slow` take a while
+        zf.writestr(f"{name}/random.bin", os.urandom(300_000))
+    return buffer.getvalue()
+
+
+ZIPS = {f"/{name}.zip": _model_zip(name) for name in ("a_6", "a_8", "b_6")}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # serves `ZIPS`, and slowly (in small pieces) below `/slow`
+
+    def do_GET(self):
+        slow = self.path.startswith("/slow/")
+        path = self.path[len("/slow") :] if slow else self.path
+        if path not in ZIPS:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(ZIPS[path])))
+        self.end_headers()
+        if not slow:
+            self.wfile.write(ZIPS[path])
+            return
+        try:
+            for start in range(0, len(ZIPS[path]), 2**14):
+                self.wfile.write(ZIPS[path][start : start + 2**14])
+                time.sleep(0.05)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped the download
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _models_meta(url, missing=False):
+    def source(name, n):
+        return SourceModel(
+            source_type="url",
+            n_control_points=n,
+            source=f"{url}/{name}_{n}.zip",
+            checksum="md5:"
+            + hashlib.md5(ZIPS.get(f"/{name}_{n}.zip", b"")).hexdigest(),
+        )
+
+    models = [
+        ModelModel(
+            name="a", in_channels=1, sources=[source("a", 6), source("a", 8)]
+        ),
+        ModelModel(name="b", in_channels=3, sources=[source("b", 6)]),
+    ]
+    if missing:
+        models.append(
+            ModelModel(name="c", in_channels=1, sources=[source("c", 6)])
+        )
+    return models
+
+
+def test_prefetch_models(url, tmp_path):
+    status = []
+    for _ in prefetch_models(
+        _models_meta(url),
+        tmp_path,
+        lambda *args: status.append(args),
+        max_workers=2,
+    ):
+        pass
+    for name in ("a_6", "a_8", "b_6"):
+        assert (tmp_path / name / "weights_best.h5").exists()
+    assert status[-1] == (100.0, 3, 3)
+    assert [n_done for _, _, n_done in status] == sorted(
+        n_done for _, _, n_done in status
+    )
+
+    # the other models are downloaded even if one fails
+    with pytest.raises(RuntimeError):
+        for _ in prefetch_models(
+            _models_meta(url, missing=True),
+            tmp_path / "other",
+            lambda *args: None,
+        ):
+            pass
+    assert (tmp_path / "other" / "b_6").exists()
+
+
+def test_prefetch_models_cancelled(url, tmp_path):
+    status = []
+    cancelled = threading.Event()
+    prefetch = prefetch_models(
+        _models_meta(f"{url}/slow"),
+        tmp_path,
+        lambda *args: status.append(args),
+        cancelled=cancelled,
+    )
+    while not status:
+        next(prefetch)
+
+    # like an aborted napari worker: the generator is not resumed
+    cancelled.set()
+    time.sleep(1.0)
+    n_status = len(status)
+    sizes = {part: part.stat().st_size for part in tmp_path.glob("*.part")}
+    assert sizes
+    time.sleep(0.5)
+    # the downloads stopped
+    assert len(status) == n_status
+    assert {
+        part: part.stat().st_size for part in tmp_path.glob("*.part")
+    } == sizes
+    assert not any(path.is_dir() for path in tmp_path.iterdir())
+    # resuming the generator returns (without an error)
+    assert list(prefetch) == []
+
+    # nothing writes into the partial files anymore, ie the next
+    # prefetch gets complete (and verified) models
+    for _ in prefetch_models(_models_meta(url), tmp_path, lambda *args: None):
+        pass
+    for name in ("a_6", "a_8", "b_6"):
+        assert (tmp_path / name / "weights_best.h5").exists()
+
+
+def test_download_model_interrupted_extraction(url, tmp_path, monkeypatch):
+    model_meta = _models_meta(url)[0]
+    source = model_meta.sources[0]
+
+    def extractall(self, path, *args, **kwargs):
+        # extract one file and fail
+        self.extract(self.namelist()[0], path)
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(zipfile.ZipFile, "extractall", extractall)
+        with pytest.raises(OSError):
+            for _ in download_model(
+                model_meta, source, tmp_path, lambda *args: None
+            ):
+                pass
+    # no partial model directory (and the zip is kept)
+    assert [path.name for path in tmp_path.iterdir()] == ["a_6.zip"]
+
+    for _ in download_model(model_meta, source, tmp_path, lambda *args: None):
+        pass
+    assert (tmp_path / "a_6" / "weights_best.h5").read_text() == "a_6" * 1000
+
+
+def test_bundle(url, tmp_path):
+    models_meta = _models_meta(url)
+    for _ in prefetch_models(
+        models_meta, tmp_path / "online", lambda *args: None
+    ):
+        pass
+    assert export_bundle(
+        tmp_path / "bundle.zip", models_meta, tmp_path / "online"
+    ) == ["a_6", "a_8", "b_6"]
+
+    offline = tmp_path / "offline"
+    assert import_bundle(tmp_path / "bundle.zip", models_meta, offline) == [
+        "a_6",
+        "a_8",
+        "b_6",
+    ]
+    assert (offline / "a_8" / "weights_best.h5").read_text() == "a_8" * 1000
+    # existing models are kept
+    assert import_bundle(tmp_path / "bundle.zip", models_meta, offline) == []
+
+    # a bundle of the zips as they are downloaded
+    with zipfile.ZipFile(tmp_path / "zips.zip", "w") as zf:
+        zf.writestr("b_6.zip", ZIPS["/b_6.zip"])
+        zf.writestr("unknown.zip", ZIPS["/a_6.zip"])
+    assert import_bundle(
+        tmp_path / "zips.zip", models_meta, tmp_path / "zips"
+    ) == ["b_6"]
+
+    with zipfile.ZipFile(tmp_path / "broken.zip", "w") as zf:
+        zf.writestr("a_6.zip", ZIPS["/a_8.zip"])
+    with pytest.raises(ChecksumMismatch):
+        import_bundle(tmp_path / "broken.zip", models_meta, tmp_path / "x")
@@ -0,0 +1,129 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+from csbdeep.utils import normalize as csbdeep_normalize
+
+from napari_splinedist.exceptions import PredictionException
+from napari_splinedist.model import preprocess as preprocess_module
+from napari_splinedist.model.normalize import (
+    DEFAULT_MAX_SAMPLES,
+    compute_percentiles,
+)
+from napari_splinedist.model.preprocess import preprocess
+
+
+def _peak_bytes(f, *args, **kwargs):
+    # the peak is counted from `start` (`reset_peak` needs python 3.9)
+    tracemalloc.start()
+    try:
+        result = f(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def test_matches_reference_pipeline():
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(120, 100), dtype="uint8")
+    original = image.copy()
+
+    # the (copying) pipeline which was used before
+    expected = image.astype("float32") / np.iinfo(image.dtype).max
+    expected = expected.max() - expected
+    expected = csbdeep_normalize(expected, 1.0, 99.8, axis=(0, 1))
+
+    result = preprocess(image, 1, True, 1.0, 99.8, invert_image=True)
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, expected)
+    np.testing.assert_array_equal(image, original)
+
+
+def test_collapse_channels():
+    rng = np.random.default_rng(1)
+    image = rng.integers(0, 256, size=(40, 50, 3), dtype="uint8")
+
+    result = preprocess(image, 1, False, 1.0, 99.8, invert_image=True)
+    expected = image.astype("float64").mean(axis=2) / 255
+    expected = expected.max() - expected
+    assert result.shape == (40, 50)
+    np.testing.assert_allclose(result, expected, atol=1e-6)
+
+    with pytest.raises(PredictionException):
+        preprocess(image, 2, False, 1.0, 99.8, invert_image=False)
+    with pytest.raises(PredictionException):
+        preprocess(image, 3, False, 1.0, 99.8, invert_image=True)
+
+
+def test_preallocated_buffer():
+    image = np.arange(12, dtype="uint16").reshape(3, 4)
+    out = np.empty((3, 4), dtype="float32")
+    result = preprocess(image, 1, True, 0.0, 100.0, False, out=out)
+    assert result is out
+
+    with pytest.raises(ValueError):
+        preprocess(image, 1, True, 0.0, 100.0, False, out=out[1:])
+
+
+@pytest.mark.parametrize("invert_image", [False, True])
+@pytest.mark.parametrize("shape", [(120, 100), (60, 50, 3)])
+def test_fast_mode_uses_integer_input(monkeypatch, shape, invert_image):
+    rng = np.random.default_rng(3)
+    image = rng.integers(0, 4096, size=shape, dtype="uint16")
+    in_channels = 1 if len(shape) == 2 else shape[2]
+
+    dtypes = []
+
+    def spy(image, *args, **kwargs):
+        dtypes.append(image.dtype)
+        return compute_percentiles(image, *args, **kwargs)
+
+    monkeypatch.setattr(preprocess_module, "compute_percentiles", spy)
+    result = preprocess(
+        image,
+        in_channels,
+        True,
+        1.0,
+        99.8,
+        invert_image and not shape[2:],
+        normalize_mode="fast",
+    )
+    # the (exact) histogram of the uint16 input
+    assert dtypes == [np.uint16]
+
+    expected = preprocess(
+        image,
+        in_channels,
+        True,
+        1.0,
+        99.8,
+        invert_image and not shape[2:],
+        normalize_mode="exact",
+    )
+    np.testing.assert_allclose(result, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "shape, mode, factor",
+    [
+        # one float32 buffer plus one float32 copy for `np.percentile`
+        ((2048, 2048), "exact", 2.0),
+        # one float32 buffer plus the subsample
+        ((2048, 2048), "fast", 1.0),
+        ((1024, 1024, 3), "fast", 1.0),
+    ],
+)
+def test_peak_memory(shape, mode, factor):
+    rng = np.random.default_rng(2)
+    image = rng.integers(0, 2**16, size=shape, dtype="uint16")
+    buffer_bytes = 4 * shape[0] * shape[1]
+
+    result, peak = _peak_bytes(
+        preprocess, image, 1, True, 1.0, 99.8, True, normalize_mode=mode
+    )
+    assert result.nbytes == buffer_bytes
+    # the subsample of the "fast" mode does not grow with the image
+    sample_bytes = 4 * DEFAULT_MAX_SAMPLES if mode == "fast" else 0
+    # allow for some (small) constant overhead
+    assert peak < factor * buffer_bytes + sample_bytes + 2 * 1024**2
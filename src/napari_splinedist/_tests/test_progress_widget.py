@@ -0,0 +1,23 @@
+import pytest
+
+from napari_splinedist.widgets import progress_widget
+from napari_splinedist.widgets.progress_widget import ProgressWidget
+
+
+@pytest.mark.parametrize("report_start", [False, True])
+def test_eta(qtbot, monkeypatch, report_start):
+    widget = ProgressWidget()
+    qtbot.addWidget(widget)
+    now = [0.0]
+    monkeypatch.setattr(progress_widget.time, "perf_counter", lambda: now[0])
+
+    # 4 tiles of 10 seconds, reported when a tile is done
+    # (and when the step starts if `report_start`)
+    if report_start:
+        assert widget.eta("predict", 0) is None
+    for k, expected in enumerate([None, 20, 10, None]):
+        now[0] = 10.0 * (k + 1)
+        eta = widget.eta("predict", 25 * (k + 1))
+        if report_start and k == 0:
+            expected = 30
+        assert eta == pytest.approx(expected)
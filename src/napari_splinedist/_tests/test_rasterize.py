@@ -0,0 +1,101 @@
+import numpy as np
+from napari_splineit.layer._interpolated_layer import InterpolatedLayer
+
+from napari_splinedist.utils.rasterize import (
+    LabelsSync,
+    labels_from_shapes,
+    rasterize_polygons,
+)
+
+
+def _random_polygons(rng, n, shape, n_vertices=12):
+    # star shaped contours (like splinedist results) and a few
+    # polygons with vertices on pixel centers (and out of the image)
+    polygons = []
+    for i in range(n):
+        center = rng.uniform(-5, np.array(shape) + 5)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, n_vertices))
+        radii = rng.uniform(2, 12, n_vertices)
+        polygon = center + np.stack(
+            [radii * np.sin(angles), radii * np.cos(angles)], axis=1
+        )
+        if i % 4 == 0:
+            polygon = np.round(polygon)
+        polygons.append(polygon)
+    return polygons
+
+
+def test_rasterize_same_as_interpolated_layer():
+    rng = np.random.default_rng(0)
+    shape = (120, 90)
+    polygons = _random_polygons(rng, 150, shape)
+    z_index = rng.integers(0, 5, len(polygons))
+
+    layer = InterpolatedLayer(
+        polygons, shape_type="polygon", z_index=list(z_index), ndim=2
+    )
+    expected = layer.to_labels(labels_shape=shape)
+    labels = labels_from_shapes(layer, shape)
+    assert labels.dtype == expected.dtype
+    np.testing.assert_array_equal(labels, expected)
+
+    # changing the z-order changes which object is on top
+    layer.z_index = list(z_index[::-1])
+    np.testing.assert_array_equal(
+        labels_from_shapes(layer, shape), layer.to_labels(labels_shape=shape)
+    )
+
+
+def test_rasterize_edge_cases():
+    # vertices and edges on pixel centers, a degenerate polygon
+    # and a polygon outside of the image
+    polygons = [
+        np.array([[1, 1], [1, 4], [4, 4], [4, 1]], dtype=float),
+        np.array([[4, 0], [0, 6], [6, 6], [4, 6]], dtype=float),
+        np.array([[7, 1], [6, 6], [2, 0], [6, 6]], dtype=float),
+        np.array([[20, 20], [22, 20], [20, 22]], dtype=float),
+    ]
+    shape = (9, 9)
+    layer = InterpolatedLayer(polygons, shape_type="polygon", ndim=2)
+    np.testing.assert_array_equal(
+        rasterize_polygons(polygons, shape, z_index=layer.z_index),
+        layer.to_labels(labels_shape=shape),
+    )
+    assert rasterize_polygons([], shape).max() == 0
+
+
+def test_labels_sync_same_as_rasterize():
+    rng = np.random.default_rng(1)
+    shape = (120, 90)
+    polygons = _random_polygons(rng, 80, shape)
+    z_index = list(range(len(polygons)))
+    labels = rasterize_polygons(polygons, shape, z_index=z_index)
+    sync = LabelsSync(labels, polygons, z_index)
+
+    def check(n_changed):
+        assert sync.update(polygons, z_index) == n_changed
+        np.testing.assert_array_equal(
+            labels, rasterize_polygons(polygons, shape, z_index=z_index)
+        )
+
+    check(0)
+    # move some vertices and shift an object
+    polygons[3] = polygons[3].copy()
+    polygons[3][2] += 4
+    polygons[10] = polygons[10] + [5.5, -3.25]
+    check(2)
+    # move an object to the front and one to the back
+    z_index[20] = 1000
+    z_index[21] = -1
+    check(2)
+    # remove objects and add a new one
+    del polygons[40]
+    del z_index[40]
+    del polygons[5]
+    del z_index[5]
+    polygons.append(_random_polygons(rng, 1, shape)[0])
+    z_index.append(500)
+    check(3)
+    # many changes redraw everything
+    polygons = [p + 1 for p in polygons]
+    check(len(polygons))
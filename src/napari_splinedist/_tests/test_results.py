@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from napari_splinedist.model.results import transform_results
+from napari_splinedist.utils.labels import compact_labels, label_dtype
+from napari_splinedist.utils.splines import (
+    knots_from_coefs,
+    knots_from_coefs_batched,
+)
+
+
+def test_batched_knots_same_as_per_object():
+    # the per-object conversion the widget used before
+    uhlmann = pytest.importorskip("napari_splineit.interpolation.uhlmann")
+
+    rng = np.random.default_rng(0)
+    for n_objects, M in [(0, 8), (1, 6), (500, 8), (100, 32)]:
+        coefs = (50 * rng.normal(size=(n_objects, 2, M))).astype("float32")
+        offset = np.array([12, 34])
+
+        expected = [uhlmann.knots_from_coefs(c.T) + offset for c in coefs]
+        knots = knots_from_coefs_batched(coefs, offset=offset)
+        assert knots.shape == (n_objects, M, 2)
+        for c, k, e in zip(coefs, knots, expected):
+            assert k.dtype == e.dtype
+            np.testing.assert_allclose(k, e, rtol=1e-6, atol=1e-4)
+            # the qt-free per-object version gives the same knots
+            np.testing.assert_array_equal(k, knots_from_coefs(c.T) + offset)
+
+        # without an offset the dtype of the coefficients is kept
+        no_offset = knots_from_coefs_batched(coefs)
+        assert no_offset.dtype == coefs.dtype
+        np.testing.assert_array_equal(no_offset + offset, knots)
+
+
+def test_transform_results_offset():
+    rng = np.random.default_rng(1)
+    coefs = rng.uniform(0, 20, size=(3, 2, 8)).astype("float32")
+    labels = np.arange(20 * 30).reshape(20, 30)
+    slicing = (slice(5, 25), slice(10, 40))
+
+    full_labels, coords_list = transform_results(
+        labels, dict(coord=coefs), slicing, (50, 60)
+    )
+    assert full_labels.shape == (50, 60)
+    np.testing.assert_array_equal(full_labels[slicing], labels)
+    for coords, c in zip(coords_list, coefs):
+        np.testing.assert_array_equal(coords, knots_from_coefs(c.T) + [5, 10])
+    # the labels are stored in the smallest sufficient dtype
+    assert full_labels.dtype == np.uint16
+
+
+def test_compact_labels(tmp_path):
+    assert label_dtype(0) == np.uint8
+    assert label_dtype(255) == np.uint8
+    assert label_dtype(256) == np.uint16
+    assert label_dtype(70000) == np.uint32
+    assert label_dtype(2**40) == np.uint64
+
+    labels = np.array([[0, 3], [300, 1]], dtype=np.int64)
+    compact = compact_labels(labels)
+    assert compact.dtype == np.uint16
+    np.testing.assert_array_equal(compact, labels)
+    # room for more labels
+    assert compact_labels(labels, max_label=70000).dtype == np.uint32
+
+    # out-of-core labels are not loaded into memory
+    memmap = np.lib.format.open_memmap(
+        tmp_path / "labels.npy", mode="w+", dtype="int32", shape=(4, 4)
+    )
+    assert compact_labels(memmap) is memmap
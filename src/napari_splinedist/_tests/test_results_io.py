@@ -0,0 +1,164 @@
+import json
+
+import numpy as np
+import pytest
+import tifffile
+from skimage import io as skimage_io
+
+import napari_splinedist.utils.results_io as results_io
+from napari_splinedist.utils.results_io import (
+    labels_image_path,
+    max_label,
+    read_results,
+    write_labels_image,
+    write_results,
+)
+from napari_splinedist.utils.splineit_io import write_splineit
+
+
+def test_results_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    data = [rng.uniform(0, 100, (n, 2)) for n in (6, 6, 8)]
+    labels = rng.integers(0, 4, (30, 40))
+    edge_color = rng.uniform(size=(3, 4)).astype("float32")
+
+    path = write_results(
+        tmp_path / "results.npz",
+        labels=labels,
+        data=data,
+        z_index=[2, 0, 1],
+        edge_color=edge_color,
+        opacity=0.5,
+    )
+    results = read_results(path)
+    assert results["labels"].dtype == np.uint8
+    np.testing.assert_array_equal(results["labels"], labels)
+    assert len(results["data"]) == len(data)
+    for points, expected in zip(results["data"], data):
+        np.testing.assert_array_equal(points, expected)
+    np.testing.assert_array_equal(results["z_index"], [2, 0, 1])
+    np.testing.assert_array_equal(results["edge_color"], edge_color)
+    assert results["face_color"] is None
+    assert results["opacity"] == 0.5
+    assert results["method"] == {"name": "UhlmannSplines", "args": {}}
+
+    # no objects
+    write_results(tmp_path / "empty.npz", labels=labels * 0, data=[])
+    assert read_results(tmp_path / "empty.npz")["data"] == []
+
+    np.savez(tmp_path / "other.npz", labels=labels)
+    with pytest.raises(ValueError):
+        read_results(tmp_path / "other.npz")
+
+
+def test_more_labels_than_uint16(tmp_path):
+    labels = np.arange(300 * 300, dtype="int64").reshape(300, 300)
+    write_results(tmp_path / "results.npz", labels=labels, data=[])
+    results = read_results(tmp_path / "results.npz")
+    assert results["labels"].dtype == np.uint32
+    np.testing.assert_array_equal(results["labels"], labels)
+
+    # png labels would wrap around, they are saved as tif instead
+    path = labels_image_path(tmp_path / "labels.png", max_label(labels))
+    assert path == tmp_path / "labels.tif"
+    write_labels_image(path, labels)
+    np.testing.assert_array_equal(skimage_io.imread(path), labels)
+    with pytest.raises(ValueError):
+        write_labels_image(tmp_path / "labels.png", labels)
+    assert labels_image_path(
+        tmp_path / "labels.png", max_label(labels[:2])
+    ) == (tmp_path / "labels.png")
+
+
+def test_labels_written_in_blocks(tmp_path, monkeypatch):
+    # a few rows per block and tile
+    monkeypatch.setattr(results_io, "CHUNK_BYTES", 7 * 50 * 8)
+    monkeypatch.setattr(results_io, "TIF_TILE_SHAPE", (16, 32))
+    rng = np.random.default_rng(2)
+    labels = np.lib.format.open_memmap(
+        tmp_path / "labels.npy", mode="w+", dtype="int64", shape=(3, 40, 50)
+    )
+    labels[:] = rng.integers(0, 300, labels.shape)
+    edited = rng.integers(0, 5, (40, 50))
+    expected = np.array(labels)
+    expected[1] = edited
+
+    progress = []
+    write_results(
+        tmp_path / "results.npz",
+        labels=labels,
+        data=[],
+        edited_frame=(1, edited),
+        progress_callback=lambda name, p: progress.append(p),
+    )
+    results = read_results(tmp_path / "results.npz")
+    assert results["labels"].dtype == np.uint16
+    np.testing.assert_array_equal(results["labels"], expected)
+    assert progress == sorted(progress) and progress[-1] == 100
+    assert len(progress) > 3
+
+    write_labels_image(
+        tmp_path / "labels.tif", labels, edited_frame=(1, edited)
+    )
+    np.testing.assert_array_equal(
+        tifffile.imread(tmp_path / "labels.tif"), expected
+    )
+
+
+class LazyLabels(object):
+    """labels which can only be read in parts (as zarr / dask arrays),
+    the number of pixels of the largest read is recorded
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self.shape = data.shape
+        self.dtype = data.dtype
+        self.ndim = data.ndim
+        self.size = data.size
+        self.largest_read = 0
+
+    def __getitem__(self, key):
+        block = self._data[key]
+        self.largest_read = max(self.largest_read, block.size)
+        return block
+
+    def __array__(self, dtype=None):
+        raise AssertionError("the labels are loaded as a whole")
+
+
+def test_lazy_labels_read_in_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(results_io, "CHUNK_BYTES", 7 * 50 * 8)
+    monkeypatch.setattr(results_io, "TIF_TILE_SHAPE", (16, 32))
+    rng = np.random.default_rng(3)
+    expected = rng.integers(0, 70000, (2, 40, 50))
+    labels = LazyLabels(expected)
+
+    assert max_label(labels) == expected.max()
+    write_results(tmp_path / "results.npz", labels=labels, data=[])
+    np.testing.assert_array_equal(
+        read_results(tmp_path / "results.npz")["labels"], expected
+    )
+    write_labels_image(tmp_path / "labels.tif", labels)
+    np.testing.assert_array_equal(
+        tifffile.imread(tmp_path / "labels.tif"), expected
+    )
+    # at most a tile of rows of a frame
+    assert labels.largest_read == 16 * 50
+
+
+def test_results_smaller_than_json(tmp_path):
+    rng = np.random.default_rng(1)
+    data = [rng.uniform(0, 1000, (8, 2)) for _ in range(2000)]
+    write_splineit(tmp_path / "results.splineit", data, z_index=range(2000))
+    write_results(
+        tmp_path / "results.npz",
+        labels=np.zeros((8, 8), "uint8"),
+        data=data,
+        z_index=range(2000),
+    )
+    with open(tmp_path / "results.splineit") as f:
+        assert len(json.load(f)["data"]) == len(data)
+    assert (tmp_path / "results.npz").stat().st_size < (
+        tmp_path / "results.splineit"
+    ).stat().st_size / 2
@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import tifffile
+
+from napari_splinedist._tests.test_results_io import LazyLabels
+from napari_splinedist.utils.rasterize import rasterize_polygons
+from napari_splinedist.utils.results_io import read_results
+from napari_splinedist.utils.saving import (
+    FrameSplines,
+    ResultsSnapshot,
+    save_results,
+)
+
+
+def _square(y, x, size):
+    return np.array(
+        [[y, x], [y, x + size], [y + size, x + size], [y + size, x]], float
+    )
+
+
+def test_snapshot_is_a_copy():
+    labels = np.ones((20, 20), "int32")
+    data = [_square(2, 2, 5)]
+    snapshot = ResultsSnapshot(labels, [FrameSplines(data)])
+    labels[:] = 0
+    data[0][:] = 0
+    assert snapshot.labels.sum() == 400
+    assert snapshot.splines[0].data[0].sum() > 0
+    assert not snapshot.is_out_of_core
+
+
+def test_snapshot_references_lazy_labels():
+    labels = LazyLabels(np.ones((20, 20), "int32"))
+    snapshot = ResultsSnapshot(labels, [FrameSplines([])])
+    assert snapshot.labels is labels
+    assert snapshot.is_out_of_core
+
+
+def test_save_stack(tmp_path):
+    labels = np.zeros((2, 20, 30), "int32")
+    labels[:, 2:8, 2:8] = 1
+    edited = [_square(10, 10, 6), _square(1, 20, 5)]
+    splines = [
+        FrameSplines([_square(2, 2, 6)]),
+        FrameSplines(edited, z_index=[1, 0], opacity=0.5),
+    ]
+    snapshot = ResultsSnapshot(
+        labels,
+        splines,
+        frame_shape=(2,),
+        edited_frame=(1,),
+        edited_polygons=edited,
+        edited_z_index=[1, 0],
+    )
+    expected = labels.copy()
+    expected[1] = rasterize_polygons(edited, (20, 30), z_index=[1, 0])
+
+    progress = []
+    paths = save_results(
+        snapshot,
+        tmp_path / "out.splineit",
+        progress_callback=lambda name, p: progress.append(name),
+    )
+    assert [p.name for p in paths] == [
+        "out_0.splineit",
+        "out_1.splineit",
+        "out.tif",
+    ]
+    np.testing.assert_array_equal(tifffile.imread(paths[-1]), expected)
+    with open(paths[1]) as f:
+        assert json.load(f)["z_index"] == [1, 0]
+    assert "save splines" in progress and "save labels" in progress
+
+    save_results(snapshot, tmp_path / "out.npz")
+    results = read_results(tmp_path / "out.npz")
+    np.testing.assert_array_equal(results["labels"], expected)
+    np.testing.assert_array_equal(results["frame"], [0, 1, 1])
+    np.testing.assert_array_equal(results["z_index"], [0, 1, 0])
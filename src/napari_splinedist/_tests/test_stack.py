@@ -0,0 +1,111 @@
+import threading
+
+import numpy as np
+
+from napari_splinedist.config.config import ModelModel
+from napari_splinedist.model.predict import predict
+from napari_splinedist.model.results import (
+    coords_from_details,
+    transform_stack_results,
+)
+from napari_splinedist.model.stack import (
+    _prefetched,
+    frame_shape,
+    is_rgb,
+    iter_predict_stack,
+    predict_stack,
+)
+
+PARAMETERS = dict(
+    normalize_image=True,
+    percentile_low=1.0,
+    percentile_high=99.8,
+    invert_image=False,
+    prob_thresh=0.5,
+    nms_thresh=0.5,
+    model_meta=ModelModel(name="tiny", in_channels=1, sources=[]),
+)
+
+
+def test_frame_shape():
+    assert frame_shape((64, 64), 1) == ()
+    assert frame_shape((64, 64, 3), 1) == ()
+    assert frame_shape((5, 64, 64), 1) == (5,)
+    assert frame_shape((5, 64, 64, 3), 1) == (5,)
+    assert frame_shape((2, 5, 64, 64), 1) == (2, 5)
+    # two channels are only color channels for a 2-channel model
+    assert frame_shape((5, 64, 2), 1) == (5,)
+    assert frame_shape((5, 64, 64, 2), 2) == (5,)
+    # the rgb flag of the layer has precedence over guessing
+    assert frame_shape((5, 64, 3), 1, rgb=False) == (5,)
+    assert not is_rgb((64, 64), 3)
+
+
+def test_prefetched_keeps_order():
+    main_thread = threading.get_ident()
+    threads = []
+
+    def fn(item):
+        threads.append(threading.get_ident())
+        return item * 2
+
+    assert list(_prefetched(fn, list(range(10)))) == list(range(0, 20, 2))
+    assert main_thread not in threads
+    assert list(_prefetched(fn, [])) == []
+
+
+def test_predict_stack_matches_predict(tiny_model_path, blobs_image):
+    stack = np.stack(
+        [blobs_image, np.flipud(blobs_image), np.fliplr(blobs_image)]
+    )
+
+    labels, details_list = predict_stack(
+        stack, model_path=tiny_model_path, **PARAMETERS
+    )
+    assert labels.shape == stack.shape
+    assert len(details_list) == len(stack)
+
+    for i, frame in enumerate(stack):
+        frame_labels, frame_details = predict(
+            frame, model_path=tiny_model_path, **PARAMETERS
+        )
+        np.testing.assert_array_equal(labels[i], frame_labels)
+        np.testing.assert_allclose(
+            details_list[i]["coord"], frame_details["coord"]
+        )
+
+    # the visible part of all frames is pasted into the full labels
+    slicing = (slice(None), slice(10, 60), slice(20, 90))
+    sub_labels, sub_details = predict_stack(
+        stack[slicing], model_path=tiny_model_path, **PARAMETERS
+    )
+    full_labels, coords = transform_stack_results(
+        sub_labels, sub_details, slicing, stack.shape
+    )
+    assert full_labels.shape == stack.shape
+    assert full_labels[:, 0:10].max() == 0
+    np.testing.assert_array_equal(full_labels[slicing], sub_labels)
+    assert len(coords) == len(stack)
+    for frame_coords, details in zip(coords, sub_details):
+        local_coords = coords_from_details(details)
+        assert len(frame_coords) == len(local_coords)
+        for points, local_points in zip(frame_coords, local_coords):
+            np.testing.assert_allclose(points, local_points + [10, 20])
+
+
+def test_iter_predict_stack_yields_each_frame(tiny_model_path, blobs_image):
+    stack = np.stack([blobs_image, np.flipud(blobs_image)])
+    expected, expected_details = predict_stack(
+        stack, model_path=tiny_model_path, **PARAMETERS
+    )
+
+    n_yielded = 0
+    for labels, details_list in iter_predict_stack(
+        stack, model_path=tiny_model_path, **PARAMETERS
+    ):
+        n_yielded += 1
+        # the frames done so far, the others are still empty
+        assert len(details_list) == n_yielded
+        np.testing.assert_array_equal(labels[:n_yielded], expected[:n_yielded])
+        assert labels[n_yielded:].max(initial=0) == 0
+    assert n_yielded == len(stack)
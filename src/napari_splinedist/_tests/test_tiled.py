@@ -0,0 +1,256 @@
+import numpy as np
+import pytest
+from skimage.measure import label, regionprops
+
+from napari_splinedist.config.config import ModelModel
+from napari_splinedist.model import tiled
+from napari_splinedist.model.normalize import DEFAULT_MAX_SAMPLES
+from napari_splinedist.model.predict import predict
+from napari_splinedist.model.preprocess import preprocess
+from napari_splinedist.model.tiled import (
+    TiledPrediction,
+    clean_labels_dir,
+    iter_predict_tiled,
+    new_labels_file,
+    open_labels_output,
+    predict_tiled,
+    remove_labels_file,
+    sliced_shape,
+    tile_slices,
+    tiles_in_view,
+)
+
+MODEL_META = ModelModel(name="tiny", in_channels=1, sources=[])
+PARAMETERS = dict(
+    normalize_image=False,
+    percentile_low=1.0,
+    percentile_high=99.8,
+    invert_image=False,
+    prob_thresh=0.5,
+    nms_thresh=0.3,
+    model_meta=MODEL_META,
+)
+M = 6
+
+
+class FakeModel(object):
+    """finds the bright disks in a tile.
+    The centers are moved by `jitter` pixels towards the center of
+    the tile, st. objects on a seam are found by both tiles
+    """
+
+    def __init__(self, jitter=0):
+        self.jitter = jitter
+
+    def predict_instances(self, img, prob_thresh, nms_thresh, n_tiles):
+        labels = label(img > 0.5)
+        center = np.array(img.shape) / 2
+        coord, points, prob = [], [], []
+        for region in regionprops(labels):
+            c = np.array(region.centroid)
+            radius = np.sqrt(region.area / np.pi)
+            angles = 2 * np.pi * np.arange(M) / M
+            coord.append(
+                c[:, None]
+                + radius * np.stack([np.sin(angles), np.cos(angles)])
+            )
+            c = c + self.jitter * np.sign(center - c)
+            points.append(np.round(c).astype(int))
+            prob.append(region.area)
+        return labels, dict(
+            coord=np.array(coord).reshape(-1, 2, M),
+            points=np.array(points, dtype=int).reshape(-1, 2),
+            prob=np.array(prob, dtype="float32"),
+        )
+
+
+def _disks(shape, centers, radius=6):
+    yy, xx = np.mgrid[0 : shape[0], 0 : shape[1]]
+    image = np.zeros(shape, dtype="float32")
+    for cy, cx in centers:
+        image[(yy - cy) ** 2 + (xx - cx) ** 2 < radius**2] = 1.0
+    return image
+
+
+def test_tile_slices_cover_image():
+    shape = (100, 70)
+    covered = np.zeros(shape, dtype=int)
+    for _, core, read in tile_slices(shape, (32, 32), halo=8):
+        covered[core] += 1
+        assert read[0].start <= core[0].start and read[0].stop >= core[0].stop
+    assert np.all(covered == 1)
+
+
+@pytest.mark.parametrize("jitter", [0, 2])
+def test_objects_on_seams_appear_once(tmp_path, monkeypatch, jitter):
+    monkeypatch.setattr(
+        tiled, "build_model", lambda **kwargs: FakeModel(jitter)
+    )
+    # disks on the seams (32, 64) and on a corner of four tiles
+    centers = [(32, 20), (50, 64), (64, 64), (90, 32), (15, 80)]
+    data = _disks((128, 112), centers)
+
+    image = np.lib.format.open_memmap(
+        tmp_path / "image.npy", mode="w+", dtype=data.dtype, shape=data.shape
+    )
+    image[:] = data
+    labels_out = open_labels_output(tmp_path / "labels.npy", data.shape)
+
+    labels, details = predict_tiled(
+        image,
+        model_path=tmp_path,
+        tile_shape=(32, 32),
+        halo=16,
+        labels_out=labels_out,
+        **PARAMETERS,
+    )
+    assert labels is labels_out
+    assert len(details["label"]) == len(centers)
+    np.testing.assert_array_equal(
+        np.unique(labels[labels > 0]), np.sort(details["label"])
+    )
+    # each object is painted as a whole (and not cut at the seams)
+    for (cy, cx), label_id in zip(
+        np.array(centers)[np.argsort([c[0] for c in centers])],
+        details["label"][np.argsort(details["points"][:, 0])],
+    ):
+        assert labels[cy, cx] == label_id
+    np.testing.assert_array_equal(labels > 0, data > 0.5)
+
+
+@pytest.mark.parametrize("normalize_mode", ["exact", "fast"])
+@pytest.mark.parametrize("invert_image", [False, True])
+@pytest.mark.parametrize("shape", [(200, 150), (200, 150, 3)])
+def test_statistics_match_preprocess(normalize_mode, invert_image, shape):
+    rng = np.random.default_rng(5)
+    image = rng.integers(0, 4096, size=shape, dtype="uint16")
+
+    lo, hi, _ = tiled._statistics(
+        image,
+        tile_slices(shape[0:2], (64, 64), 8),
+        model_in_channels=1,
+        normalize_image=True,
+        percentile_low=1.0,
+        percentile_high=99.8,
+        invert_image=invert_image,
+        normalize_mode=normalize_mode,
+        max_samples=DEFAULT_MAX_SAMPLES,
+        progress_callback=None,
+    )
+    # the percentiles of the whole preprocessed image
+    expected = preprocess(image, 1, False, 0, 0, invert_image)
+    np.testing.assert_allclose(
+        np.ravel([lo, hi]), np.percentile(expected, (1.0, 99.8)), rtol=1e-5
+    )
+
+
+def test_sliced_shape():
+    data = np.zeros((3, 100, 70))
+    for slicing in [
+        (slice(None), slice(40, 60), slice(10, 40)),
+        (slice(1, 2), slice(90, 120), slice(-20, None)),
+        (slice(None), slice(50, 60)),
+    ]:
+        assert sliced_shape(data.shape, slicing) == data[slicing].shape
+
+
+def test_labels_files(tmp_path, monkeypatch):
+    labels_dir = tmp_path / "labels"
+    first = new_labels_file(labels_dir)
+    second = new_labels_file(labels_dir)
+    labels = open_labels_output(first, (8, 8))
+    labels[2, 3] = 5
+
+    # like windows, where a memory mapped file can not be removed
+    def unlink(self, missing_ok=False):
+        raise PermissionError(str(self))
+
+    with monkeypatch.context() as m:
+        m.setattr(tiled.Path, "unlink", unlink)
+        assert not remove_labels_file(first)
+    assert remove_labels_file(first)
+    # a file which is gone already
+    assert remove_labels_file(first)
+
+    # the files of earlier sessions
+    assert list(labels_dir.iterdir()) == [tiled.Path(second)]
+    clean_labels_dir(labels_dir)
+    assert list(labels_dir.iterdir()) == []
+    clean_labels_dir(tmp_path / "missing")
+
+
+def test_tiles_in_view():
+    tiles = tile_slices((100, 70), (32, 32), halo=8)
+    view = (slice(40, 60), slice(10, 40))
+    # the tiles closest to the center of the view come first
+    assert tiles_in_view(tiles, view) == [(1, 0), (1, 1)]
+    assert len(tiles_in_view(tiles, (slice(0, 100), slice(0, 70)))) == 12
+    assert tiles_in_view(tiles, (slice(0, 10), slice(80, 90))) == []
+
+
+def test_tiles_predicted_on_demand(tmp_path, monkeypatch):
+    n_calls = []
+
+    def build_model(**kwargs):
+        n_calls.append(True)
+        return FakeModel(jitter=2)
+
+    monkeypatch.setattr(tiled, "build_model", build_model)
+    centers = [(32, 20), (50, 64), (64, 64), (90, 32), (15, 80)]
+    image = _disks((128, 112), centers)
+    parameters = dict(
+        model_path=tmp_path, tile_shape=(32, 32), halo=16, **PARAMETERS
+    )
+    expected, expected_details = predict_tiled(image, **parameters)
+
+    prediction = TiledPrediction(image, **parameters)
+    tiles = [tile_index for tile_index, _, _ in prediction.tiles]
+    # the tiles in view (in any order), the labels build up
+    for tile_index in tiles[::-1][:6]:
+        assert prediction.predict_tile(tile_index)
+    labels, details = prediction.results()
+    assert 0 < len(details["label"]) < len(centers)
+    # predicted tiles are kept
+    assert not prediction.predict_tile(tiles[-1])
+
+    for tile_index in tiles:
+        prediction.predict_tile(tile_index)
+    labels, details = prediction.results()
+    assert prediction.done == set(tiles)
+    assert len(details["label"]) == len(centers)
+    np.testing.assert_array_equal(labels > 0, expected > 0)
+    # the model is built once per prediction
+    assert len(n_calls) == 2
+
+
+def test_iter_predict_tiled_yields_each_tile(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        tiled, "build_model", lambda **kwargs: FakeModel(jitter=2)
+    )
+    centers = [(32, 20), (50, 64), (90, 32)]
+    image = _disks((96, 80), centers)
+    parameters = dict(
+        model_path=tmp_path, tile_shape=(32, 32), halo=16, **PARAMETERS
+    )
+    expected, _ = predict_tiled(image, **parameters)
+
+    n_done = []
+    for prediction in iter_predict_tiled(image, **parameters):
+        n_done.append(len(prediction.done))
+    assert n_done == list(range(1, len(prediction.tiles) + 1))
+    labels, details = prediction.results()
+    assert len(details["label"]) == len(centers)
+    np.testing.assert_array_equal(labels, expected)
+
+
+def test_single_tile_matches_predict(tiny_model_path, blobs_image):
+    parameters = dict(
+        PARAMETERS, normalize_image=True, model_path=tiny_model_path
+    )
+    expected_labels, expected = predict(blobs_image, **parameters)
+    labels, details = predict_tiled(
+        blobs_image, tile_shape=(128, 128), **parameters
+    )
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(details["coord"], expected["coord"])
+    np.testing.assert_array_equal(details["points"], expected["points"])
@@ -0,0 +1,88 @@
+import numpy as np
+
+from napari_splinedist._cli import _build_parser
+from napari_splinedist.config.config import ModelModel
+from napari_splinedist.model.predict import predict
+from napari_splinedist.model.tiling import (
+    choose_n_tiles,
+    estimate_prediction_bytes,
+    load_network_config,
+)
+
+# the defaults of `splinedist.models.Config2D` with 8 control points
+CONFIG = dict(
+    grid=(2, 2),
+    n_channel_in=1,
+    unet_n_depth=3,
+    unet_kernel_size=(3, 3),
+    unet_n_filter_base=32,
+    unet_n_conv_per_depth=2,
+    unet_pool=(2, 2),
+    net_conv_after_unet=128,
+    n_params=16,
+)
+
+
+def test_more_tiles_need_less_memory():
+    shape = (4096, 4096)
+    n_bytes = [
+        estimate_prediction_bytes(CONFIG, shape, (n, n)) for n in (1, 2, 4, 8)
+    ]
+    assert n_bytes == sorted(n_bytes, reverse=True)
+    assert n_bytes[0] > 2 * n_bytes[-1]
+
+
+def test_choose_n_tiles():
+    shape = (4096, 3000)
+
+    # no tiling is needed when the budget is large enough
+    n_tiles, n_bytes = choose_n_tiles(CONFIG, shape, budget=1024**4)
+    assert n_tiles is None
+    assert n_bytes == estimate_prediction_bytes(CONFIG, shape)
+
+    # the chosen tiling fits into the budget
+    budget = estimate_prediction_bytes(CONFIG, shape) // 3
+    n_tiles, n_bytes = choose_n_tiles(CONFIG, shape, budget=budget)
+    assert n_tiles is not None
+    assert n_bytes <= budget
+    # and no tiling with fewer tiles does
+    for ny in range(1, n_tiles[0] + 1):
+        for nx in range(1, n_tiles[1] + 1):
+            if ny * nx < n_tiles[0] * n_tiles[1]:
+                assert (
+                    estimate_prediction_bytes(CONFIG, shape, (ny, nx)) > budget
+                )
+
+    # an impossible budget gives the smallest footprint
+    n_tiles, _ = choose_n_tiles(CONFIG, shape, budget=1, max_tiles=4)
+    assert n_tiles == (4, 4)
+
+
+def test_auto_tiles_prediction(tiny_model_path, blobs_image):
+    config = load_network_config(tiny_model_path)
+    assert config["unet_n_depth"] == 1
+    assert config["n_params"] == 12
+
+    labels, details = predict(
+        blobs_image,
+        model_path=tiny_model_path,
+        normalize_image=True,
+        percentile_low=1.0,
+        percentile_high=99.8,
+        invert_image=False,
+        prob_thresh=0.5,
+        nms_thresh=0.5,
+        model_meta=ModelModel(name="tiny", in_channels=1, sources=[]),
+        n_tiles="auto",
+        memory_budget=estimate_prediction_bytes(config, (96, 96)) // 2,
+    )
+    assert labels.shape == blobs_image.shape
+    assert len(details["coord"]) == len(np.unique(labels)) - 1
+
+
+def test_cli_auto_tiles():
+    args = _build_parser().parse_args(
+        ["img.png", "-o", "out", "--auto-tiles", "--memory-budget", "2"]
+    )
+    assert args.n_tiles == "auto"
+    assert args.memory_budget == 2.0
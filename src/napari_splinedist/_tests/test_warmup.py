@@ -0,0 +1,18 @@
+from napari_splinedist.model.predict import MODEL_CACHE, build_model
+from napari_splinedist.model.warmup import warm_up, warmup_shape
+
+
+def test_warmup_shape(tiny_model_path):
+    # unet_n_depth=1 and grid (2, 2): divisible by 4
+    assert warmup_shape(tiny_model_path, (97, 30)) == (100, 32)
+    assert warmup_shape(tiny_model_path) == (256, 256)
+    # at most a tile
+    assert warmup_shape(tiny_model_path, (5000, 64)) == (1024, 64)
+
+
+def test_warm_up(tiny_model_path):
+    MODEL_CACHE.clear()
+    model = warm_up(tiny_model_path, image_shape=(60, 60))
+    assert (tiny_model_path, (2, 2)) in MODEL_CACHE
+    # the run takes the warm model from the cache
+    assert build_model(tiny_model_path) is model
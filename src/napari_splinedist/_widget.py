@@ -1,21 +1,9 @@
-from pathlib import Path
-
 import numpy as np
-from napari.layers import Image as ImageLayer
+from napari.layers import Labels as LabelsLayer
 from napari.layers.shapes.shapes import Mode
 from napari.qt.threading import GeneratorWorker as NapariGeneratorWorker
 from napari.qt.threading import thread_worker
-from napari_splineit._writer import write_splineit
-from napari_splineit.interpolation import (
-    interpolator_factory as splineit_interpolator_factory,
-)
-from napari_splineit.interpolation.uhlmann import knots_from_coefs
-from napari_splineit.layer.layer_factory import (
-    layer_factory as splineit_layer_factory,
-)
-from napari_splineit.widgets.double_spin_slider import DoubleSpinSlider
-from napari_splineit.widgets.spin_slider import SpinSlider
-from qtpy.QtCore import QObject, Signal
+from qtpy.QtCore import QObject, QTimer, Signal
 from qtpy.QtGui import QColor
 from qtpy.QtWidgets import (
     QCheckBox,
@@ -27,19 +15,59 @@ from qtpy.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-from skimage import io as skimage_io
 
 from ._logging import logger
-from .config.config import APPDIR, CONFIG
-from .exceptions import NoInputImageException
+from .config.appdir import APPDIR
+from .config.config import load_config
+from .exceptions import NoInputImageException, PredictionCancelled
+from .model.multiscale import (
+    choose_level,
+    full_resolution_slicing,
+    level_slicing,
+)
+from .model.outputs import OUTPUT_CACHE
 from .model.predict import predict
-from .utils.colormap import make_colormap
+from .model.results import (
+    coords_from_details,
+    transform_results,
+    transform_stack_results,
+)
+from .model.stack import frame_shape, iter_predict_stack
+from .model.tiled import (
+    DEFAULT_HALO,
+    DEFAULT_TILE_SHAPE,
+    TiledPrediction,
+    clean_labels_dir,
+    is_out_of_core,
+    iter_predict_tiled,
+    new_labels_file,
+    open_labels_output,
+    remove_labels_file,
+    sliced_shape,
+    tile_slices,
+    tiles_in_view,
+)
+from .model.tiling import auto_n_tiles, default_memory_budget, total_memory
+from .model.warmup import warm_up
+from .utils.labels import compact_labels, label_dtype
+from .utils.rasterize import (
+    LabelsSync,
+    labels_from_shapes,
+    scaled_polygons,
+)
+from .utils.results_io import RESULTS_SUFFIX
+from .utils.saving import FrameSplines, ResultsSnapshot, save_results
+from .utils.throttle import Throttle
 from .widgets.color_picker_push_button import ColorPicklerPushButton
 from .widgets.image_layer_combo_box import ImageLayerComboBox
 from .widgets.model_download_widget import ModelDownloadWidget
 from .widgets.progress_widget import ProgressWidget
 from .widgets.rotating_logo_widget import RotatingLogoWidget
 
+# the minimal time (in seconds) between two updates of the
+# results while a prediction runs
+PARTIAL_RESULTS_INTERVAL = 1.0
+
 
 class GeneratorWorker(NapariGeneratorWorker):
 
@@ -88,11 +116,20 @@ class SplineDistWidget(QWidget):
         # this widget is used to select models.
         # The selected model is downloaded (only once, results
         # are cached on file)
-        self._model_download_widget.setModelsMeta(CONFIG.models)
+        self._model_download_widget.setModelsMeta(load_config().models)
 
         # the main worker where splinedist is run
         self.worker = None
 
+        # builds the selected model and runs the network
+        # once before the first run
+        self._warmup_worker = None
+
+        # the worker which saves the results and whether it
+        # reads the labels file of the last run
+        self._save_worker = None
+        self._saving_labels_file = False
+
         # The result layers:
         # - labels_layer shows the pixelized objects
         # - ctlr_layer are the controll points
@@ -104,15 +141,43 @@ class SplineDistWidget(QWidget):
         # the last results
         self._last_results = None
 
+        # the layer and the arguments of the last run
+        # (none if the network outputs are not cached)
+        self._last_run = None
+
+        # the shape of the frame axes of the last results (empty for
+        # a single 2D image) and the frame shown in the splineit layers
+        self._frame_shape = ()
+        self._pending_frame_shape = ()
+        self._edit_frame = ()
+
+        # the (YX) downsample factors of the pyramid level of the last
+        # results (none if the input is not multiscale)
+        self._downsample = None
+        self._pending_downsample = None
+
+        # keeps the labels in sync with the edited splines (none until
+        # the labels are first updated from the splines)
+        self._labels_sync = None
+
+        # the file with the labels of the last out-of-core
+        # prediction and the file of a currently running one
+        # (the files of earlier sessions are removed, and files
+        # which could not be removed yet are retried later)
+        self._labels_file = None
+        self._pending_labels_file = None
+        self._stale_labels_files = []
+        clean_labels_dir()
+
+        # the tiles predicted while following the view (the tiles
+        # are kept as long as the layer and the parameters are the same)
+        self._tiled_prediction = None
+        self._tiled_prediction_key = None
+
         # the ctrl_layer / interpolated_layer
         # is only updte
         self._ctrl_layer_is_up_to_date = False
 
-        # colormap with inital size to avoid
-        # recomputation
-        self._colormap_capacity = 1000
-        self._colormap = make_colormap(mx=self._colormap_capacity)
-
     def _init_ui(self, edge_color, face_color):
         """Initialize UI components
 
@@ -172,6 +237,13 @@ class SplineDistWidget(QWidget):
         # to select on which input image we run spinedist
         self._input_image_combo_box = ImageLayerComboBox(self.viewer)
 
+        # importing napari_splineit imports all of it (ie the layers),
+        # we defer this until the widget is created
+        from napari_splineit.widgets.double_spin_slider import (
+            DoubleSpinSlider,
+        )
+        from napari_splineit.widgets.spin_slider import SpinSlider
+
         # to select the model which shall be used
         self._model_download_widget = ModelDownloadWidget(APPDIR)
 
@@ -183,6 +255,12 @@ class SplineDistWidget(QWidget):
         self._low_quantile_slider = DoubleSpinSlider([0, 1], 0.01)
         self._high_quantile_slider = DoubleSpinSlider([0, 1], 0.998)
 
+        # estimate the percentiles in a single streaming pass
+        # instead of computing them exactly (default no).
+        # This is much faster for very large images
+        self._fast_normalize_cb = QCheckBox()
+        self._fast_normalize_cb.setChecked(False)
+
         # should image be inverted (default no)
         self._invert_img_cb = QCheckBox()
         self._invert_img_cb.setChecked(False)
@@ -193,17 +271,63 @@ class SplineDistWidget(QWidget):
         # slider for non-max. supression
         self._nms_thresh_slider = DoubleSpinSlider([0, 1.0], 0.5)
 
+        # should the results be updated while the thresholds
+        # are changed (default yes)? The network outputs of the last
+        # run are cached, st. only the non-max. supression is rerun
+        self._live_thresholds_cb = QCheckBox()
+        self._live_thresholds_cb.setChecked(True)
+
+        # the thresholds are applied once the sliders did
+        # not move for a moment
+        self._thresholds_timer = QTimer(self)
+        self._thresholds_timer.setSingleShot(True)
+        self._thresholds_timer.setInterval(150)
+
         # should splinedist only be run of the visible
         # part of the image (default no)
         self._run_on_visible_only_cb = QCheckBox()
         self._run_on_visible_only_cb.setChecked(False)
 
+        # should the tiles which come into view be predicted
+        # while panning / zooming (default no)?
+        self._follow_view_cb = QCheckBox()
+        self._follow_view_cb.setChecked(False)
+
+        # the tiles in view are predicted once the camera
+        # did not move for a moment
+        self._view_timer = QTimer(self)
+        self._view_timer.setSingleShot(True)
+        self._view_timer.setInterval(300)
+
         # should the prediction be done on tiles?
         # (if both x and y tiles are 1, we do not used
         # tiled prediction on the whole image)
         self._n_tiles_x = SpinSlider([1, 10], 1)
         self._n_tiles_y = SpinSlider([1, 10], 1)
 
+        # should the number of tiles be chosen automatically
+        # from the memory budget (default yes)?
+        # When checked, the #tiles sliders are disabled
+        self._auto_tiles_cb = QCheckBox()
+        self._auto_tiles_cb.setChecked(True)
+        self._n_tiles_x.setEnabled(False)
+        self._n_tiles_y.setEnabled(False)
+
+        # the memory budget (in GB) for the automatic tiling
+        # (default: half of the memory available at startup)
+        max_budget = max(1.0, round(total_memory() / 1024**3, 1))
+        budget = round(default_memory_budget() / 1024**3, 1)
+        self._memory_budget_slider = DoubleSpinSlider(
+            [0.5, max_budget], min(max(budget, 0.5), max_budget)
+        )
+
+        # shows the tiling used in the last run
+        self._n_tiles_label = QLabel("-")
+
+        # shows whether the selected model is built and
+        # the network ran once (see `_start_warmup`)
+        self._model_state_label = QLabel("-")
+
         # select the edge and face color of the interpolated slines
         # tracking=True means that the "events are fired live"
         # st. one see the  change of the color of the splines
@@ -218,6 +342,11 @@ class SplineDistWidget(QWidget):
         # run splineit
         self._run_button = QPushButton("run")
 
+        # stop the running prediction (after the current tile),
+        # this is only enabled while a prediction is running
+        self._cancel_button = QPushButton("Cancel")
+        self._cancel_button.setEnabled(False)
+
         # to show some progress
         self._progress_widget = ProgressWidget(self)
 
@@ -244,18 +373,26 @@ class SplineDistWidget(QWidget):
         # add all the widgets to the form widget
         form.addRow("Input Image", self._input_image_combo_box)
         form.addRow("Select Model", self._model_download_widget)
+        form.addRow("Model State", self._model_state_label)
         form.addRow("Normalize Image", self._normalize_img_cb)
         form.addRow("Percentile Low", self._low_quantile_slider)
         form.addRow("Percentile High", self._high_quantile_slider)
+        form.addRow("Fast Normalize", self._fast_normalize_cb)
         form.addRow("Invert Image", self._invert_img_cb)
         form.addRow("Prob Threshold", self._prob_thresh_slider)
         form.addRow("NMS threshold", self._nms_thresh_slider)
+        form.addRow("Live Thresholds", self._live_thresholds_cb)
         form.addRow("On Visible Only", self._run_on_visible_only_cb)
+        form.addRow("Follow View", self._follow_view_cb)
+        form.addRow("Auto Tiles", self._auto_tiles_cb)
+        form.addRow("RAM Budget (GB)", self._memory_budget_slider)
         form.addRow("#tiles-x", self._n_tiles_x)
         form.addRow("#tiles-y", self._n_tiles_y)
+        form.addRow("Tiles Used", self._n_tiles_label)
         form.addRow("Edge Color", self._edge_color_sel)
         form.addRow("Face Color", self._face_color_sel)
         form.addRow("Run", self._run_button)
+        form.addRow("Cancel", self._cancel_button)
         form.addRow("Progress", self._progress_widget)
         form.addRow("Save", self._save_button)
         form.addRow("Edit", self._edit_button)
@@ -269,10 +406,22 @@ class SplineDistWidget(QWidget):
         # trigger the start of the computation
         self._run_button.clicked.connect(self._on_run)
 
+        # stop the computation
+        self._cancel_button.clicked.connect(self._on_cancel)
+
         # when a new color is selected
         self._edge_color_sel.colorChanged.connect(self._on_edge_color_changed)
         self._face_color_sel.colorChanged.connect(self._on_face_color_changed)
 
+        # the #tiles sliders are only used without auto tiling
+        def on_auto_tiles_changed(state):
+            auto = self._auto_tiles_cb.isChecked()
+            self._n_tiles_x.setEnabled(not auto)
+            self._n_tiles_y.setEnabled(not auto)
+            self._memory_budget_slider.setEnabled(auto)
+
+        self._auto_tiles_cb.stateChanged.connect(on_auto_tiles_changed)
+
         # when a layer is removed from layerlist by a user
         # (the thing on the left in napari)
         def on_layer_removed(event):
@@ -297,8 +446,10 @@ class SplineDistWidget(QWidget):
         def model_availablity_changed(is_available):
             if is_available:
                 self._run_button.setEnabled(True)
+                self._start_warmup()
             else:
                 self._run_button.setEnabled(False)
+                self._model_state_label.setText("-")
 
         self._model_download_widget.model_availablity_changed.connect(
             model_availablity_changed
@@ -316,6 +467,15 @@ class SplineDistWidget(QWidget):
         # save the results
         self._save_button.clicked.connect(self._on_save)
 
+        # rerun the non-max. supression when the thresholds change
+        def on_thresholds_changed(value):
+            if self._live_thresholds_cb.isChecked() and self._last_run:
+                self._thresholds_timer.start()
+
+        self._prob_thresh_slider.valueChanged.connect(on_thresholds_changed)
+        self._nms_thresh_slider.valueChanged.connect(on_thresholds_changed)
+        self._thresholds_timer.timeout.connect(self._on_thresholds_changed)
+
         # when users edit the splines in the splineit layer,
         # one can update the pixel layer to follow the splines
         def on_update_labels():
@@ -324,86 +484,214 @@ class SplineDistWidget(QWidget):
                 self.interpolated_layer is not None
                 and self.labels_layer is not None
             ):
-                input_data_shape = self._get_input_layer().data.shape[0:2]
-                # we use naparis function to convert the splines to labels
-                labels = self.interpolated_layer.to_labels(
-                    labels_shape=input_data_shape
+                # (the splines are in full resolution, the labels of
+                # multiscale layers are those of a pyramid level)
+                polygons = scaled_polygons(
+                    self.interpolated_layer.data, self._downsample
+                )
+                z_index = self.interpolated_layer.z_index
+                if (
+                    self._labels_sync is not None
+                    and len(polygons)
+                    <= np.iinfo(self._labels_sync.labels.dtype).max
+                ):
+                    # only redraw the objects which were edited
+                    n_changed = self._labels_sync.update(polygons, z_index)
+                    logger.info(f"redraw {n_changed} edited objects")
+                    self.labels_layer.refresh()
+                    return
+
+                input_data_shape = self._last_results[0].shape[-2:]
+                # convert the (interpolated) splines to labels
+                labels = labels_from_shapes(
+                    self.interpolated_layer,
+                    input_data_shape,
+                    downsample=self._downsample,
                 )
-                self.labels_layer.data = labels
+                if self._frame_shape:
+                    # the splines belong to a single frame of the stack
+                    data = self.labels_layer.data
+                    if len(polygons) > np.iinfo(data.dtype).max:
+                        # more objects than the dtype of the stack holds
+                        data = data.astype(label_dtype(len(polygons)))
+                        self.labels_layer.data = data
+                    data[self._edit_frame] = labels
+                    self.labels_layer.refresh()
+                    labels = data[self._edit_frame]
+                else:
+                    self.labels_layer.data = compact_labels(
+                        labels, len(polygons)
+                    )
+                    labels = self.labels_layer.data
+                self._labels_sync = LabelsSync(labels, polygons, z_index)
 
         self._update_labels_button.clicked.connect(on_update_labels)
 
+        # predict the tiles which come into view
+        def on_camera_changed(event):
+            if (
+                self._follow_view_cb.isChecked()
+                and self._tiled_prediction_key is not None
+            ):
+                self._view_timer.start()
+
+        self.viewer.camera.events.center.connect(on_camera_changed)
+        self.viewer.camera.events.zoom.connect(on_camera_changed)
+        self._view_timer.timeout.connect(self._on_view_changed)
+
     def _on_save(self):
         """this is triggered when the save button is pressed.
         This will open a file dialog. This filedialog will ask
         the user specify a filename.
         The extension ".splineit" (the one splineit accepts)
-        is added by default
+        is added by default, with ".npz" the labels and the splines
+        are saved in a single compressed file (see `write_results`).
+        The files are written in a worker thread (see `save_results`)
         """
         dlg = QFileDialog()
         dlg.setFileMode(QFileDialog.AnyFile)
         dlg.setAcceptMode(QFileDialog.AcceptSave)
         dlg.setDefaultSuffix("splineit")
-        dlg.setNameFilters(["SPLINEIT (*.splineit)"])
+        dlg.setNameFilters(
+            [
+                "SPLINEIT (*.splineit)",
+                f"SplineDist results (*{RESULTS_SUFFIX})",
+            ]
+        )
         if dlg.exec_():
-            filename = str(dlg.selectedFiles()[0])
-            filename_json = Path(filename)
-            filename_png = Path(f"{filename.removesuffix('.splineit')}.png")
-
-            # if there is an up to date ctrl-layer we
-            # need to take the results from there since the user might
-            # have changed some splines (ie erased some object
-            # or changed controll points etc)
-            if self._ctrl_layer_is_up_to_date and self.ctrl_layer is not None:
-
-                # use splineits function to save the results
-                write_splineit(
-                    path=dlg.selectedFiles()[0],
-                    data=self.ctrl_layer.data,
-                    interpolator=self.ctrl_layer.interpolator,
-                    z_index=self.ctrl_layer.z_index,
-                    edge_color=self.interpolated_layer.edge_color,
-                    face_color=self.interpolated_layer.face_color,
-                    edge_width=self.interpolated_layer.edge_width,
-                    opacity=self.interpolated_layer.opacity,
-                )
+            self._start_save_worker(str(dlg.selectedFiles()[0]))
 
-                # we use naparis function to convert the splines to labels
-                labels = self.interpolated_layer.to_labels(
-                    labels_shape=self._last_results[0].shape
-                )
-                data_uint16 = labels.astype(np.uint16)
-                skimage_io.imsave(
-                    filename_png, data_uint16, check_contrast=False
-                )
+    def _results_snapshot(self):
+        """copy the results to save (the layers might change while
+        they are saved in the worker thread)
 
-            else:
-                # if there is no ctrl-layer we take the last results and
-                # save them
-                n_polygons = len(self._last_results[1])
-                edge_color = [float(c) for c in self._edge_color_sel.asArray()]
-                face_color = [float(c) for c in self._face_color_sel.asArray()]
-                edge_color = [edge_color] * n_polygons
-                face_color = [face_color] * n_polygons
-
-                write_splineit(
-                    path=filename_json,
-                    interpolator=self._interpolator_factory(),
-                    data=self._last_results[1],
-                    z_index=range(n_polygons),
-                    edge_color=edge_color,
-                    face_color=face_color,
-                )
+        Returns:
+            ResultsSnapshot: the results
+        """
+        labels, coords_list = self._last_results
+        edge_color = [float(c) for c in self._edge_color_sel.asArray()]
+        face_color = [float(c) for c in self._face_color_sel.asArray()]
+
+        def last_splines(coords):
+            # the splines of the last results, ie not edited
+            return FrameSplines(
+                data=coords,
+                edge_color=[edge_color] * len(coords),
+                face_color=[face_color] * len(coords),
+            )
+
+        coords_per_frame = coords_list if self._frame_shape else [coords_list]
+        splines = [last_splines(coords) for coords in coords_per_frame]
+
+        # if there is an up to date ctrl-layer we
+        # need to take the results from there since the user might
+        # have changed some splines (ie erased some object
+        # or changed controll points etc)
+        if not (
+            self._ctrl_layer_is_up_to_date and self.ctrl_layer is not None
+        ):
+            return ResultsSnapshot(labels, splines, self._frame_shape)
+
+        interpolator = self.ctrl_layer.interpolator
+        edited = FrameSplines(
+            data=self.ctrl_layer.data,
+            z_index=self.ctrl_layer.z_index,
+            edge_color=self.interpolated_layer.edge_color,
+            face_color=self.interpolated_layer.face_color,
+            edge_width=self.interpolated_layer.edge_width,
+            opacity=self.interpolated_layer.opacity,
+            interpolator_name=type(interpolator).name,
+            interpolator_args=interpolator.marshal(),
+        )
+        if self._frame_shape:
+            frame = np.ravel_multi_index(self._edit_frame, self._frame_shape)
+            splines[frame] = edited
+        else:
+            splines = [edited]
+        return ResultsSnapshot(
+            labels,
+            splines,
+            self._frame_shape,
+            edited_frame=self._edit_frame,
+            # the labels of the edited frame are rasterized from the
+            # (interpolated) splines
+            edited_polygons=scaled_polygons(
+                self.interpolated_layer.data, self._downsample
+            ),
+            edited_z_index=self.interpolated_layer.z_index,
+        )
+
+    def _start_save_worker(self, filename):
+        """save the results in a worker thread, the user can
+        keep editing while the files are written
 
-                # convert to uint16 st. we can save labels
-                # which are bigger that 255 in a png
-                data_uint16 = self._last_results[0].astype(np.uint16)
-                # save the image (we need to disable check_contrast,
-                # otherwise we get some false postive warnings)
-                skimage_io.imsave(
-                    filename_png, data_uint16, check_contrast=False
+        Args:
+            filename (str): the path selected by the user
+        """
+        snapshot = self._results_snapshot()
+        logger.info(f"save the results to {filename}")
+        self._save_button.setEnabled(False)
+
+        @thread_worker(worker_class=GeneratorWorker)
+        def save_function(snapshot, filename):
+            def progress_callback(name, progress):
+                self._save_worker.extra_signals.progress.emit(
+                    name, int(progress)
                 )
 
+            paths = save_results(
+                snapshot, filename, progress_callback=progress_callback
+            )
+            # a generator worker needs at least one yield
+            yield paths
+
+        self._save_worker = save_function(snapshot, filename)
+        self._save_worker.started.connect(self._on_save_worker_started)
+        self._save_worker.finished.connect(self._on_save_worker_finished)
+        self._save_worker.errored.connect(self._on_save_worker_errored)
+        self._save_worker.yielded.connect(self._on_save_worker_yielded)
+        self._save_worker.extra_signals.progress.connect(
+            self._on_worker_progress
+        )
+        # out-of-core labels are saved from the file of the last run,
+        # ie we must not paint the tiles in view into it meanwhile
+        self._saving_labels_file = snapshot.is_out_of_core
+        self._save_worker.start()
+
+    def _on_save_worker_started(self):
+        self._progress_widget.setProgress("save", 0)
+
+    def _on_save_worker_yielded(self, paths):
+        # the paths are only yielded when everything is written
+        for path in paths:
+            logger.info(f"saved {path}")
+        self._progress_widget.setProgress("saved", 100)
+
+    def _on_save_worker_finished(self):
+        # this is called with and without errors
+        self._save_button.setEnabled(self._last_results is not None)
+        self._saving_labels_file = False
+
+    def _on_save_worker_errored(self, e):
+        self._progress_widget.setProgress("saving failed", 0)
+        raise RuntimeError(e)
+
+    def _current_frame(self):
+        """the index of the frame of the input layer shown in the viewer
+
+        Returns:
+            tuple: the index along the frame axes (empty for 2D images)
+        """
+        if not self._frame_shape:
+            return ()
+        input_layer = self._get_input_layer()
+        # the layer dims are aligned with the last dims of the viewer
+        position = input_layer.world_to_data(self.viewer.dims.point)
+        index = np.round(position[: len(self._frame_shape)]).astype(int)
+        return tuple(
+            int(np.clip(i, 0, s - 1)) for i, s in zip(index, self._frame_shape)
+        )
+
     def _on_edge_color_changed(self, color):
         """called when the user selects a new edge color.
 
@@ -435,16 +723,115 @@ class SplineDistWidget(QWidget):
             This can be used to get the
             visible_data = data[self._get_visible_slicing()]
 
+        For stacks (ie time-lapses / z-stacks) the visible part of
+        the last two (spatial) axes is taken from all frames.
+        For multiscale layers this is the slicing of the full
+        resolution image.
+
         Returns:
-            tuple: Description
+            tuple: slicing with an entry for each axis of the layer
         """
         input_layer = self._get_input_layer()
-        slicing = tuple(slice(i[0], i[1]) for i in input_layer.corner_pixels.T)
+        # the corner pixels do not include the color channels of rgb
+        # images, the leading axes are frame axes we do not restrict
+        corners = input_layer.corner_pixels.T
+        slicing = tuple(slice(None) for _ in corners[:-2])
+        slicing += tuple(slice(i[0], i[1]) for i in corners[-2:])
+        if input_layer.multiscale:
+            # the corner pixels are those of the level shown
+            level = input_layer.data_level
+            slicing = full_resolution_slicing(
+                slicing, input_layer.downsample_factors[level][-2:]
+            )
         return slicing
 
+    def _input_data(self, input_layer, model_meta):
+        """the data we predict on, for multiscale layers this is
+            the pyramid level closest to the resolution of the
+            training images of the model
+
+        Args:
+            input_layer (layer): the input layer
+            model_meta (ModelModel): the model
+
+        Returns:
+            Tuple[array-like, np.ndarray|None]: the data and the (YX)
+                downsample factors of the level (none if the
+                layer is not multiscale)
+        """
+        if not input_layer.multiscale:
+            return input_layer.data, None
+        factors = np.asarray(input_layer.downsample_factors, dtype=float)
+        if np.any(factors[:, :-2] != 1):
+            raise ValueError(
+                "pyramids downsampled along the frame axes are not supported"
+            )
+        level = choose_level(
+            factors[:, -2:],
+            pixel_size=float(np.sqrt(np.prod(input_layer.scale[-2:]))),
+            model_pixel_size=model_meta.pixel_size,
+        )
+        logger.info(
+            f"predict on level {level} of {len(factors)} "
+            f"(downsampled by {factors[level, -2:]})"
+        )
+        return input_layer.data[level], factors[level, -2:]
+
+    def _start_warmup(self):
+        """build the selected model and run the network once (on zeros)
+        in a worker thread, st. the first run does not pay for importing
+        tensorflow, building the model and tracing the network.
+        The model ends up in the model cache the runs take it from
+        """
+        model_path = self._model_download_widget._current_model_path()
+        self._model_state_label.setText("warming up")
+
+        @thread_worker
+        def warmup_function(model_path, image_shape):
+            try:
+                warm_up(model_path, image_shape=image_shape)
+            except Exception as e:
+                # not raised: a broken model fails (with this
+                # error) when it is run
+                logger.warning(f"warming up {model_path} failed: {e}")
+                return model_path, False
+            return model_path, True
+
+        self._warmup_worker = warmup_function(
+            model_path, self._warmup_image_shape()
+        )
+        self._warmup_worker.returned.connect(self._on_warmup_returned)
+        self._warmup_worker.start()
+
+    def _warmup_image_shape(self):
+        """the (YX) shape of (a frame of) the input image, the network
+        is traced for this shape (None if there is no input image)
+        """
+        try:
+            input_layer = self._get_input_layer()
+        except NoInputImageException:
+            return None
+        model_meta = self._model_download_widget.getModelMeta()
+        data, _ = self._input_data(input_layer, model_meta)
+        frames = frame_shape(
+            data.shape, model_meta.in_channels, rgb=input_layer.rgb
+        )
+        return data.shape[len(frames) : len(frames) + 2]
+
+    def _on_warmup_returned(self, result):
+        model_path, is_warm = result
+        # another model might have been selected meanwhile
+        if model_path != self._model_download_widget._current_model_path():
+            return
+        self._model_state_label.setText(
+            "warm" if is_warm else "warm-up failed"
+        )
+
     def _interpolator_factory(self):
         """create a interpolator which is used in the splineit layer"""
-        return splineit_interpolator_factory(name="UhlmannSplines")
+        from napari_splineit.interpolation import interpolator_factory
+
+        return interpolator_factory(name="UhlmannSplines")
 
     def _on_worker_started(self):
         """this is called once the worker-thread which runs splinedist
@@ -453,6 +840,7 @@ class SplineDistWidget(QWidget):
         running.
         """
         self._progress_widget.setProgress("prepare", 25)
+        self._cancel_button.setEnabled(True)
         if self.interpolated_layer is None:
             self._create_empty_result_layers()
 
@@ -469,12 +857,28 @@ class SplineDistWidget(QWidget):
 
         """
         self._run_button.setEnabled(True)
+        self._cancel_button.setEnabled(False)
         self._edit_button.setEnabled(True)
         self._update_labels_button.setEnabled(False)
 
-        self._save_button.setEnabled(True)
+        # a running save enables the button once it is done
+        self._save_button.setEnabled(
+            self._save_worker is None or not self._save_worker.is_running
+        )
         self._model_download_widget.setEnabled(True)
 
+        if self.worker is not None and self.worker.abort_requested:
+            self._progress_widget.setProgress("cancelled", 0)
+
+        # the labels file of a run which was cancelled (or failed)
+        # before it showed any results
+        if self._pending_labels_file not in (None, self._labels_file):
+            # the tiles predicted into this file are lost
+            self._tiled_prediction = None
+            self._tiled_prediction_key = None
+            self._release_labels_file(self._pending_labels_file)
+        self._pending_labels_file = None
+
         if self.ctrl_layer in self.viewer.layers:
             self.viewer.layers.remove(self.ctrl_layer)
 
@@ -486,7 +890,9 @@ class SplineDistWidget(QWidget):
         * the interpolated_layer is shows the interpolated splines
         * the ctrl_layers shows the controll points
         """
-        interpolated_layer, ctrl_layer = splineit_layer_factory(
+        from napari_splineit.layer.layer_factory import layer_factory
+
+        interpolated_layer, ctrl_layer = layer_factory(
             viewer=self.viewer, interpolator=self._interpolator_factory()
         )
         self.interpolated_layer = interpolated_layer
@@ -535,6 +941,14 @@ class SplineDistWidget(QWidget):
             self._edit_button.setEnabled(False)
             self._update_labels_button.setEnabled(True)
             labels, coords_list = self._last_results
+            if self._frame_shape:
+                # the splineit layers are 2D, we edit the frame
+                # which is currently shown
+                self._edit_frame = self._current_frame()
+                frame = np.ravel_multi_index(
+                    self._edit_frame, self._frame_shape
+                )
+                coords_list = coords_list[frame]
 
             # this will update the splines in the splineit
             # layers.
@@ -546,6 +960,8 @@ class SplineDistWidget(QWidget):
                 current_face_color=self._face_color_sel.asArray(),
             )
             self.ctrl_layer.z_index = list(range(len(coords_list)))
+            # the labels are not drawn from these splines yet
+            self._labels_sync = None
 
         else:
             # this should actually never happend
@@ -559,35 +975,81 @@ class SplineDistWidget(QWidget):
 
     def _on_worker_yielded_results(self, results):
         """this is called when the worker thread which runs
-            splinedist yielded results (ie finished
-            without error)
+            splinedist yielded results. These are the results
+            of the tiles / frames done so far while the prediction
+            runs (the last results are the ones of the whole run)
 
         Args:
             results (tuple): a tuple with labels / coordinate-list
         """
         # store results
         self._last_results = results
+        self._frame_shape = self._pending_frame_shape
+        self._downsample = self._pending_downsample
+        self._labels_sync = None
 
         labels, coords_list = results
 
-        # get the max label
-        max_label = labels.max()
-
-        # check if the colormap is large enough
-        if max_label >= self._colormap_capacity:
-            # increase the color map size generousely
-            self._colormap_capacity = int(1.5 * max_label + 0.5)
-            self._colormap = make_colormap(self._colormap_capacity)
-
         # create or update the labels layer
         # the labels layer show the pixelized objects
+        # (the colors of the labels are hashed from the label
+        # values, ie there is no colormap with an entry per label)
+        # (the labels of a pyramid level are scaled st. they
+        # overlay the full resolution image)
+        scale = np.ones(labels.ndim)
+        if self._downsample is not None:
+            scale[-2:] = self._downsample
         if self.labels_layer is None:
-            self.labels_layer = ImageLayer(
-                data=labels, colormap=self._colormap
-            )
+            self.labels_layer = LabelsLayer(data=labels, scale=scale)
             self.viewer.add_layer(self.labels_layer)
+        elif self.labels_layer.data is labels:
+            # the partial results of a running prediction are
+            # written into the same labels, ie we only redraw them
+            self.labels_layer.refresh()
         else:
             self.labels_layer.data = labels
+            self.labels_layer.scale = scale
+
+        # the labels of a previous out-of-core run are not needed anymore
+        # once the layer does not show them (the labels of tiles predicted
+        # while following the view are written into the same file by
+        # several runs)
+        if self._labels_file not in (None, self._pending_labels_file):
+            self._release_labels_file(self._labels_file)
+        self._labels_file = self._pending_labels_file
+
+    def _release_labels_file(self, path):
+        """remove a labels file which is not shown anymore.
+
+        On windows the file can not be removed while it is still
+        memory mapped (ie while the memmap was not garbage collected
+        yet), such files are removed with the next file which is
+        released or in the next session
+
+        Args:
+            path (str): the labels file
+        """
+        self._stale_labels_files.append(path)
+        self._stale_labels_files = [
+            stale
+            for stale in self._stale_labels_files
+            if not remove_labels_file(stale)
+        ]
+
+    def _on_cancel(self):
+        """stop the running worker.
+        The worker stops after the current tile (or frame), ie
+        at the next progress report, and finishes without results
+        """
+        if self.worker is None or not self.worker.is_running:
+            return
+        logger.info("cancel the prediction")
+        self._cancel_button.setEnabled(False)
+        # the tiles in view are not predicted again right away
+        self._view_timer.stop()
+        self._thresholds_timer.stop()
+        self._progress_widget.setProgress("cancelling", 0)
+        self.worker.quit()
 
     def _on_worker_progress(self, name, progress):
         """this is triggered from within the worker
@@ -633,21 +1095,50 @@ class SplineDistWidget(QWidget):
             dict: dict with all the parameters for splinedist
         """
         n_tiles_x = self._n_tiles_x.value()
-        n_tiles_y = self._n_tiles_x.value()
-        n_tiles = (n_tiles_x, n_tiles_y)
+        n_tiles_y = self._n_tiles_y.value()
+        # the images are YX(C), ie the first entry are the tiles along y
+        n_tiles = (n_tiles_y, n_tiles_x)
         if n_tiles_x == 1 and n_tiles_y == 1:
             n_tiles = None
+        if self._auto_tiles_cb.isChecked():
+            n_tiles = "auto"
 
         return dict(
             normalize_image=self._normalize_img_cb.checkState(),
             percentile_low=self._low_quantile_slider.value() * 100.0,
             percentile_high=self._high_quantile_slider.value() * 100.0,
+            normalize_mode=(
+                "fast" if self._fast_normalize_cb.isChecked() else "exact"
+            ),
             prob_thresh=self._prob_thresh_slider.value(),
             nms_thresh=self._nms_thresh_slider.value(),
             invert_image=self._invert_img_cb.checkState(),
             n_tiles=n_tiles,
+            memory_budget=int(self._memory_budget_slider.value() * 1024**3),
         )
 
+    def _resolve_n_tiles(self, parameters, shape, model_path):
+        """replace `n_tiles="auto"` by the tiling chosen from the
+            memory budget and show the tiling in the widget
+
+        Args:
+            parameters (dict): the parameters from `_build_parameters`
+            shape (tuple): the shape of the image we predict on
+            model_path (Path): the model directory
+        """
+        n_tiles = parameters["n_tiles"]
+        if n_tiles == "auto":
+            n_tiles, n_bytes = auto_n_tiles(
+                model_path, shape, budget=parameters["memory_budget"]
+            )
+            parameters["n_tiles"] = n_tiles
+            tiles_text = "1 x 1" if n_tiles is None else "%d x %d" % n_tiles
+            text = f"auto: {tiles_text} (~{n_bytes / 1024**3:.2f} GB)"
+        else:
+            text = "1 x 1" if n_tiles is None else "%d x %d" % n_tiles
+        self._n_tiles_label.setText(text)
+        logger.info(f"run with {n_tiles=} (tiles y x)")
+
     def _on_run(self):
         """this is triggered when a user pressed run.
         This will start a worker-thread which
@@ -662,6 +1153,22 @@ class SplineDistWidget(QWidget):
         input_layer = self._get_input_layer()
         logger.info(f"run on layer {input_layer.name}")
 
+        # the data we predict on (a level of multiscale layers)
+        model_meta = self._model_download_widget.getModelMeta()
+        data, downsample = self._input_data(input_layer, model_meta)
+
+        # 2D images can be predicted tile by tile as the
+        # tiles come into view
+        if self._follow_view_cb.isChecked() and not frame_shape(
+            data.shape, model_meta.in_channels, rgb=input_layer.rgb
+        ):
+            self._predict_tiles_in_view(new_prediction=True)
+            return
+
+        # a regular run replaces the tiles predicted before
+        self._tiled_prediction = None
+        self._tiled_prediction_key = None
+
         # show some info on the progress bar
         self._progress_widget.setProgress("prepare", 0)
 
@@ -676,87 +1183,369 @@ class SplineDistWidget(QWidget):
         if self._run_on_visible_only_cb.checkState():
             # what part of the input image is currently visible?
             slicing = self._get_visible_slicing()
+            if downsample is not None:
+                # only read this part of the pyramid level
+                slicing = level_slicing(slicing, downsample)
+
+        # out-of-core layers (memmap / zarr / dask) might not fit
+        # into memory, therefore we predict them tile by tile and
+        # write the labels into a file in the appdir
+        self._pending_labels_file = None
+        if slicing is None and is_out_of_core(data):
+            self._pending_labels_file = new_labels_file()
+
+        # the parameters for normalization etc
+        parameters = self._build_parameters()
+        model_path = self._model_download_widget._current_model_path()
+
+        # the leading axes of time-lapses / z-stacks are predicted
+        # frame by frame (empty for a single 2D image)
+        frames = frame_shape(
+            data.shape,
+            model_meta.in_channels,
+            rgb=input_layer.rgb,
+        )
+        self._pending_frame_shape = frames
+        self._pending_downsample = downsample
+
+        # with auto tiling we pick the number of tiles from the shape
+        # the network actually runs on (the visible part, the whole image
+        # or, for out-of-core layers, the largest tile with its halo)
+        # (for stacks the shape of a single frame)
+        if self._pending_labels_file is not None and not frames:
+            shape = tuple(
+                min(s, t + 2 * DEFAULT_HALO)
+                for s, t in zip(data.shape, DEFAULT_TILE_SHAPE)
+            )
+        elif slicing is not None:
+            # from the slices (reading `data` would load the region)
+            shape = sliced_shape(data.shape, slicing)[len(frames) :]
+        else:
+            shape = data.shape[len(frames) :]
+        self._resolve_n_tiles(parameters, shape, model_path)
+
+        # the arguments of the worker
+        run_kwargs = dict(
+            # model meta has the info how
+            # many controll point are used
+            model_meta=model_meta,
+            # the input image (the pyramid level of multiscale layers)
+            data=data,
+            # the slicing (can be none if we predict on whole image)
+            slicing=slicing,
+            # the downsample factors of the pyramid level
+            downsample=downsample,
+            # where the labels of a tiled prediction are written to
+            # (none for in-memory layers)
+            labels_file=self._pending_labels_file,
+            # the shape of the frame axes (empty for 2D images)
+            frames=frames,
+            # the folder where the model is located
+            model_path=model_path,
+            # the parameters for normalization etc
+            **parameters,
+        )
 
-        # helper f
-        def transform_results(labels, details, slicing, shape):
-            """change / transform the results st we can
-                display the resutls
+        # the network outputs of in-memory 2D images are cached,
+        # st. we can rerun the non-max. supression when the
+        # thresholds change
+        self._last_run = None
+        if self._pending_labels_file is None and not frames:
+            self._last_run = input_layer, run_kwargs
 
-            Args:
-                labels (np.array): the result labels
-                details (dict): dict with coordinates
-                slicing (Tuple[slice,slice]|None): Description
-                shape (Tuple[int,int]): *full* shape of input image!
-                  (this is not the shape of the visible part, but
-                  the full shape, since we "paste" the visible
-                  part in the full_labels array )
+        self._start_worker(input_layer, run_kwargs)
 
+    def _predict_tiles_in_view(self, new_prediction=False):
+        """predict the tiles of the input image which are in view
+        and were not predicted yet.
 
-            Returns:
-                Tuple(np.array, List): labels and coordinates
-            """
+        The image is split into a fixed grid of tiles and the predicted
+        tiles are kept, ie the labels of the whole image build up while
+        the user pans / zooms and revisiting a region costs nothing.
+        The tiles are kept as long as the input layer, the model and
+        the parameters are the same.
 
-            # if the slicing is not none we need to compute an
-            # offset we need to add to each coordinate of the slines.
-            # Also we paste the "sub-labels" (ie the visible part)
-            # in the "full-labels"
-            if slicing is not None:
-                # get the offset
-                offset = np.array([slicing[0].start, slicing[1].start])
-                # the empty "full-labels"
-                full_labels = np.zeros(shape, dtype=labels.dtype)
-                # paste the sub-lables
-                full_labels[slicing] = labels
-                labels = full_labels
-            else:
-                # when we predic on the full image (ie *not* just the
-                # visible part) we can set the offset to zero
-                offset = np.array([0, 0])
+        Args:
+            new_prediction (bool, optional): start a new prediction when
+                the layer or the parameters changed (otherwise nothing
+                is predicted in this case)
+        """
+        input_layer = self._get_input_layer()
+        parameters = self._build_parameters()
+        model_path = self._model_download_widget._current_model_path()
+        model_meta = self._model_download_widget.getModelMeta()
+        data, downsample = self._input_data(input_layer, model_meta)
+
+        key = (
+            input_layer,
+            id(data),
+            str(model_path),
+            tuple(sorted(parameters.items())),
+        )
+        if key != self._tiled_prediction_key:
+            if not new_prediction:
+                return
+            logger.info(f"predict the tiles in view of {input_layer.name}")
+            self._tiled_prediction = None
+            self._tiled_prediction_key = key
+            # the labels of out-of-core layers are written to a file
+            self._pending_labels_file = None
+            if is_out_of_core(data):
+                self._pending_labels_file = new_labels_file()
+        else:
+            # the tiles are painted into the labels of the last run,
+            # ie we wait until they are saved
+            if self._saving_labels_file:
+                self._view_timer.start()
+                return
+            self._pending_labels_file = self._labels_file
+
+        # the tiles in view which are not predicted yet
+        shape = data.shape[0:2]
+        view = self._get_visible_slicing()[-2:]
+        if downsample is not None:
+            view = level_slicing(view, downsample)
+        tiles = tiles_in_view(tile_slices(shape), view)
+        if self._tiled_prediction is not None:
+            tiles = [t for t in tiles if t not in self._tiled_prediction.done]
+        if not tiles:
+            return
 
-            # the result coordinates as given by splinedist
-            coords = details["coord"]
-            # the results as we need them for splineit
-            coords_list = []
-            # iteraten over all polygons / objects
-            for i in range(coords.shape[0]):
-                # convert the "coefs" (this is what splinedist returns
-                # to actual controll points on the spline)
-                coords_list.append(knots_from_coefs(coords[i, ...].T) + offset)
-            return labels, coords_list
+        # the network runs on a tile with its halo
+        self._resolve_n_tiles(
+            parameters,
+            tuple(
+                min(s, t + 2 * DEFAULT_HALO)
+                for s, t in zip(shape, DEFAULT_TILE_SHAPE)
+            ),
+            model_path,
+        )
 
-        # use naparis thread_worker decorator
-        # to run this in a worker thread.
-        # We use a custom worker_class st. we
-        # can fire custom events
-        # (ie  self.worker.extra_signals.progress)
-        @thread_worker(worker_class=GeneratorWorker)
-        def work_function(model_meta, data, slicing, **kwargs):
+        # the same as for a run
+        self._ctrl_layer_is_up_to_date = False
+        self._last_run = None
+        self._pending_frame_shape = ()
+        self._pending_downsample = downsample
+        self._progress_widget.setProgress("prepare", 0)
+        self._run_button.setEnabled(False)
+        self._edit_button.setEnabled(False)
+        self._model_download_widget.setEnabled(False)
+        self._update_labels_button.setEnabled(False)
+        self._start_worker(
+            input_layer,
+            dict(
+                model_meta=model_meta,
+                data=data,
+                slicing=None,
+                downsample=downsample,
+                labels_file=self._pending_labels_file,
+                frames=(),
+                tiles=tiles,
+                model_path=model_path,
+                **parameters,
+            ),
+        )
+
+    def _on_view_changed(self):
+        """this is triggered (with a short delay) when the user pans
+        or zooms while "Follow View" is checked.
+        This predicts the tiles which came into view
+        """
+        if not self._follow_view_cb.isChecked():
+            return
+        # we predict the new tiles once the running worker is done
+        if self.worker is not None and self.worker.is_running:
+            self._view_timer.start()
+            return
+        if self._input_image_combo_box.count() == 0:
+            return
+        self._predict_tiles_in_view()
+
+    def _on_thresholds_changed(self):
+        """this is triggered (with a short delay) when the user moves
+        the probability or nms threshold slider.
+        This reruns the last prediction with the new thresholds,
+        which takes the network outputs from the cache and therefore
+        only reruns the non-max. supression
+        """
+        if not self._live_thresholds_cb.isChecked() or self._last_run is None:
+            return
+        # we apply the thresholds once the running worker is done
+        if self.worker is not None and self.worker.is_running:
+            self._thresholds_timer.start()
+            return
+
+        input_layer, run_kwargs = self._last_run
+        if input_layer not in self.viewer.layers:
+            self._last_run = None
+            return
+        run_kwargs = dict(
+            run_kwargs,
+            prob_thresh=self._prob_thresh_slider.value(),
+            nms_thresh=self._nms_thresh_slider.value(),
+        )
+        self._last_run = input_layer, run_kwargs
+        logger.info(
+            f"rerun with prob_thresh={run_kwargs['prob_thresh']} "
+            f"nms_thresh={run_kwargs['nms_thresh']}"
+        )
+
+        # the same as for a run
+        self._ctrl_layer_is_up_to_date = False
+        self._pending_labels_file = None
+        self._pending_frame_shape = ()
+        self._pending_downsample = run_kwargs["downsample"]
+        self._run_button.setEnabled(False)
+        self._edit_button.setEnabled(False)
+        self._model_download_widget.setEnabled(False)
+        self._update_labels_button.setEnabled(False)
+        self._start_worker(input_layer, run_kwargs)
+
+    def _start_worker(self, input_layer, run_kwargs):
+        """start the worker-thread which runs splinedist
+
+        Args:
+            input_layer (layer): the layer we predict on
+            run_kwargs (dict): the arguments of the `work_function`
+        """
+        # the prediction, yielding the results
+        def predict_results(
+            model_meta,
+            data,
+            slicing,
+            labels_file,
+            frames,
+            downsample=None,
+            tiles=None,
+            **kwargs,
+        ):
             def progress_callback(name, progress):
+                # this is called after each tile / frame, ie
+                # a cancelled run stops here
+                if self.worker.abort_requested:
+                    raise PredictionCancelled()
                 self.worker.extra_signals.progress.emit(name, int(progress))
 
-            # spatial shape (ignoring potential color channels)
-            shape = data.shape[0:2]
+            # frame and spatial shape (ignoring potential color channels)
+            shape = data.shape[0 : len(frames) + 2]
+
+            # the results are shown while the prediction runs, but
+            # not more often than every `PARTIAL_RESULTS_INTERVAL`
+            # seconds (each update blocks the viewer for a moment)
+            throttle = Throttle(PARTIAL_RESULTS_INTERVAL)
+
+            if tiles is not None:
+                # predict the tiles in view, the tiles predicted
+                # before are kept
+                prediction = self._tiled_prediction
+                if prediction is None:
+                    labels_out = None
+                    if labels_file is not None:
+                        labels_out = open_labels_output(labels_file, shape)
+                    prediction = TiledPrediction(
+                        data,
+                        progress_callback=progress_callback,
+                        model_meta=model_meta,
+                        labels_out=labels_out,
+                        **kwargs,
+                    )
+                    self._tiled_prediction = prediction
+                n_new = 0
+                for k, tile_index in enumerate(tiles):
+                    n_new += prediction.predict_tile(tile_index)
+                    progress_callback("predict", 100 * (k + 1) / len(tiles))
+                    # show the results while the tiles are predicted
+                    if n_new and (throttle() or k + 1 == len(tiles)):
+                        labels, details = prediction.results()
+                        yield labels, coords_from_details(
+                            details, downsample=downsample
+                        )
+                        n_new = 0
+                return
 
             # when prediciting on the visible part only
             if slicing is not None:
                 # fetch visible part of data
-                data = input_layer.data[slicing]
-
-            # run the prediction
-            labels, details = predict(
-                data,
-                progress_callback=progress_callback,  # to update the
-                # progress bar
-                model_meta=model_meta,  # model meta has the info
-                # how many controll points
-                # are used
-                **kwargs,
-            )
+                data = data[slicing]
+
+            if frames:
+                # run the prediction frame by frame
+                if labels_file is not None:
+                    labels_full = open_labels_output(labels_file, shape)
+                    labels_out = labels_full
+                else:
+                    # the frames are written into the full labels
+                    # (ie the partial results need no copy)
+                    labels_full = np.zeros(shape, dtype="int32")
+                    labels_out = labels_full
+                    if slicing is not None:
+                        labels_out = labels_full[slicing]
+                offset = np.array([0, 0])
+                if slicing is not None:
+                    offset = np.array([slicing[-2].start, slicing[-1].start])
+                n_frames = int(np.prod(shape[0 : len(frames)]))
+                coords_list = []
+                for k, (labels, details_list) in enumerate(
+                    iter_predict_stack(
+                        data,
+                        progress_callback=progress_callback,
+                        model_meta=model_meta,
+                        rgb=input_layer.rgb,
+                        labels_out=labels_out,
+                        **kwargs,
+                    )
+                ):
+                    if k + 1 < n_frames and throttle():
+                        # show the frames done so far
+                        coords_list.extend(
+                            coords_from_details(details, offset, downsample)
+                            for details in details_list[len(coords_list) :]
+                        )
+                        yield labels_full, coords_list + [[]] * (
+                            n_frames - len(coords_list)
+                        )
+                yield transform_stack_results(
+                    labels, details_list, slicing, shape, downsample
+                )
+                return
+
+            if labels_file is not None:
+                # run the prediction tile by tile
+                tiles = iter_predict_tiled(
+                    data,
+                    progress_callback=progress_callback,
+                    model_meta=model_meta,
+                    labels_out=open_labels_output(labels_file, shape),
+                    **kwargs,
+                )
+                for prediction in tiles:
+                    if len(prediction.done) < len(prediction.tiles) and (
+                        throttle()
+                    ):
+                        # show the tiles done so far
+                        labels, details = prediction.results()
+                        yield transform_results(
+                            labels, details, slicing, shape, downsample
+                        )
+                labels, details = prediction.results()
+            else:
+                # run the prediction
+                labels, details = predict(
+                    data,
+                    progress_callback=progress_callback,  # to update the
+                    # progress bar
+                    model_meta=model_meta,  # model meta has the info
+                    # how many controll points
+                    # are used
+                    output_cache=OUTPUT_CACHE,  # the network outputs
+                    # are reused when only the thresholds change
+                    **kwargs,
+                )
 
             # convert the "raw" results st. we
             # can use them in the splineit layers
             labels, coords_list = transform_results(
-                labels, details, slicing, shape
+                labels, details, slicing, shape, downsample
             )
 
             # since we use a generator worker we
@@ -765,21 +1554,22 @@ class SplineDistWidget(QWidget):
 
             return
 
+        # use naparis thread_worker decorator
+        # to run this in a worker thread.
+        # We use a custom worker_class st. we
+        # can fire custom events
+        # (ie  self.worker.extra_signals.progress)
+        @thread_worker(worker_class=GeneratorWorker)
+        def work_function(**kwargs):
+            try:
+                yield from predict_results(**kwargs)
+            except PredictionCancelled:
+                # a cancelled run finishes without (further) results
+                logger.info("prediction cancelled")
+
         # construct the worker (this does **not** start the thread
         # right away)
-        self.worker = work_function(
-            # model meta has the info how
-            # many controll point are used
-            model_meta=self._model_download_widget.getModelMeta(),
-            # the input image
-            data=input_layer.data,
-            # the slicing (can be none if we predict on whole image)
-            slicing=slicing,
-            # the folder where the model is located
-            model_path=self._model_download_widget._current_model_path(),
-            # the parameters for normalization etc
-            **self._build_parameters(),
-        )
+        self.worker = work_function(**run_kwargs)
         # Connect events:
         # fired once the worker is started
         self.worker.started.connect(self._on_worker_started)
@@ -1,3 +1,4 @@
+import functools
 import os
 import shutil
 from enum import Enum
@@ -36,6 +37,9 @@ class SourceModel(BaseModel):
     n_control_points: int
     # actual dir or path
     source: str
+    # an optional checksum of the downloaded file
+    # as `<algorithm>:<hex digest>` (ie `md5:...`)
+    checksum: Optional[str] = None
 
 
 # the pydantic model for a model
@@ -51,6 +55,11 @@ class ModelModel(BaseModel):
     # this model
     preview_image: Optional[Path] = None
 
+    # the optional pixel size of the images used for training
+    # this model (in the units of the scale of the napari layers).
+    # For multiscale layers we predict on the closest level
+    pixel_size: Optional[float] = None
+
     # a list of sources. each source
     # has a different number of controll points
     sources: List[SourceModel]
@@ -62,10 +71,25 @@ class ConfigModel(BaseModel):
     models: List[ModelModel]
 
 
-# if the config is **not** present in the
-# config dir, we copy the default config
-if not APPDIR_CONFIG.exists():
-    shutil.copyfile(DEFAULT_CONFIG_JSON, APPDIR_CONFIG)
+@functools.lru_cache(maxsize=None)
+def load_config():
+    """load the config from the config dir (once, on first use)
+
+    Returns:
+        ConfigModel: the config
+    """
+    # if the config is **not** present in the
+    # config dir, we copy the default config
+    if not APPDIR_CONFIG.exists():
+        shutil.copyfile(DEFAULT_CONFIG_JSON, APPDIR_CONFIG)
+
+    # load the config from the config dir with pydantic
+    return parse_file_as(path=APPDIR_CONFIG, type_=ConfigModel)
+
 
-# load the config from the config dir with pydantic
-CONFIG = parse_file_as(path=APPDIR_CONFIG, type_=ConfigModel)
+def __getattr__(name):
+    # the config is only loaded on first access
+    # (ie not when the plugin is discovered)
+    if name == "CONFIG":
+        return load_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -12,3 +12,17 @@ class NoInputImageException(Exception):
 class PredictionException(Exception):
     def __init__(self, message=None):
         super().__init__(message)
+
+
+# raised (from the progress callback) to stop a running
+# prediction when the user cancelled it
+class PredictionCancelled(Exception):
+    def __init__(self, message="SplineDist: Prediction cancelled"):
+        super().__init__(message)
+
+
+# raised when a downloaded file does not match
+# the checksum given in the config
+class ChecksumMismatch(Exception):
+    def __init__(self, message="SplineDist: Checksum mismatch"):
+        super().__init__(message)
@@ -0,0 +1,162 @@
+import filecmp
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from .._logging import logger
+from ..config.appdir import APPDIR
+
+# splinedist needs two precomputed tables next to the model:
+#  * `phi_<M>.npy`: the spline basis sampled at `contoursize_max` points
+#  * `grid_<M>.npy`: the grid of pixel positions of the training patches
+# Computing them is slow (`phi_generator` evaluates the basis in pure
+# python), therefore we compute them only once and store them in the
+# appdir. The file names contain all parameters the tables depend on.
+# When a model directory is read-only, the model is loaded from a
+# "shadow" directory in the appdir which links to the model files.
+
+ARTIFACTS_DIR = APPDIR / "artifacts"
+SHADOW_MODELS_DIR = APPDIR / "shadow_models"
+
+
+def phi_artifact_name(M, contoursize_max):
+    return f"phi_M{M}_n{contoursize_max}.npy"
+
+
+def grid_artifact_name(M, train_patch_size, grid):
+    patch = "x".join(str(int(s)) for s in train_patch_size)
+    g = "x".join(str(int(s)) for s in grid)
+    return f"grid_M{M}_p{patch}_g{g}.npy"
+
+
+def _generate_into_store(name, generator, store_dir):
+    """run a splinedist generator (which writes `<prefix>_<M>.npy` into
+    a directory) in a temporary directory and move the result atomically
+    into the store
+    """
+    store_dir.mkdir(parents=True, exist_ok=True)
+    path = store_dir / name
+    if path.exists():
+        return path
+    with tempfile.TemporaryDirectory(dir=store_dir) as tmp_dir:
+        generated = generator(tmp_dir)
+        os.replace(generated, path)
+    return path
+
+
+def phi_artifact(M, contoursize_max, store_dir=None):
+    """path to the stored phi table (computed on first use)"""
+    from splinedist.utils import phi_generator
+
+    def generator(tmp_dir):
+        logger.info(f"compute phi table {M=} {contoursize_max=}")
+        phi_generator(M, contoursize_max, tmp_dir)
+        return Path(tmp_dir) / f"phi_{M}.npy"
+
+    store_dir = ARTIFACTS_DIR if store_dir is None else Path(store_dir)
+    return _generate_into_store(
+        phi_artifact_name(M, contoursize_max), generator, store_dir
+    )
+
+
+def grid_artifact(M, train_patch_size, grid, store_dir=None):
+    """path to the stored grid table (computed on first use)"""
+    from splinedist.utils import grid_generator
+
+    def generator(tmp_dir):
+        logger.info(f"compute grid table {M=} {train_patch_size=} {grid=}")
+        grid_generator(M, train_patch_size, grid, tmp_dir)
+        return Path(tmp_dir) / f"grid_{M}.npy"
+
+    store_dir = ARTIFACTS_DIR if store_dir is None else Path(store_dir)
+    return _generate_into_store(
+        grid_artifact_name(M, train_patch_size, grid), generator, store_dir
+    )
+
+
+def _place(src, dst):
+    """make `dst` a copy of `src` (atomically, st. concurrent
+    readers of a shared model directory never see a partial file)
+    """
+    if dst.exists() and filecmp.cmp(src, dst, shallow=False):
+        return
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.symlink(src, dst)
+    except (OSError, NotImplementedError):
+        shutil.copyfile(src, dst)
+
+
+def _shadow_model_dir(model_path, shadow_dir):
+    """a writable directory which links to all files of `model_path`"""
+    digest = hashlib.sha1(str(model_path).encode()).hexdigest()[:16]
+    shadow = Path(shadow_dir) / digest / model_path.name
+    shadow.mkdir(parents=True, exist_ok=True)
+    for src in model_path.iterdir():
+        dst = shadow / src.name
+        if src.is_file() and not dst.exists():
+            _link_or_copy(src, dst)
+    return shadow
+
+
+def prepare_model_dir(
+    model_path,
+    M,
+    contoursize_max,
+    train_patch_size,
+    grid,
+    store_dir=None,
+    shadow_dir=None,
+):
+    """make sure the phi/grid tables are available for a model
+
+    Args:
+        model_path (Path): the model directory
+        M (int): number of control points
+        contoursize_max (int): number of points sampled on the contour
+        train_patch_size (tuple): patch size used for training
+        grid (tuple): the grid of the model
+        store_dir (Path, optional): where the tables are stored,
+            defaults to the appdir
+        shadow_dir (Path, optional): where shadow model directories
+            are created, defaults to the appdir
+
+    Returns:
+        Path: the directory the model should be loaded from. This is
+            `model_path` itself, or a shadow directory when `model_path`
+            is not writable
+    """
+    model_path = Path(model_path).resolve()
+    tables = {
+        f"phi_{M}.npy": phi_artifact(M, contoursize_max, store_dir),
+        f"grid_{M}.npy": grid_artifact(M, train_patch_size, grid, store_dir),
+    }
+
+    try:
+        for name, src in tables.items():
+            _place(src, model_path / name)
+        return model_path
+    except OSError:
+        logger.info(f"`{model_path}` is not writable, use a shadow directory")
+
+    shadow_dir = SHADOW_MODELS_DIR if shadow_dir is None else shadow_dir
+    shadow = _shadow_model_dir(model_path, shadow_dir)
+    for name, src in tables.items():
+        dst = shadow / name
+        # the shadow might link to stale tables of the model directory
+        if dst.is_symlink():
+            dst.unlink()
+        _place(src, dst)
+    return shadow
@@ -0,0 +1,434 @@
+import glob
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .._logging import logger
+from ..utils.results_io import (
+    labels_image_path,
+    max_label,
+    write_labels_image,
+    write_results,
+)
+from ..utils.splineit_io import write_splineit
+
+# Headless (ie Qt-free) batch prediction.
+#
+# The images are split into chunks which are distributed
+# over a pool of worker processes. Each worker builds the
+# model once (see `_init_worker`) and keeps it warm for all
+# chunks it processes. Within a chunk the next image is read
+# in a background thread while the model runs on the current
+# image, and results are written in that thread as well.
+
+# the file extensions we consider as images
+# when a directory is given as input
+IMAGE_EXTENSIONS = (".png", ".tif", ".tiff", ".jpg", ".jpeg", ".bmp")
+
+# the formats the results can be written in: png labels plus
+# `.splineit` json, or both in a compressed `.npz` (see `write_results`)
+OUTPUT_FORMATS = ("splineit", "npz")
+
+# the same defaults as in the `SplineDistWidget`
+DEFAULT_PARAMETERS = dict(
+    normalize_image=True,
+    percentile_low=1.0,
+    percentile_high=99.8,
+    normalize_mode="exact",
+    invert_image=False,
+    prob_thresh=0.5,
+    nms_thresh=0.5,
+    n_tiles=None,
+    memory_budget=None,
+)
+
+
+def collect_inputs(inputs):
+    """collect all image paths from directories, glob patterns and files
+
+    Args:
+        inputs (str|Path|List[str|Path]): directories, glob patterns
+            or files
+
+    Returns:
+        List[Path]: the sorted list of image paths
+    """
+    if isinstance(inputs, (str, Path)):
+        inputs = [inputs]
+
+    image_paths = []
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            image_paths.extend(
+                p
+                for p in sorted(path.iterdir())
+                if p.suffix.lower() in IMAGE_EXTENSIONS
+            )
+        elif path.is_file():
+            image_paths.append(path)
+        else:
+            matches = sorted(glob.glob(str(entry), recursive=True))
+            if not matches:
+                raise FileNotFoundError(f"no input images found for `{entry}`")
+            image_paths.extend(Path(m) for m in matches)
+    return image_paths
+
+
+def input_root(image_paths):
+    """the deepest directory which contains all images
+
+    Args:
+        image_paths (List[Path]): the image paths
+
+    Returns:
+        Path: the (absolute) directory, or None if there is none
+            (ie for images on different drives)
+    """
+    try:
+        return Path(
+            os.path.commonpath(
+                [os.path.abspath(Path(p).parent) for p in image_paths]
+            )
+        )
+    except ValueError:
+        return None
+
+
+def output_paths(image_path, output_dir, output_format="splineit", root=None):
+    """the paths of the labels and the control points for an image
+
+    Args:
+        image_path (Path): path of the input image
+        output_dir (Path): the output directory
+        output_format (str, optional): one of `OUTPUT_FORMATS`
+        root (Path, optional): the directories of the image below
+            `root` are mirrored in the output directory (see
+            `input_root`), ie images with the same name in different
+            directories do not overwrite each other's results
+
+    Returns:
+        Tuple[Path, Path]: path of the labels (png) and the splines
+            (splineit), for the "npz" format both are the same file
+    """
+    stem = Path(image_path).stem
+    output_dir = Path(output_dir)
+    if root is not None:
+        output_dir = output_dir / Path(
+            os.path.abspath(Path(image_path).parent)
+        ).relative_to(root)
+    if output_format == "npz":
+        return (output_dir / f"{stem}.npz",) * 2
+    return output_dir / f"{stem}.png", output_dir / f"{stem}.splineit"
+
+
+def _read_image(path):
+    from skimage import io as skimage_io
+
+    return skimage_io.imread(path)
+
+
+def _write_results(labels, coords_list, labels_path, splineit_path):
+    if Path(splineit_path).suffix == ".npz":
+        write_results(
+            splineit_path,
+            labels=labels,
+            data=coords_list,
+            z_index=np.arange(len(coords_list)),
+        )
+        return
+
+    write_splineit(
+        path=splineit_path,
+        data=coords_list,
+        z_index=range(len(coords_list)),
+    )
+    # the labels are saved as uint16 png (or as tif when
+    # they do not fit, see `labels_image_path`)
+    write_labels_image(labels_path, labels)
+
+
+def _init_worker(model_path, grid, n_threads):
+    """initializer of the worker processes: build the model once st.
+    it is warm for all the images of that worker
+    """
+    if n_threads is not None:
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(n_threads)
+
+    from .predict import build_model
+
+    build_model(model_path=Path(model_path), grid=grid)
+
+
+def _read_images(paths):
+    return [_read_image(path) for path in paths]
+
+
+def _process_chunk(
+    image_paths,
+    output_dir,
+    model_meta,
+    model_path,
+    parameters,
+    batch_size=1,
+    output_format="splineit",
+    root=None,
+):
+    """predict and save a chunk of images while prefetching the next
+    image (or the next batch of images)
+
+    Returns:
+        List[dict]: a summary for each image
+    """
+    from .predict import predict, predict_batched
+    from .results import transform_results
+
+    # tiled prediction is done image by image
+    if parameters["n_tiles"] is not None:
+        batch_size = 1
+    groups = [
+        image_paths[i : i + batch_size]
+        for i in range(0, len(image_paths), batch_size)
+    ]
+
+    summaries = []
+    writes = []
+    with ThreadPoolExecutor(max_workers=1) as io_pool:
+        next_images = io_pool.submit(_read_images, groups[0])
+        for i, group in enumerate(groups):
+            images = next_images.result()
+
+            # read the next images while the model is running
+            if i + 1 < len(groups):
+                next_images = io_pool.submit(_read_images, groups[i + 1])
+
+            t0 = time.perf_counter()
+            if batch_size > 1:
+                results = predict_batched(
+                    images,
+                    model_path=Path(model_path),
+                    model_meta=model_meta,
+                    batch_size=batch_size,
+                    **{
+                        key: value
+                        for key, value in parameters.items()
+                        if key not in ("n_tiles", "memory_budget")
+                    },
+                )
+            else:
+                results = [
+                    predict(
+                        images[0],
+                        model_path=Path(model_path),
+                        model_meta=model_meta,
+                        **parameters,
+                    )
+                ]
+            results = [
+                transform_results(labels, details)
+                for labels, details in results
+            ]
+            duration = (time.perf_counter() - t0) / len(group)
+
+            for image_path, (labels, coords_list) in zip(group, results):
+                labels_path, splineit_path = output_paths(
+                    image_path, output_dir, output_format, root
+                )
+                if output_format != "npz":
+                    labels_path = labels_image_path(
+                        labels_path, max_label(labels)
+                    )
+                writes.append(
+                    io_pool.submit(
+                        _write_results,
+                        labels,
+                        coords_list,
+                        labels_path,
+                        splineit_path,
+                    )
+                )
+                summaries.append(
+                    dict(
+                        image=str(image_path),
+                        labels=str(labels_path),
+                        splines=str(splineit_path),
+                        n_objects=len(coords_list),
+                        seconds=duration,
+                    )
+                )
+        # make sure everything is written
+        # (and raise errors from the writer)
+        for write in writes:
+            write.result()
+    return summaries
+
+
+def run_batch(
+    inputs,
+    output_dir,
+    model_name=None,
+    n_control_points=None,
+    model_path=None,
+    in_channels=1,
+    n_workers=1,
+    chunk_size=None,
+    n_threads_per_worker=None,
+    download_dir=None,
+    grid=(2, 2),
+    batch_size=1,
+    output_format="splineit",
+    **parameters,
+):
+    """run splinedist on many images without napari / Qt.
+
+        For each input image `<name>.png` (labels as uint16, a `.tif`
+        if there are more labels) and `<name>.splineit` (control points)
+        are written to the output directory, or `<name>.npz` with both
+        for `output_format="npz"`. For images from several directories
+        (ie `data/**/*.png`) the directories below the deepest common
+        directory are mirrored in the output directory.
+
+    Args:
+        inputs (str|Path|List[str|Path]): directories, glob patterns or files
+        output_dir (str|Path): where to write the results
+        model_name (str, optional): name of a model from the config
+            (ie `bbbc038`), the model is downloaded if needed
+        n_control_points (int, optional): number of control points of the
+            model, if None the first source of the model is used
+        model_path (str|Path, optional): use the model from this directory
+            instead of a model from the config
+        in_channels (int, optional): number of input channels of the model
+            at `model_path` (ignored when `model_name` is given)
+        n_workers (int, optional): number of worker processes, each worker
+            holds its own model. With `n_workers <= 1` everything runs in
+            the calling process
+        chunk_size (int, optional): number of images a worker processes
+            in one go, defaults to an even split over the workers
+        n_threads_per_worker (int, optional): limit the tensorflow threads
+            of each worker process to avoid oversubscribing the cores
+        download_dir (str|Path, optional): where models are downloaded to,
+            defaults to the appdir
+        grid (tuple, optional): the grid of the model
+        batch_size (int, optional): number of (same-shaped) images passed
+            through the network in a single call
+        output_format (str, optional): one of `OUTPUT_FORMATS`
+        **parameters: the prediction parameters (see `DEFAULT_PARAMETERS`)
+
+    Returns:
+        List[dict]: a summary for each image
+
+    Raises:
+        ValueError: if the results of two images would be written
+            to the same file (ie for `a.png` and `a.tif`)
+    """
+    from ..config.config import ModelModel
+    from .resolve import resolve_model
+
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        raise TypeError(f"unknown parameters: {sorted(unknown)}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"unknown {output_format=}, expected one of {OUTPUT_FORMATS}"
+        )
+    parameters = {**DEFAULT_PARAMETERS, **parameters, "grid": tuple(grid)}
+
+    if model_name is not None:
+        model_meta, model_path = resolve_model(
+            model_name,
+            n_control_points=n_control_points,
+            download_dir=download_dir,
+        )
+    elif model_path is not None:
+        model_path = Path(model_path)
+        model_meta = ModelModel(
+            name=model_path.name, in_channels=in_channels, sources=[]
+        )
+    else:
+        raise ValueError("either `model_name` or `model_path` must be given")
+
+    image_paths = collect_inputs(inputs)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if not image_paths:
+        return []
+
+    # the results of different images must not overwrite each other
+    root = input_root(image_paths)
+    images_of_outputs = dict()
+    for image_path in image_paths:
+        _, splineit_path = output_paths(
+            image_path, output_dir, output_format, root
+        )
+        if splineit_path in images_of_outputs:
+            raise ValueError(
+                f"the results of `{images_of_outputs[splineit_path]}` and "
+                f"`{image_path}` would both be written to `{splineit_path}`"
+            )
+        images_of_outputs[splineit_path] = image_path
+        splineit_path.parent.mkdir(parents=True, exist_ok=True)
+
+    n_workers = max(1, int(n_workers))
+    if chunk_size is None:
+        chunk_size = math.ceil(len(image_paths) / n_workers)
+    chunks = [
+        image_paths[i : i + chunk_size]
+        for i in range(0, len(image_paths), chunk_size)
+    ]
+    logger.info(
+        f"run batch on {len(image_paths)} images with model `{model_path}` "
+        f"{n_workers=} n_chunks={len(chunks)} {batch_size=}"
+    )
+
+    summaries = []
+    if n_workers == 1:
+        # tensorflow might already be initialized in this process,
+        # therefore we do not change the number of threads here
+        _init_worker(model_path, parameters["grid"], None)
+        for chunk in chunks:
+            summaries.extend(
+                _process_chunk(
+                    chunk,
+                    output_dir,
+                    model_meta,
+                    model_path,
+                    parameters,
+                    batch_size,
+                    output_format,
+                    root,
+                )
+            )
+    else:
+        # tensorflow is not fork-safe, therefore we spawn the workers
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, parameters["grid"], n_threads_per_worker),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _process_chunk,
+                    chunk,
+                    output_dir,
+                    model_meta,
+                    model_path,
+                    parameters,
+                    batch_size,
+                    output_format,
+                    root,
+                )
+                for chunk in chunks
+            ]
+            for future in futures:
+                summaries.extend(future.result())
+
+    return summaries
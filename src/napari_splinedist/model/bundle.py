@@ -0,0 +1,108 @@
+import os
+import tempfile
+import zipfile
+from pathlib import Path
+
+from .._logging import logger
+from ..utils.download_file import verify_checksum
+from .resolve import model_base_name, url_sources
+
+# Nodes without internet access can not download the models. A bundle
+# is a zip archive with the models as they are in the download dir
+# (`<name>_<n_control_points>/...`, see `export_bundle`) and / or the
+# zips of the models as they are downloaded
+# (`<name>_<n_control_points>.zip`). `import_bundle` fills the download
+# dir from a bundle, ie the models are found as if they were downloaded.
+
+
+def export_bundle(path, models_meta, download_dir):
+    """write the downloaded models into a bundle
+
+    Args:
+        path (str|Path): the path of the bundle (a `.zip`)
+        models_meta (List[ModelModel]): the models (ie `CONFIG.models`)
+        download_dir (Path): the directory the models are downloaded to
+
+    Returns:
+        List[str]: the names of the exported models (models which
+            are not downloaded are skipped)
+    """
+    download_dir = Path(download_dir)
+    exported = []
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for model_meta, source in url_sources(models_meta):
+            name = model_base_name(model_meta, source)
+            model_dir = download_dir / name
+            if not model_dir.is_dir():
+                logger.warning(f"{name} is not downloaded, skip it")
+                continue
+            for file in sorted(model_dir.rglob("*")):
+                zf.write(file, file.relative_to(download_dir).as_posix())
+            exported.append(name)
+    return exported
+
+
+def import_bundle(path, models_meta, download_dir):
+    """fill the download dir from a bundle
+
+    Models which are already in the download dir are kept, entries of
+    the bundle which are not in the config are skipped. The models are
+    extracted next to the download dir and moved into place once
+    complete. Zips of models are checked against the checksums of the
+    config.
+
+    Args:
+        path (str|Path): the path of the bundle (a `.zip`)
+        models_meta (List[ModelModel]): the models (ie `CONFIG.models`)
+        download_dir (Path): the directory the models are downloaded to
+
+    Returns:
+        List[str]: the names of the imported models
+
+    Raises:
+        ChecksumMismatch: if a zip of a model does not match
+    """
+    download_dir = Path(download_dir)
+    download_dir.mkdir(parents=True, exist_ok=True)
+    sources = {
+        model_base_name(model_meta, source): source
+        for model_meta, source in url_sources(models_meta)
+    }
+
+    imported = []
+    with zipfile.ZipFile(path, "r") as bundle, tempfile.TemporaryDirectory(
+        dir=download_dir
+    ) as tmp:
+        tmp = Path(tmp)
+        top_level = {Path(member).parts[0] for member in bundle.namelist()}
+        for entry in sorted(top_level):
+            name = entry[: -len(".zip")] if entry.endswith(".zip") else entry
+            if name not in sources:
+                logger.warning(f"`{entry}` is not a model of the config")
+                continue
+            if name in imported or (download_dir / name).exists():
+                logger.info(f"{name} is already available, skip it")
+                continue
+
+            if entry.endswith(".zip"):
+                # a zip as it is downloaded
+                zip_path = Path(bundle.extract(entry, tmp))
+                if sources[name].checksum is not None:
+                    verify_checksum(zip_path, sources[name].checksum)
+                with zipfile.ZipFile(zip_path, "r") as zf:
+                    zf.extractall(tmp)
+            else:
+                members = [
+                    member
+                    for member in bundle.namelist()
+                    if Path(member).parts[0] == entry
+                ]
+                bundle.extractall(tmp, members=members)
+
+            if not (tmp / name).is_dir():
+                logger.warning(f"`{entry}` does not contain `{name}/`")
+                continue
+            os.replace(tmp / name, download_dir / name)
+            imported.append(name)
+            logger.info(f"imported {name}")
+    return imported
@@ -0,0 +1,209 @@
+import gc
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from .._logging import logger
+
+# building a `SplineDist2D` takes several seconds, therefore
+# we keep the most recently used models alive. In contrast to
+# a plain `functools.lru_cache` the cache is bounded by an
+# (estimated) memory budget as well as by the number of models.
+
+DEFAULT_MAX_MODELS = 4
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+
+def estimate_model_bytes(model):
+    """estimate the memory a model needs from the size of its weights
+
+    Args:
+        model (SplineDist2D): the model
+
+    Returns:
+        int: the estimated number of bytes
+    """
+    return int(
+        sum(
+            int(np.prod(w.shape)) * w.dtype.size
+            for w in model.keras_model.weights
+        )
+    )
+
+
+def _clear_keras_session():
+    # called once no model is cached (or being built) anymore. The
+    # evicted models themselves (their keras models, the weights and the
+    # traced predict functions) are released by the garbage collector
+    # as soon as nothing references them. `clear_session` resets the
+    # global keras state (the graph of the functional api and the layer
+    # name counters) which keeps growing with every model we build.
+    # This must not run while another thread builds or runs a model,
+    # therefore it is not called after every eviction (which can happen
+    # on the warm-up thread while a prediction runs)
+    from tensorflow.keras import backend
+
+    backend.clear_session()
+
+
+class ModelCache:
+    """a thread-safe LRU cache for models bounded
+    by count and by an estimated memory budget
+
+    Models are built outside of the lock, ie lookups of other
+    models do not wait for a build. A model which is being built
+    is not built a second time, lookups of it wait for the build.
+
+    Attributes:
+        max_models (int): maximum number of cached models
+        max_bytes (int): maximum estimated memory of all cached models
+        hits (int): number of lookups which found a cached model
+        misses (int): number of lookups which had to build the model
+        evictions (int): number of models evicted from the cache
+    """
+
+    def __init__(
+        self,
+        builder,
+        max_models=DEFAULT_MAX_MODELS,
+        max_bytes=DEFAULT_MAX_BYTES,
+        size_of=estimate_model_bytes,
+        on_evict=None,
+        on_idle=_clear_keras_session,
+    ):
+        """
+        Args:
+            builder (callable): builds a model from (model_path, grid)
+            max_models (int, optional): maximum number of cached models
+            max_bytes (int, optional): maximum estimated memory in bytes
+            size_of (callable, optional): estimates the bytes of a model
+            on_evict (callable, optional): called after a model was
+                evicted
+            on_idle (callable, optional): called after an eviction
+                which left no model in the cache while none is being
+                built (ie to free global tensorflow state)
+        """
+        self._builder = builder
+        self._size_of = size_of
+        self._on_evict = on_evict
+        self._on_idle = on_idle
+        self._lock = threading.RLock()
+        self._models = OrderedDict()
+        self._sizes = dict()
+        # the keys of the models which are being built and an
+        # event which is set once the build is done (or failed)
+        self._building = dict()
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model_path, grid):
+        return str(Path(model_path).resolve()), tuple(grid)
+
+    def get(self, model_path, grid=(2, 2)):
+        """get a model from the cache or build it
+
+        Args:
+            model_path (Path): the model directory
+            grid (tuple, optional): the grid of the model
+
+        Returns:
+            SplineDist2D: the model
+        """
+        key = self.key(model_path, grid)
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self.hits += 1
+                    self._models.move_to_end(key)
+                    return self._models[key]
+                built = self._building.get(key)
+                if built is None:
+                    self.misses += 1
+                    built = self._building[key] = threading.Event()
+                    break
+            # another thread builds this model, we take it from the
+            # cache once it is done (or build it if the build failed)
+            built.wait()
+
+        try:
+            model = self._builder(model_path, grid)
+            size = self._size_of(model)
+            with self._lock:
+                self._models[key] = model
+                self._sizes[key] = size
+                self._evict()
+        finally:
+            with self._lock:
+                del self._building[key]
+            built.set()
+        return model
+
+    def configure(self, max_models=None, max_bytes=None):
+        """change the limits of the cache (and evict if needed)"""
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max_models
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """evict all models"""
+        with self._lock:
+            while self._models:
+                self._evict_oldest()
+
+    @property
+    def n_bytes(self):
+        """the estimated memory of all cached models"""
+        return sum(self._sizes.values())
+
+    def __len__(self):
+        return len(self._models)
+
+    def __contains__(self, key):
+        return self.key(*key) in self._models
+
+    def info(self):
+        """hit/miss/eviction statistics of the cache
+
+        Returns:
+            dict: the statistics
+        """
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                n_models=len(self._models),
+                n_bytes=self.n_bytes,
+                max_models=self.max_models,
+                max_bytes=self.max_bytes,
+            )
+
+    def _evict(self):
+        # we always keep the most recently used model,
+        # even if it alone exceeds the memory budget
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or self.n_bytes > self.max_bytes
+        ):
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        key, model = self._models.popitem(last=False)
+        n_bytes = self._sizes.pop(key)
+        self.evictions += 1
+        logger.info(f"evict model {key} ({n_bytes / 1024**2:.1f} MiB)")
+        del model
+        gc.collect()
+        if self._on_evict is not None:
+            self._on_evict()
+        if self._on_idle is not None and not (self._models or self._building):
+            self._on_idle()
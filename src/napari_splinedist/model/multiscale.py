@@ -0,0 +1,69 @@
+import math
+
+import numpy as np
+
+# Multiscale (pyramid) images hold the same image at several resolutions,
+# level 0 is the full resolution and level k is downsampled by the
+# `downsample_factors[k]` of the napari layer. We predict on the level
+# closest to the resolution the model was trained at and only read the
+# part of this level we need. The pixel i of a level lies at i * factor
+# in the full resolution image (as napari shows the levels), hence
+# the spline coordinates are mapped back by multiplying with the factor.
+
+
+def choose_level(downsample_factors, pixel_size=None, model_pixel_size=None):
+    """the pyramid level with the pixel size closest to the one of the
+        images the model was trained on
+
+    Args:
+        downsample_factors (array-like): the (YX) downsample factors of
+            each level, shape (n_levels, 2)
+        pixel_size (float, optional): the pixel size of level 0
+            (ie from the scale of the layer)
+        model_pixel_size (float, optional): the pixel size of the
+            training images (in the units of the layer scale)
+
+    Returns:
+        int: the level (0 if the pixel size of the model is not known)
+    """
+    if model_pixel_size is None or pixel_size is None:
+        return 0
+    factors = np.asarray(downsample_factors, dtype=float)
+    # the (geometric) mean of the pixel size along y and x
+    sizes = pixel_size * np.sqrt(np.prod(factors, axis=1))
+    return int(np.argmin(np.abs(np.log(sizes / model_pixel_size))))
+
+
+def level_slicing(slicing, downsample):
+    """map a slicing of the full resolution image to a level
+
+    Args:
+        slicing (tuple): the slicing (the last two entries are YX)
+        downsample (array-like): the (YX) downsample factors of the level
+
+    Returns:
+        tuple: the slicing of the level, covering at least the region
+    """
+    spatial = tuple(
+        slice(int(math.floor(s.start / f)), int(math.ceil(s.stop / f)))
+        for s, f in zip(slicing[-2:], downsample)
+    )
+    return tuple(slicing[:-2]) + spatial
+
+
+def full_resolution_slicing(slicing, downsample):
+    """map a slicing of a level to the full resolution image
+
+    Args:
+        slicing (tuple): the slicing of the level (the last two
+            entries are YX)
+        downsample (array-like): the (YX) downsample factors of the level
+
+    Returns:
+        tuple: the slicing of the full resolution image
+    """
+    spatial = tuple(
+        slice(int(s.start * f), int(math.ceil(s.stop * f)))
+        for s, f in zip(slicing[-2:], downsample)
+    )
+    return tuple(slicing[:-2]) + spatial
@@ -0,0 +1,163 @@
+import numpy as np
+
+# The tiled forward pass of `SplineDist2D.predict` runs all tiles in a
+# single call, which can neither report its progress nor be stopped.
+# `TiledNetwork` does the same tile by tile, st. the caller gets the
+# control back after each tile (to report progress or to stop).
+
+
+class TiledNetwork(object):
+    """the forward pass of the network on an image, tile by tile
+
+    The outputs are the same as the ones of `SplineDist2D.predict`
+    (the image is padded as `SplineDistPadAndCropResizer` does and
+    split with csbdeep's `tile_iterator`).
+
+    Args:
+        model (SplineDist2D): the model
+        img (np.ndarray): the preprocessed image (YX or YXC)
+        n_tiles (tuple, optional): the number of tiles per axis
+            (of the image, `None` for a single tile)
+    """
+
+    def __init__(self, model, img, n_tiles=None):
+        from csbdeep.internals.predict import tile_iterator
+        from csbdeep.utils import axes_dict
+        from splinedist.models.base import SplineDistPadAndCropResizer
+
+        if n_tiles is None:
+            n_tiles = (1,) * img.ndim
+        n_tiles = tuple(int(t) for t in n_tiles)
+        if len(n_tiles) != img.ndim or min(n_tiles) < 1:
+            raise ValueError(f"invalid {n_tiles=} for {img.ndim=}")
+
+        self._model = model
+        axes_net = model.config.axes
+        permute_axes = model._make_permute_axes(
+            model._normalize_axes(img, None), axes_net
+        )
+        self._axes_net = axes_net
+        self._channel = axes_dict(axes_net)["C"]
+        self._grid = dict(
+            zip(axes_net.replace("C", ""), tuple(model.config.grid))
+        )
+
+        # the image is already normalized, ie we only pad it
+        div_by = model._axes_div_by(axes_net)
+        self._resizer = SplineDistPadAndCropResizer(grid=self._grid)
+        self._x = self._resizer.before(permute_axes(img), axes_net, div_by)
+
+        # permute the tiling in the same way as the image
+        n_tiles = permute_axes(np.empty(n_tiles, bool)).shape
+        if np.prod(n_tiles) == 1:
+            whole = (slice(None),) * self._x.ndim
+            self._tiles = [(self._x, whole, whole)]
+        else:
+            n_block_overlaps = [
+                int(np.ceil(overlap / block))
+                for overlap, block in zip(
+                    model._axes_tile_overlap(axes_net), div_by
+                )
+            ]
+            self._tiles = list(
+                tile_iterator(
+                    self._x,
+                    n_tiles,
+                    block_sizes=div_by,
+                    n_block_overlaps=n_block_overlaps,
+                )
+            )
+
+        self._prob = None
+        self._dist = None
+        self._n_done = 0
+
+    def __len__(self):
+        return len(self._tiles)
+
+    @property
+    def n_done(self):
+        """int: the number of tiles passed through the network"""
+        return self._n_done
+
+    def _grid_slicing(self, slicing):
+        # the network outputs are subsampled by the grid
+        slicing = [
+            slice(
+                None if s.start is None else s.start // self._grid.get(a, 1),
+                None if s.stop is None else s.stop // self._grid.get(a, 1),
+            )
+            for s, a in zip(slicing, self._axes_net)
+        ]
+        # prob and dist have another number of channels than the image
+        slicing[self._channel] = slice(None)
+        return tuple(slicing)
+
+    def predict_next(self):
+        """pass the next tile through the network
+
+        Returns:
+            bool: false if all tiles are done already
+        """
+        if self._n_done == len(self._tiles):
+            return False
+        tile, s_src, s_dst = self._tiles[self._n_done]
+        prob, dist = self._model.keras_model.predict(
+            tile[np.newaxis], verbose=0
+        )
+        if self._prob is None:
+            shape = [
+                s // self._grid.get(a, 1)
+                for a, s in zip(self._axes_net, self._x.shape)
+            ]
+            shape[self._channel] = prob.shape[-1]
+            self._prob = np.empty(shape, np.float32)
+            shape[self._channel] = dist.shape[-1]
+            self._dist = np.empty(shape, np.float32)
+        s_src, s_dst = self._grid_slicing(s_src), self._grid_slicing(s_dst)
+        self._prob[s_dst] = prob[0][s_src]
+        self._dist[s_dst] = dist[0][s_src]
+        self._n_done += 1
+        return True
+
+    def outputs(self):
+        """the outputs once all tiles are done
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: the object probabilities
+                and the spline coefficients (as `SplineDist2D.predict`)
+        """
+        if self._n_done < len(self._tiles):
+            raise RuntimeError(
+                f"only {self._n_done} of {len(self._tiles)} tiles are done"
+            )
+        prob = self._resizer.after(self._prob, self._axes_net)
+        dist = self._resizer.after(self._dist, self._axes_net)
+        prob = np.take(prob, 0, axis=self._channel)
+        dist = np.moveaxis(dist, self._channel, -1)
+        return prob, dist
+
+
+def run_network(model, img, n_tiles=None, progress_callback=None):
+    """the forward pass of the network, reporting the progress after
+    each tile
+
+    The progress callback may raise an exception (ie
+    `PredictionCancelled`) to stop after the current tile.
+
+    Args:
+        model (SplineDist2D): the model
+        img (np.ndarray): the preprocessed image (YX or YXC)
+        n_tiles (tuple, optional): the number of tiles per axis
+        progress_callback (callable, optional): called with the
+            name and the progress (in [0,100]) after each tile
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the object probabilities
+            and the spline coefficients (as `SplineDist2D.predict`)
+    """
+    network = TiledNetwork(model, img, n_tiles=n_tiles)
+    while network.predict_next():
+        if progress_callback is not None:
+            progress_callback("predict", 100 * network.n_done / len(network))
+    return network.outputs()
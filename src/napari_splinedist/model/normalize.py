@@ -0,0 +1,300 @@
+import math
+
+import numpy as np
+
+from .._logging import logger
+
+# Percentile based normalization for (very) large images.
+#
+# `csbdeep.utils.normalize` computes exact percentiles with
+# `np.percentile` (which sorts a full copy of the image) and
+# creates two more full size float copies for the rescaling.
+# Here we offer two modes:
+#
+#  * "exact": the same percentiles as csbdeep (`np.percentile`)
+#  * "fast": the percentiles are estimated in a single streaming
+#     pass over row-chunks of the image. For 8/16 bit integer
+#     images we build a histogram with `np.bincount` (which gives
+#     the exact percentiles up to the interpolation between
+#     neighbouring values). For all other images we draw a random
+#     subsample (uniform, with replacement) chunk by chunk.
+#
+# In both modes the affine rescale `(x - mi) / (ma - mi + eps)` is
+# applied in place whenever the caller allows us to.
+
+NORMALIZE_MODES = ("exact", "fast")
+
+# number of bytes of the input we look at in one chunk
+DEFAULT_CHUNK_BYTES = 64 * 1024**2
+
+# `np.bincount` works on an int64 copy of the values, therefore the
+# chunks of the histogram hold at most this many values (8 MiB)
+HISTOGRAM_CHUNK_VALUES = 2**20
+
+# maximum number of samples we draw in the "fast" mode
+DEFAULT_MAX_SAMPLES = 2_000_000
+
+# the confidence used for the rank error bound of the subsample
+RANK_ERROR_ALPHA = 0.01
+
+# the seed of the subsample, st. the "fast" mode is deterministic
+SAMPLE_SEED = 0
+
+# the samples are drawn in batches of this size (bounds the memory
+# of the random indices)
+SAMPLE_BATCH = 2**16
+
+
+def _chunk_rows(image, chunk_bytes):
+    # the number of (full) rows in a chunk
+    row_bytes = max(1, int(np.prod(image.shape[1:])) * image.dtype.itemsize)
+    return max(1, chunk_bytes // row_bytes)
+
+
+def _iter_row_chunks(image, chunk_bytes, channel=None):
+    """iterate over blocks of full rows of an image (of a single
+    channel of a YXC image when `channel` is given).
+    This works for numpy arrays, memmaps and lazy arrays
+    (ie dask / zarr) since only the blocks are materialized
+    """
+    rows = _chunk_rows(image, chunk_bytes)
+    for start in range(0, image.shape[0], rows):
+        chunk = np.asarray(image[start : start + rows])
+        yield chunk if channel is None else chunk[..., channel]
+
+
+def _percentiles_from_histogram(hist, percentiles):
+    # `np.percentile` with linear interpolation on the sorted
+    # values, where value `v` is repeated `hist[v]` times
+    cumsum = np.cumsum(hist)
+    n = cumsum[-1]
+    result = []
+    for p in percentiles:
+        rank = (n - 1) * p / 100.0
+        lower = math.floor(rank)
+        frac = rank - lower
+        lo_value = np.searchsorted(cumsum, lower, side="right")
+        hi_value = np.searchsorted(cumsum, min(lower + 1, n - 1), side="right")
+        result.append(lo_value + frac * (hi_value - lo_value))
+    return np.array(result, dtype="float64")
+
+
+def _fast_percentiles_1c(
+    image, percentiles, chunk_bytes, max_samples, channel=None
+):
+    """estimate the percentiles of a single channel image (or of
+    a single channel of a YXC image when `channel` is given)
+
+    Returns:
+        Tuple[np.ndarray, float]: the percentiles and an upper bound of
+            the error in percentile points (ie 0.1 means that the rank of
+            the estimate might be off by 0.1 percent)
+    """
+    if np.issubdtype(image.dtype, np.integer) and image.dtype.itemsize <= 2:
+        offset = int(np.iinfo(image.dtype).min)
+        n_bins = int(np.iinfo(image.dtype).max) - offset + 1
+        hist = np.zeros(n_bins, dtype="int64")
+        chunk_bytes = min(
+            chunk_bytes, HISTOGRAM_CHUNK_VALUES * image.dtype.itemsize
+        )
+        for chunk in _iter_row_chunks(image, chunk_bytes, channel):
+            values = chunk.reshape(-1)
+            if offset != 0:
+                values = values.astype("int64") - offset
+            hist += np.bincount(values, minlength=n_bins)
+        return _percentiles_from_histogram(hist, percentiles) + offset, 0.0
+
+    size = int(image.shape[0] * image.shape[1])
+    if size <= max_samples:
+        values = np.asarray(image)
+        if channel is not None:
+            values = values[..., channel]
+        # a copy which `np.percentile` may partition in place
+        values = np.array(values, dtype="float32").reshape(-1)
+        return np.percentile(values, percentiles, overwrite_input=True), 0.0
+
+    # i.i.d. samples of the whole image, drawn chunk by chunk: the
+    # number of samples of each chunk is multinomial (proportional to
+    # its size) and the samples within a chunk are uniform. A regular
+    # stride would only hit a few columns when it divides the rows.
+    rng = np.random.default_rng(SAMPLE_SEED)
+    rows = _chunk_rows(image, chunk_bytes)
+    row_size = size // image.shape[0]
+    chunk_sizes = [
+        row_size * (min(start + rows, image.shape[0]) - start)
+        for start in range(0, image.shape[0], rows)
+    ]
+    counts = rng.multinomial(max_samples, np.array(chunk_sizes) / size)
+    # the samples are written into a single preallocated buffer
+    # which `np.percentile` may then partition in place
+    samples = np.empty(max_samples, dtype="float32")
+    n = 0
+    chunks = _iter_row_chunks(image, chunk_bytes, channel)
+    for chunk, count in zip(chunks, counts):
+        values = chunk.reshape(-1)
+        for k in range(0, count, SAMPLE_BATCH):
+            batch = min(SAMPLE_BATCH, count - k)
+            samples[n : n + batch] = values[
+                rng.integers(0, values.size, batch)
+            ]
+            n += batch
+    result = np.percentile(samples, percentiles, overwrite_input=True)
+
+    # Dvoretzky-Kiefer-Wolfowitz: with prob. 1-alpha the empirical cdf
+    # of n samples is within eps of the true cdf
+    eps = math.sqrt(math.log(2.0 / RANK_ERROR_ALPHA) / (2.0 * samples.size))
+    return result, 100.0 * eps
+
+
+def compute_percentiles(
+    image,
+    percentile_low,
+    percentile_high,
+    mode="exact",
+    chunk_bytes=DEFAULT_CHUNK_BYTES,
+    max_samples=DEFAULT_MAX_SAMPLES,
+):
+    """compute the low / high percentiles of a gray (YX)
+    or multi channel (YXC) image per channel
+
+    Args:
+        image (array-like): the image
+        percentile_low (float): the low percentile in [0, 100]
+        percentile_high (float): the high percentile in [0, 100]
+        mode (str, optional): "exact" or "fast"
+        chunk_bytes (int, optional): size of the chunks in "fast" mode
+        max_samples (int, optional): maximum number of samples per channel
+            for non-integer images in "fast" mode
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, float]: the low and high percentiles
+            (one value per channel) and an upper bound of the rank error
+            in percentile points (0 for exact results)
+    """
+    if mode not in NORMALIZE_MODES:
+        raise ValueError(
+            f"unknown mode `{mode}`, use one of {NORMALIZE_MODES}"
+        )
+
+    percentiles = (percentile_low, percentile_high)
+    # in "fast" mode the channels are read block by block (ie a
+    # lazy image is never loaded as a whole), while `np.percentile`
+    # needs the whole image anyway
+    channels = [None] if image.ndim == 2 else range(image.shape[-1])
+    if mode == "exact":
+        image = np.asarray(image)
+
+    lows, highs, rank_error = [], [], 0.0
+    for channel in channels:
+        if mode == "exact":
+            values = image if channel is None else image[..., channel]
+            lo, hi = np.percentile(values, percentiles)
+            error = 0.0
+        else:
+            (lo, hi), error = _fast_percentiles_1c(
+                image, percentiles, chunk_bytes, max_samples, channel
+            )
+        lows.append(lo)
+        highs.append(hi)
+        rank_error = max(rank_error, error)
+    return np.array(lows), np.array(highs), rank_error
+
+
+def rescale(image, mi, ma, eps=1e-20, inplace=False):
+    """the affine rescale `(x - mi) / (ma - mi + eps)` as in csbdeep
+    (ie computed in float32)
+
+    Args:
+        image (np.ndarray): the image (YX or YXC)
+        mi (np.ndarray): the low value (per channel)
+        ma (np.ndarray): the high value (per channel)
+        eps (float, optional): avoids a division by zero
+        inplace (bool, optional): rescale `image` itself. This
+            is only done if `image` is a writable float32 array
+
+    Returns:
+        np.ndarray: the rescaled float32 image
+    """
+    mi = np.asarray(mi, dtype="float32")
+    ma = np.asarray(ma, dtype="float32")
+    if image.ndim == 2:
+        mi, ma = mi.reshape(()), ma.reshape(())
+    eps = np.float32(eps)
+    scale = ma - mi + eps
+
+    can_be_inplace = (
+        isinstance(image, np.ndarray)
+        and image.dtype == np.float32
+        and image.flags.writeable
+    )
+    if inplace and can_be_inplace:
+        out = image
+        np.subtract(image, mi, out=out)
+    else:
+        out = np.subtract(image, mi, dtype="float32")
+    np.divide(out, scale, out=out)
+    return out
+
+
+def normalize(
+    image,
+    percentile_low,
+    percentile_high,
+    mode="exact",
+    inplace=False,
+    eps=1e-20,
+    **kwargs,
+):
+    """percentile based normalization (per channel)
+
+    Args:
+        image (array-like): the image (YX or YXC)
+        percentile_low (float): the low percentile in [0, 100]
+        percentile_high (float): the high percentile in [0, 100]
+        mode (str, optional): "exact" or "fast"
+        inplace (bool, optional): allow to rescale the image in place
+        eps (float, optional): avoids a division by zero
+        **kwargs: passed to `compute_percentiles`
+
+    Returns:
+        Tuple[np.ndarray, dict]: the normalized float32 image and a dict
+            with the percentiles used (`low`, `high`) and the `rank_error`
+            (an upper bound of how far the ranks of the estimated
+            percentiles are off, in percentile points)
+    """
+    lows, highs, rank_error = compute_percentiles(
+        image, percentile_low, percentile_high, mode=mode, **kwargs
+    )
+    info = dict(mode=mode, low=lows, high=highs, rank_error=rank_error)
+    logger.info(
+        f"normalize {mode=} {percentile_low=} {percentile_high=} "
+        f"low={lows} high={highs} rank_error={rank_error:.4f}%"
+    )
+    return rescale(image, lows, highs, eps=eps, inplace=inplace), info
+
+
+def percentile_deviation(image, percentile_low, percentile_high, **kwargs):
+    """how far are the "fast" percentiles from the exact ones?
+
+    This computes both (and is therefore slow), it is meant
+    to check the quality of the estimate on representative images.
+
+    Returns:
+        dict: the absolute difference of the values (`low`, `high`),
+            the differences relative to the exact intensity range
+            (`low_relative`, `high_relative`) and the `rank_error` bound
+    """
+    lo_exact, hi_exact, _ = compute_percentiles(
+        image, percentile_low, percentile_high, mode="exact"
+    )
+    lo_fast, hi_fast, rank_error = compute_percentiles(
+        image, percentile_low, percentile_high, mode="fast", **kwargs
+    )
+    value_range = np.maximum(hi_exact - lo_exact, 1e-20)
+    return dict(
+        low=np.abs(lo_fast - lo_exact),
+        high=np.abs(hi_fast - hi_exact),
+        low_relative=np.abs(lo_fast - lo_exact) / value_range,
+        high_relative=np.abs(hi_fast - hi_exact) / value_range,
+        rank_error=rank_error,
+    )
@@ -0,0 +1,157 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .._logging import logger
+from .cache import ModelCache
+
+# The network outputs (the object probabilities and the spline
+# coefficients) only depend on the image, the model, the normalization
+# and the tiling, but not on the probability / nms thresholds.
+# We keep the outputs of the most recent predictions st. a change of the
+# thresholds only reruns the (cheap) non-maximum suppression.
+
+DEFAULT_MAX_ENTRIES = 8
+DEFAULT_MAX_BYTES = 1024**3
+
+
+def data_fingerprint(data):
+    """a fingerprint of the content of an array
+
+    Args:
+        data (array-like): the data (ie of a napari layer)
+
+    Returns:
+        tuple: shape, dtype and a hash of the values
+    """
+    data = np.ascontiguousarray(data)
+    digest = hashlib.blake2b(memoryview(data).cast("B"), digest_size=16)
+    return data.shape, data.dtype.str, digest.hexdigest()
+
+
+def output_key(
+    image,
+    model_path,
+    grid,
+    model_in_channels,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    normalize_mode,
+    n_tiles,
+):
+    """the key of the network outputs of an image in the `OutputCache`
+
+    Args:
+        image (array-like): the image the network runs on
+            (before preprocessing)
+        n_tiles (tuple|None): the (resolved) tiling
+        The other arguments are the same as for `predict`
+
+    Returns:
+        tuple: the key
+    """
+    return (
+        data_fingerprint(image),
+        ModelCache.key(model_path, grid),
+        int(model_in_channels),
+        bool(normalize_image),
+        # normalization parameters only matter when normalizing
+        (float(percentile_low), float(percentile_high), normalize_mode)
+        if normalize_image
+        else None,
+        bool(invert_image),
+        None if n_tiles is None else tuple(int(n) for n in n_tiles),
+    )
+
+
+class OutputCache:
+    """a thread-safe LRU cache for network outputs
+    bounded by count and by memory
+
+    Attributes:
+        max_entries (int): maximum number of cached outputs
+        max_bytes (int): maximum memory of all cached outputs
+        hits (int): number of lookups which found cached outputs
+        misses (int): number of lookups which did not
+    """
+
+    def __init__(
+        self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES
+    ):
+        """
+        Args:
+            max_entries (int, optional): maximum number of cached outputs
+            max_bytes (int, optional): maximum memory in bytes
+        """
+        self._lock = threading.Lock()
+        self._outputs = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """the cached outputs for a key
+
+        Args:
+            key (tuple): the key (see `output_key`)
+
+        Returns:
+            tuple|None: (img_shape, prob, dist) or none if not cached
+        """
+        with self._lock:
+            if key not in self._outputs:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._outputs.move_to_end(key)
+            return self._outputs[key]
+
+    def put(self, key, outputs):
+        """cache the outputs for a key
+
+        Args:
+            key (tuple): the key (see `output_key`)
+            outputs (tuple): (img_shape, prob, dist)
+        """
+        img_shape, prob, dist = outputs
+        # the cached arrays must not change
+        prob.setflags(write=False)
+        dist.setflags(write=False)
+        with self._lock:
+            self._outputs[key] = outputs
+            self._outputs.move_to_end(key)
+            # we always keep the most recent outputs
+            while len(self._outputs) > 1 and (
+                len(self._outputs) > self.max_entries
+                or self.n_bytes > self.max_bytes
+            ):
+                evicted, _ = self._outputs.popitem(last=False)
+                logger.info(f"evict network outputs of {evicted[0]}")
+
+    def clear(self):
+        """remove all cached outputs"""
+        with self._lock:
+            self._outputs.clear()
+
+    @property
+    def n_bytes(self):
+        """the memory of all cached outputs"""
+        return sum(
+            prob.nbytes + dist.nbytes
+            for _, prob, dist in self._outputs.values()
+        )
+
+    def __len__(self):
+        return len(self._outputs)
+
+    def __contains__(self, key):
+        return key in self._outputs
+
+
+# the outputs of the most recent predictions of the widget
+OUTPUT_CACHE = OutputCache()
@@ -4,22 +4,26 @@
 #     absolute_import,
 #     division,
 # )
-import functools
 import json
+import math
+from collections import defaultdict
 from pathlib import Path
 
 import numpy as np
-from csbdeep.utils import normalize
-from splinedist.utils import grid_generator, phi_generator
 
 from .._logging import logger
-from ..exceptions import PredictionException
+from .artifacts import prepare_model_dir
+from .cache import ModelCache
+from .network import run_network
+from .outputs import output_key
+from .preprocess import preprocess, preprocessed_shape
+from .tiling import auto_n_tiles, div_by, load_network_config
 
+# number of images passed through the network in one go
+DEFAULT_BATCH_SIZE = 8
 
-# to speed up thye building of the model,
-# we cache this
-@functools.lru_cache(maxsize=1)
-def build_model(model_path, grid=(2, 2)):
+
+def _build_model(model_path, grid=(2, 2)):
 
     from splinedist.models import Config2D, SplineDist2D
 
@@ -36,13 +40,38 @@ def build_model(model_path, grid=(2, 2)):
         contoursize_max=config["contoursize_max"],
     )
 
-    phi_generator(M, conf.contoursize_max, str(model_path))
-    grid_generator(M, conf.train_patch_size, conf.grid, str(model_path))
+    # the phi/grid tables are computed only once and stored in the appdir.
+    # For read-only model directories we get a (writable) shadow directory
+    model_path = prepare_model_dir(
+        model_path,
+        M=M,
+        contoursize_max=conf.contoursize_max,
+        train_patch_size=conf.train_patch_size,
+        grid=conf.grid,
+    )
 
     basedir = model_path.parent
     return SplineDist2D(None, name=model_path.name, basedir=str(basedir))
 
 
+# to speed up the building of the model, we keep
+# the most recently used models in a cache
+MODEL_CACHE = ModelCache(builder=_build_model)
+
+
+def build_model(model_path, grid=(2, 2)):
+    """get the model from the cache or build it
+
+    Args:
+        model_path (Path): the model directory
+        grid (tuple, optional): the grid of the model
+
+    Returns:
+        SplineDist2D: the model
+    """
+    return MODEL_CACHE.get(Path(model_path), grid)
+
+
 def predict(
     image,
     model_path,
@@ -56,31 +85,104 @@ def predict(
     grid=(2, 2),
     progress_callback=None,
     n_tiles=None,
+    normalize_mode="exact",
+    memory_budget=None,
+    output_cache=None,
 ):
-    # how many color channels does the imag have?
-    if image.ndim == 2:
-        in_channels = 1
-    elif image.ndim == 3:
-        in_channels = image.shape[2]
-
-    model_in_channels = model_meta.in_channels
-    # are they matching with the models expected
-    # number of channels?
-    if in_channels != model_in_channels:
-        if model_in_channels == 1:
-            image = np.sum(image, axis=2) / in_channels
-        else:
-            raise PredictionException(
-                f"{in_channels} != {model_meta.in_channels}"
-            )
+    outputs = predict_outputs(
+        image,
+        model_path=model_path,
+        normalize_image=normalize_image,
+        percentile_low=percentile_low,
+        percentile_high=percentile_high,
+        invert_image=invert_image,
+        model_meta=model_meta,
+        grid=grid,
+        progress_callback=progress_callback,
+        n_tiles=n_tiles,
+        normalize_mode=normalize_mode,
+        memory_budget=memory_budget,
+        output_cache=output_cache,
+    )
+    return instances_from_outputs(
+        outputs,
+        model_path=model_path,
+        prob_thresh=prob_thresh,
+        nms_thresh=nms_thresh,
+        grid=grid,
+    )
+
+
+def predict_outputs(
+    image,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    n_tiles=None,
+    normalize_mode="exact",
+    memory_budget=None,
+    output_cache=None,
+):
+    """run the network, ie everything of `predict` which
+    does not depend on the thresholds
+
+    Args:
+        output_cache (OutputCache, optional): when given, the outputs
+            are taken from / stored in this cache
+        The other arguments are the same as for `predict`
+
+    Returns:
+        Tuple[tuple, np.ndarray, np.ndarray]: the (YX) shape of the
+            image, the object probabilities and the spline coefficients
+    """
+    # pick the tiling from the memory budget
+    if n_tiles == "auto":
+        shape = preprocessed_shape(image, model_meta.in_channels)
+        n_tiles, _ = auto_n_tiles(
+            model_path, shape, grid=grid, budget=memory_budget
+        )
+
+    key = None
+    if output_cache is not None:
+        key = output_key(
+            image,
+            model_path=model_path,
+            grid=grid,
+            model_in_channels=model_meta.in_channels,
+            normalize_image=normalize_image,
+            percentile_low=percentile_low,
+            percentile_high=percentile_high,
+            invert_image=invert_image,
+            normalize_mode=normalize_mode,
+            n_tiles=n_tiles,
+        )
+        outputs = output_cache.get(key)
+        if outputs is not None:
+            logger.info("use cached network outputs")
+            return outputs
+
+    # collapse the channels, convert to float32, invert and normalize
+    # in a single float32 buffer. The input is never changed
+    # (it usually is the data of a napari layer)
+    img = preprocess(
+        image,
+        model_in_channels=model_meta.in_channels,
+        normalize_image=normalize_image,
+        percentile_low=percentile_low,
+        percentile_high=percentile_high,
+        invert_image=invert_image,
+        normalize_mode=normalize_mode,
+    )
+
+    # the tiles are given for the spatial axes only
+    if n_tiles is not None and len(n_tiles) < img.ndim:
+        n_tiles = tuple(n_tiles) + (1,) * (img.ndim - len(n_tiles))
 
-    # if the image has an integral dtype, we normalize
-    # by dividing with the max value for that dtype
-    # even when normalize_image == False
-    if np.issubdtype(image.dtype, np.integer):
-        image = image.astype("float32") / np.iinfo(image.dtype).max
-    else:
-        image = np.require(image, requirements=["C"], dtype="float32")
     if progress_callback is not None:
         progress_callback("build-model", 0)
     # cached st
@@ -88,26 +190,162 @@ def predict(
     if progress_callback is not None:
         progress_callback("build-model", 100)
 
-    # should the image be inverted (only for gray)
-    if invert_image:
-        if in_channels > 1:
-            raise PredictionException("only gray image can be inverted")
-        image = image.max() - image
-
-    axis_norm = (0, 1)
-    if normalize_image:
-        logger.info(f"normalize {percentile_low=} {percentile_high=}")
-        img = normalize(image, percentile_low, percentile_high, axis=axis_norm)
-    else:
-        img = image
-
-    # run prediction
-    labels, details = model.predict_instances(
+    # run the network tile by tile (reporting the progress after each
+    # tile, st. a run can be cancelled between two tiles)
+    prob, dist = run_network(
+        model,
         img,
-        # progress_callback=progress_callback,
+        n_tiles=n_tiles,
+        progress_callback=progress_callback,
+    )
+    outputs = img.shape[0:2], prob, dist
+
+    if output_cache is not None:
+        output_cache.put(key, outputs)
+    return outputs
+
+
+def instances_from_outputs(
+    outputs, model_path, prob_thresh, nms_thresh, grid=(2, 2)
+):
+    """the non-maximum suppression on the network outputs
+
+    Args:
+        outputs (tuple): the outputs from `predict_outputs`
+        The other arguments are the same as for `predict`
+
+    Returns:
+        Tuple[np.ndarray, dict]: the labels and the details
+    """
+    img_shape, prob, dist = outputs
+    model = build_model(model_path=model_path, grid=grid)
+    return model._instances_from_prediction(
+        img_shape,
+        prob,
+        dist,
         prob_thresh=prob_thresh,
         nms_thresh=nms_thresh,
-        n_tiles=n_tiles,
     )
 
-    return labels, details
+
+def _padded_shape(shape, div):
+    # the shape splinedist pads an image to
+    return tuple(math.ceil(s / d) * d for s, d in zip(shape, div))
+
+
+def _instances(model, img_shape, prob, dist, grid, div, **kwargs):
+    """crop the network output of a padded image (as
+    `SplineDistPadAndCropResizer.after` does) and run the nms
+    """
+    crop = []
+    for s, g, d in zip(img_shape, grid, div):
+        pad = (d - s % d) % d
+        crop.append(slice(0, -(pad // g) if pad >= g else None))
+    crop = tuple(crop)
+    return model._instances_from_prediction(
+        img_shape, prob[crop], dist[crop], **kwargs
+    )
+
+
+def predict_batched(
+    images,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    prob_thresh,
+    nms_thresh,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    normalize_mode="exact",
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """predict many images with batched forward passes of the network
+
+    Images which are padded to the same shape (ie splinedist pads
+    the images to a multiple of the network's downsampling factor)
+    are stacked into batches of up to `batch_size` images and passed
+    through the network in a single call. The non-maximum suppression
+    and the extraction of the splines are done per image.
+    The results are the same as calling `predict` for each image.
+
+    Args:
+        images (List[array-like]): the images (YX or YXC)
+        batch_size (int, optional): maximum number of images per batch
+        The other arguments are the same as for `predict`
+
+    Returns:
+        List[Tuple[np.ndarray, dict]]: labels and details for each image
+            (in the order of the input)
+    """
+    if progress_callback is not None:
+        progress_callback("build-model", 0)
+    model = build_model(model_path=model_path, grid=grid)
+    if progress_callback is not None:
+        progress_callback("build-model", 100)
+
+    config = load_network_config(model_path, grid=grid)
+    div = div_by(config)
+    grid = tuple(config["grid"])
+
+    def _preprocess(image):
+        return preprocess(
+            image,
+            model_in_channels=model_meta.in_channels,
+            normalize_image=normalize_image,
+            percentile_low=percentile_low,
+            percentile_high=percentile_high,
+            invert_image=invert_image,
+            normalize_mode=normalize_mode,
+        )
+
+    # group the images by the shape they are padded to
+    groups = defaultdict(list)
+    for i, image in enumerate(images):
+        groups[_padded_shape(image.shape[0:2], div)].append(i)
+
+    batches = [
+        (padded_shape, indices[start : start + batch_size])
+        for padded_shape, indices in groups.items()
+        for start in range(0, len(indices), batch_size)
+    ]
+    logger.info(
+        f"batched prediction of {len(images)} images in "
+        f"{len(batches)} batches ({batch_size=})"
+    )
+
+    results = [None] * len(images)
+    for k, (padded_shape, indices) in enumerate(batches):
+        n_channels = model_meta.in_channels
+        batch = np.empty(
+            (len(indices),) + padded_shape + (n_channels,), dtype="float32"
+        )
+        shapes = []
+        for b, i in enumerate(indices):
+            img = _preprocess(images[i])
+            img = img.reshape(img.shape[0:2] + (n_channels,))
+            shapes.append(img.shape[0:2])
+            # pad at the end (as `SplineDistPadAndCropResizer` does)
+            pad = [(0, p - s) for p, s in zip(padded_shape, img.shape)]
+            batch[b] = np.pad(img, pad + [(0, 0)], mode="reflect")
+
+        prob, dist = model.keras_model.predict(
+            batch, batch_size=len(indices), verbose=0
+        )
+        for b, i in enumerate(indices):
+            results[i] = _instances(
+                model,
+                shapes[b],
+                prob[b, ..., 0],
+                dist[b],
+                grid=grid,
+                div=div,
+                prob_thresh=prob_thresh,
+                nms_thresh=nms_thresh,
+            )
+
+        if progress_callback is not None:
+            progress_callback("predict", 100 * (k + 1) / len(batches))
+    return results
@@ -0,0 +1,199 @@
+import numpy as np
+
+from .._logging import logger
+from ..exceptions import PredictionException
+from .normalize import compute_percentiles, normalize, rescale
+
+# The preprocessing of the input image before it is passed to the network:
+#
+#   1. collapse the color channels (when the model expects gray images)
+#   2. convert to float32 (integer images are divided by the max value
+#      of their dtype)
+#   3. invert the image (optional, gray images only)
+#   4. percentile based normalization (optional)
+#
+# All steps work in a single float32 buffer (which can be preallocated
+# by the caller) and are applied in place. The peak memory (on top of
+# the input image itself) is therefore bounded by:
+#
+#   * one float32 buffer of the output shape (Y*X*C_out*4 bytes)
+#   * plus in "exact" normalization mode: one float32 copy of a single
+#     channel (Y*X*4 bytes) which `np.percentile` needs for partitioning
+#   * plus in "fast" normalization mode: the subsample of at most
+#     `normalize.DEFAULT_MAX_SAMPLES` float32 values (independent of
+#     the image size)
+#
+# In "fast" mode the percentiles of integer images (whose channels are
+# not collapsed) are computed on the input itself, st. 8/16 bit images
+# use the histogram (see `normalize`), and are mapped to the buffer.
+#
+# ie at most 2x the float32 size of a gray image (instead of the 4-5x
+# of doing every step with temporaries).
+
+
+def preprocessed_shape(image, model_in_channels):
+    """shape of the preprocessed image
+
+    Args:
+        image (array-like): the input image (YX or YXC)
+        model_in_channels (int): number of channels the model expects
+
+    Returns:
+        tuple: the shape (YX for gray models, YXC otherwise)
+
+    Raises:
+        PredictionException: when the channels do not match the model
+    """
+    in_channels = 1 if image.ndim == 2 else image.shape[2]
+    if in_channels == model_in_channels:
+        return tuple(image.shape)
+    elif model_in_channels == 1:
+        return tuple(image.shape[0:2])
+    raise PredictionException(f"{in_channels} != {model_in_channels}")
+
+
+def input_percentiles(
+    image,
+    percentile_low,
+    percentile_high,
+    mode="fast",
+    max_value=None,
+    **kwargs,
+):
+    """the percentiles of an input image (whose channels are not
+    collapsed) in the units of the preprocessed image, ie divided by
+    the max value of the dtype for integer images (and inverted as
+    `max_value - x` when `max_value` is given)
+
+    Args:
+        image (array-like): the image (YX or YXC)
+        percentile_low (float): the low percentile in [0, 100]
+        percentile_high (float): the high percentile in [0, 100]
+        mode (str, optional): "exact" or "fast"
+        max_value (float, optional): the max value of the
+            preprocessed image (when it is inverted)
+        **kwargs: passed to `compute_percentiles`
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, float]: as `compute_percentiles`
+    """
+    scale = 1
+    if np.issubdtype(image.dtype, np.integer):
+        scale = np.iinfo(image.dtype).max
+    if max_value is None:
+        lows, highs, rank_error = compute_percentiles(
+            image, percentile_low, percentile_high, mode=mode, **kwargs
+        )
+        return lows / scale, highs / scale, rank_error
+
+    # the p-th percentile of `max - x` is `max` minus
+    # the (100-p)-th percentile of `x`
+    lows, highs, rank_error = compute_percentiles(
+        image, 100 - percentile_high, 100 - percentile_low, mode=mode, **kwargs
+    )
+    return max_value - highs / scale, max_value - lows / scale, rank_error
+
+
+def preprocess(
+    image,
+    model_in_channels,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    normalize_mode="exact",
+    out=None,
+):
+    """preprocess an image for the model in a single float32 buffer
+
+    Args:
+        image (array-like): the input image (YX or YXC), this
+            is never changed
+        model_in_channels (int): number of channels the model expects
+        normalize_image (bool): apply percentile based normalization
+        percentile_low (float): low percentile for the normalization
+        percentile_high (float): high percentile for the normalization
+        invert_image (bool): invert the (gray) image
+        normalize_mode (str, optional): "exact" or "fast"
+            (see `model.normalize`)
+        out (np.ndarray, optional): a preallocated float32 buffer
+            of shape `preprocessed_shape(image, model_in_channels)`
+
+    Returns:
+        np.ndarray: the preprocessed float32 image
+
+    Raises:
+        PredictionException: when the channels do not match the model
+            or when a multi channel image should be inverted
+    """
+    shape = preprocessed_shape(image, model_in_channels)
+    collapse = len(shape) != image.ndim
+    out_channels = 1 if len(shape) == 2 else shape[2]
+
+    if invert_image and out_channels > 1:
+        raise PredictionException("only gray image can be inverted")
+
+    # for float32 inputs we do not need a buffer when nothing is changed
+    if (
+        out is None
+        and not collapse
+        and not invert_image
+        and not normalize_image
+        and isinstance(image, np.ndarray)
+        and image.dtype == np.float32
+    ):
+        return np.require(image, requirements=["C"])
+
+    if out is None:
+        out = np.empty(shape, dtype="float32")
+    elif out.shape != shape or out.dtype != np.float32:
+        raise ValueError(
+            f"out must be a float32 array of shape {shape}, "
+            f"got {out.dtype} {out.shape}"
+        )
+
+    # 1. + 2.: copy / sum the channels into the float32 buffer
+    if collapse:
+        out[...] = image[..., 0]
+        for c in range(1, image.shape[2]):
+            np.add(out, image[..., c], out=out, dtype="float32")
+        np.divide(out, image.shape[2], out=out)
+    else:
+        out[...] = image
+
+    if np.issubdtype(image.dtype, np.integer):
+        np.divide(out, np.iinfo(image.dtype).max, out=out)
+
+    # 3. invert
+    if invert_image:
+        max_value = out.max()
+        np.subtract(max_value, out, out=out)
+
+    # 4. normalize (inplace since we own the buffer)
+    if (
+        normalize_image
+        and normalize_mode == "fast"
+        and not collapse
+        and np.issubdtype(image.dtype, np.integer)
+    ):
+        lows, highs, rank_error = input_percentiles(
+            image,
+            percentile_low,
+            percentile_high,
+            max_value=max_value if invert_image else None,
+        )
+        logger.info(
+            f"normalize mode='fast' (on the {image.dtype} input) "
+            f"{percentile_low=} {percentile_high=} low={lows} high={highs} "
+            f"rank_error={rank_error:.4f}%"
+        )
+        out = rescale(out, lows, highs, inplace=True)
+    elif normalize_image:
+        out, _ = normalize(
+            out,
+            percentile_low,
+            percentile_high,
+            mode=normalize_mode,
+            inplace=True,
+        )
+    return out
@@ -0,0 +1,318 @@
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from .._logging import logger
+from ..utils.download_file import download_file
+
+# Qt-free helpers to go from the entries in the config
+# (see `config.config.CONFIG`) to a model directory on disk.
+# These are used by the `ModelDownloadWidget` and by the
+# headless batch prediction
+
+# the number of models `prefetch_models` downloads at the same time
+DEFAULT_PREFETCH_WORKERS = 4
+
+# how often (in seconds) `prefetch_models` yields while downloading
+PREFETCH_POLL_SECONDS = 0.1
+
+
+def find_model_meta(models_meta, name):
+    """find the model meta with a given name
+
+    Args:
+        models_meta (List[ModelModel]): all models (ie `CONFIG.models`)
+        name (str): the name of the model
+
+    Returns:
+        ModelModel: the model meta
+
+    Raises:
+        KeyError: when there is no model with that name
+    """
+    for model_meta in models_meta:
+        if model_meta.name == name:
+            return model_meta
+    names = [model_meta.name for model_meta in models_meta]
+    raise KeyError(f"unknown model `{name}`, available models: {names}")
+
+
+def find_source(model_meta, n_control_points=None):
+    """find the source of a model with a given number of control points
+
+    Args:
+        model_meta (ModelModel): the model meta
+        n_control_points (int, optional): number of control points,
+            if None the first source is used
+
+    Returns:
+        SourceModel: the source
+
+    Raises:
+        KeyError: when there is no source with that number of control points
+    """
+    if n_control_points is None:
+        return model_meta.sources[0]
+    for source in model_meta.sources:
+        if source.n_control_points == n_control_points:
+            return source
+    available = [source.n_control_points for source in model_meta.sources]
+    raise KeyError(
+        f"model `{model_meta.name}` has no source with "
+        f"{n_control_points} control points, available: {available}"
+    )
+
+
+def model_base_name(model_meta, source):
+    """name of the model directory (and zip file) for downloaded models"""
+    return f"{model_meta.name}_{source.n_control_points}"
+
+
+def model_path_from_source(model_meta, source, download_dir):
+    """the directory where the model is (or will be) located
+
+    Args:
+        model_meta (ModelModel): the model meta
+        source (SourceModel): the source of the model
+        download_dir (Path): the directory where models are downloaded to
+
+    Returns:
+        Path: the model directory
+    """
+    if source.source_type == "url":
+        return Path(download_dir) / model_base_name(model_meta, source)
+    elif source.source_type == "path":
+        return Path(source.source)
+
+
+def download_model(model_meta, source, download_dir, status_callback):
+    """make sure the model is available in the download dir.
+
+        Like `download_file` this is a generator, which
+        allows to cancel the download.
+
+    Args:
+        model_meta (ModelModel): the model meta
+        source (SourceModel): the source of the model
+        download_dir (Path): the directory where models are downloaded to
+        status_callback (callable): called with (progress, total, downloaded)
+
+    Yields:
+        None: yields while downloading
+
+    Raises:
+        FileNotFoundError: when a source of type `path` does not exist
+            or the downloaded zip does not contain the model directory
+    """
+    model_path = model_path_from_source(model_meta, source, download_dir)
+
+    if source.source_type == "url":
+        if not model_path.exists():
+            Path(download_dir).mkdir(parents=True, exist_ok=True)
+            zip_path = Path(download_dir) / f"{model_path.name}.zip"
+
+            # the empty yield allows us to cancel the download
+            # (a cancelled download continues where it stopped)
+            for _ in download_file(
+                source.source,
+                zip_path,
+                status_callback,
+                checksum=source.checksum,
+            ):
+                yield
+
+            # the model is extracted next to the download dir and moved
+            # into place once complete, ie an interrupted extraction does
+            # not leave a partial model directory behind
+            with tempfile.TemporaryDirectory(dir=download_dir) as tmp:
+                with zipfile.ZipFile(zip_path, "r") as zip_ref:
+                    zip_ref.extractall(tmp)
+                extracted = Path(tmp) / model_path.name
+                if not extracted.is_dir():
+                    raise FileNotFoundError(
+                        f"`{zip_path}` does not contain `{model_path.name}/`"
+                    )
+                if not model_path.exists():
+                    os.replace(extracted, model_path)
+
+    elif source.source_type == "path":
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"source directory `{source.source}` does not exist"
+            )
+
+
+def url_sources(models_meta):
+    """all sources of the models which are downloaded
+
+    Args:
+        models_meta (List[ModelModel]): the models (ie `CONFIG.models`)
+
+    Returns:
+        List[Tuple[ModelModel, SourceModel]]: the models and sources
+    """
+    return [
+        (model_meta, source)
+        for model_meta in models_meta
+        for source in model_meta.sources
+        if source.source_type == "url"
+    ]
+
+
+def prefetch_models(
+    models_meta,
+    download_dir,
+    status_callback,
+    max_workers=DEFAULT_PREFETCH_WORKERS,
+    cancelled=None,
+):
+    """download all models (with all numbers of control points)
+    concurrently, st. selecting a model later does not wait for
+    the download.
+
+        Like `download_file` this is a generator, which allows to
+        cancel the downloads: closing the generator stops all
+        downloads after their current chunk (they continue where
+        they stopped the next time). A generator which is just not
+        resumed anymore (ie an aborted napari worker) does not stop
+        them, for this `cancelled` can be set from any thread.
+
+    Args:
+        models_meta (List[ModelModel]): the models (ie `CONFIG.models`)
+        download_dir (Path): the directory where models are downloaded to
+        status_callback (callable): called with (progress, n_models,
+            n_done), ie the mean progress of all downloads in [0,100],
+            the number of models and of models which are ready. It is
+            called from the download threads
+        max_workers (int, optional): the number of concurrent downloads
+        cancelled (threading.Event, optional): when set, all downloads
+            stop after their current chunk and the generator returns
+            once all download threads are done
+
+    Yields:
+        None: yields while downloading
+
+    Raises:
+        RuntimeError: if some of the downloads failed (once all
+            others are done)
+    """
+    sources = url_sources(models_meta)
+    if not sources:
+        return
+
+    if cancelled is None:
+        cancelled = threading.Event()
+    # set when the generator is closed (or done), `cancelled` belongs
+    # to the caller
+    stopped = threading.Event()
+
+    def stop_requested():
+        return stopped.is_set() or cancelled.is_set()
+
+    lock = threading.Lock()
+    progress = [0.0] * len(sources)
+    n_done = [0]
+
+    def report(index, value, done=False):
+        with lock:
+            progress[index] = value
+            n_done[0] += int(done)
+            status_callback(
+                sum(progress) / len(sources), len(sources), n_done[0]
+            )
+
+    def fetch(index, model_meta, source):
+        def status(p, total, downloaded):
+            report(index, p)
+
+        if stop_requested():
+            # not started yet
+            return
+        download = download_model(model_meta, source, download_dir, status)
+        try:
+            for _ in download:
+                if stop_requested():
+                    return
+        finally:
+            download.close()
+        report(index, 100.0, done=True)
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="prefetch"
+    )
+    try:
+        futures = {
+            executor.submit(fetch, index, model_meta, source): (
+                model_meta,
+                source,
+            )
+            for index, (model_meta, source) in enumerate(sources)
+        }
+        pending = set(futures)
+        while pending and not cancelled.is_set():
+            _, pending = wait(
+                pending,
+                timeout=PREFETCH_POLL_SECONDS,
+                return_when=FIRST_COMPLETED,
+            )
+            yield
+    finally:
+        # stops the running downloads (ie when the generator is closed)
+        # and waits for them, st. no thread writes into the partial
+        # files anymore
+        stopped.set()
+        executor.shutdown(wait=True)
+
+    if cancelled.is_set():
+        return
+
+    failed = []
+    for future, (model_meta, source) in futures.items():
+        if future.exception() is not None:
+            name = model_base_name(model_meta, source)
+            logger.error(f"failed to download {name}: {future.exception()}")
+            failed.append(future)
+    if failed:
+        raise RuntimeError(
+            f"{len(failed)} of {len(sources)} model downloads failed"
+        ) from failed[0].exception()
+
+
+def resolve_model(
+    name, n_control_points=None, download_dir=None, models_meta=None
+):
+    """resolve (and download if needed) a model from the config
+
+    Args:
+        name (str): the name of the model (ie `bbbc038`)
+        n_control_points (int, optional): number of control points,
+            if None the first source of the model is used
+        download_dir (Path, optional): where to download models to,
+            defaults to the appdir
+        models_meta (List[ModelModel], optional): the models,
+            defaults to `CONFIG.models`
+
+    Returns:
+        Tuple[ModelModel, Path]: the model meta and the model directory
+    """
+    if models_meta is None or download_dir is None:
+        from ..config.config import APPDIR, load_config
+
+        if models_meta is None:
+            models_meta = load_config().models
+        if download_dir is None:
+            download_dir = APPDIR
+
+    model_meta = find_model_meta(models_meta, name)
+    source = find_source(model_meta, n_control_points)
+
+    def status(progress, total, downloaded):
+        pass
+
+    for _ in download_model(model_meta, source, download_dir, status):
+        pass
+
+    return model_meta, model_path_from_source(model_meta, source, download_dir)
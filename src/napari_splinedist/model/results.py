@@ -0,0 +1,107 @@
+import numpy as np
+
+from ..utils.labels import compact_labels
+from ..utils.splines import knots_from_coefs_batched
+
+
+def transform_results(
+    labels, details, slicing=None, shape=None, downsample=None
+):
+    """change / transform the results st we can
+        display the resutls
+
+    Args:
+        labels (np.array): the result labels
+        details (dict): dict with coordinates
+        slicing (Tuple[slice,slice]|None): Description
+        shape (Tuple[int,int]): *full* shape of input image!
+          (this is not the shape of the visible part, but
+          the full shape, since we "paste" the visible
+          part in the full_labels array )
+        downsample (array-like|None): the (YX) downsample factors
+          of the pyramid level we predicted on, the coordinates
+          are mapped to the full resolution
+
+    Returns:
+        Tuple(np.array, List): labels and coordinates
+    """
+
+    # if the slicing is not none we need to compute an
+    # offset we need to add to each coordinate of the slines.
+    # Also we paste the "sub-labels" (ie the visible part)
+    # in the "full-labels"
+    if slicing is not None:
+        # get the offset
+        offset = np.array([slicing[0].start, slicing[1].start])
+        # the empty "full-labels" (in the smallest sufficient dtype)
+        labels = compact_labels(labels)
+        full_labels = np.zeros(shape, dtype=labels.dtype)
+        # paste the sub-lables
+        full_labels[slicing] = labels
+        labels = full_labels
+    else:
+        # when we predic on the full image (ie *not* just the
+        # visible part) we can set the offset to zero
+        offset = np.array([0, 0])
+        # labels are shown in the smallest sufficient dtype
+        # (out-of-core labels keep their dtype)
+        labels = compact_labels(labels)
+
+    return labels, coords_from_details(details, offset, downsample)
+
+
+def coords_from_details(details, offset=(0, 0), downsample=None):
+    """the control points of all objects as splineit needs them
+
+    Args:
+        details (dict): dict with coordinates
+        offset (array-like, optional): added to each control point
+        downsample (array-like, optional): the control points (after
+            adding the offset) are multiplied by it
+
+    Returns:
+        List[np.ndarray]: the (M, 2) control points of each object
+    """
+    # the result coordinates as given by splinedist
+    coords = details["coord"]
+    # convert the "coefs" (this is what splinedist returns)
+    # of all objects to actual controll points on the spline
+    knots = knots_from_coefs_batched(coords, offset=offset)
+    if downsample is not None:
+        # from a pyramid level to the full resolution
+        knots = knots * np.asarray(downsample, dtype=knots.dtype)
+    # the results as we need them for splineit
+    return list(knots)
+
+
+def transform_stack_results(
+    labels, details_list, slicing=None, shape=None, downsample=None
+):
+    """the same as `transform_results` for a stack of frames
+
+    Args:
+        labels (np.array): the result labels (frame axes plus YX)
+        details_list (List[dict]): the details of each frame
+        slicing (tuple|None): the slicing of the (visible) part we
+            predicted on (frame axes plus YX)
+        shape (tuple): *full* shape (frame axes plus YX)
+        downsample (array-like|None): the (YX) downsample factors
+            of the pyramid level we predicted on
+
+    Returns:
+        Tuple(np.array, List[List]): labels and the coordinates
+            of each frame
+    """
+    # labels are shown in the smallest sufficient dtype
+    # (out-of-core labels keep their dtype)
+    labels = compact_labels(labels)
+    offset = np.array([0, 0])
+    if slicing is not None:
+        offset = np.array([slicing[-2].start, slicing[-1].start])
+        full_labels = np.zeros(shape, dtype=labels.dtype)
+        full_labels[slicing] = labels
+        labels = full_labels
+    return labels, [
+        coords_from_details(details, offset, downsample)
+        for details in details_list
+    ]
@@ -0,0 +1,201 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .._logging import logger
+from .predict import predict
+from .preprocess import preprocess
+
+# Prediction on stacks of 2D frames (ie time-lapses, z-stacks or both).
+#
+# The leading axes of an image are the "frame" axes, the last two
+# (or three, for color images) axes are the spatial ones. The frames
+# are processed in a producer / consumer pipeline: while the model runs
+# on frame t, frame t+1 is read and preprocessed in a background thread
+# (tensorflow releases the GIL, so both run in parallel).
+
+
+def is_rgb(shape, model_in_channels, rgb=None):
+    """does the last axis of an image hold the color channels?
+
+    Args:
+        shape (tuple): the shape of the image
+        model_in_channels (int): number of channels the model expects
+        rgb (bool, optional): the answer if already known (ie from
+            the `rgb` attribute of a napari image layer). If not given,
+            we guess like napari does (a last axis of size 3 or 4)
+
+    Returns:
+        bool: true if the last axis holds the channels
+    """
+    if rgb is not None:
+        return bool(rgb)
+    if len(shape) < 3:
+        return False
+    if model_in_channels > 1 and shape[-1] == model_in_channels:
+        return True
+    return shape[-1] in (3, 4)
+
+
+def frame_shape(shape, model_in_channels, rgb=None):
+    """the shape of the frame axes (empty for a single 2D image)"""
+    n_spatial = 3 if is_rgb(shape, model_in_channels, rgb) else 2
+    return tuple(shape[: len(shape) - n_spatial])
+
+
+def _prefetched(fn, items):
+    """yield `fn(item)` for all items, where the result for the next
+    item is computed in a background thread while the caller consumes
+    the current one
+    """
+    if not items:
+        return
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(fn, items[0])
+        for i in range(len(items)):
+            result = future.result()
+            if i + 1 < len(items):
+                future = pool.submit(fn, items[i + 1])
+            yield result
+
+
+def predict_stack(
+    image,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    prob_thresh,
+    nms_thresh,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    n_tiles=None,
+    normalize_mode="exact",
+    memory_budget=None,
+    rgb=None,
+    labels_out=None,
+):
+    """run splinedist frame by frame on a stack of images
+
+    Each frame is normalized on its own (ie the same as calling
+    `predict` for each frame).
+
+    Args:
+        image (array-like): the stack (...YX or ...YXC), ie a numpy,
+            dask or zarr array
+        rgb (bool, optional): does the last axis hold the color channels
+            (see `is_rgb`)
+        labels_out (array-like, optional): the output for the labels
+            with the shape of the frame axes plus YX. When not given,
+            an in-memory array is used
+        The other arguments are the same as for `predict`
+
+    Returns:
+        Tuple[array-like, List[dict]]: the labels of all frames and
+            the details for each frame in the order of
+            `np.ndindex(frame_shape(...))`
+    """
+    for labels_out, details_list in iter_predict_stack(
+        image,
+        model_path=model_path,
+        normalize_image=normalize_image,
+        percentile_low=percentile_low,
+        percentile_high=percentile_high,
+        invert_image=invert_image,
+        prob_thresh=prob_thresh,
+        nms_thresh=nms_thresh,
+        model_meta=model_meta,
+        grid=grid,
+        progress_callback=progress_callback,
+        n_tiles=n_tiles,
+        normalize_mode=normalize_mode,
+        memory_budget=memory_budget,
+        rgb=rgb,
+        labels_out=labels_out,
+    ):
+        pass
+    return labels_out, details_list
+
+
+def iter_predict_stack(
+    image,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    prob_thresh,
+    nms_thresh,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    n_tiles=None,
+    normalize_mode="exact",
+    memory_budget=None,
+    rgb=None,
+    labels_out=None,
+):
+    """the same as `predict_stack`, yielding the results after
+    each frame (ie to show them while the prediction runs)
+
+    Yields:
+        Tuple[array-like, List[dict]]: the labels of all frames (the
+            frames not predicted yet are zero) and the details of the
+            frames predicted so far. The same objects are yielded
+            after each frame, ie they are filled in place
+    """
+    rgb = is_rgb(image.shape, model_meta.in_channels, rgb)
+    frames = frame_shape(image.shape, model_meta.in_channels, rgb)
+    spatial = tuple(image.shape[len(frames) : len(frames) + 2])
+    if labels_out is None:
+        labels_out = np.zeros(frames + spatial, dtype="int32")
+    elif tuple(labels_out.shape) != frames + spatial:
+        raise ValueError(
+            f"labels_out has shape {labels_out.shape}, "
+            f"expected {frames + spatial}"
+        )
+
+    indices = list(np.ndindex(frames))
+    logger.info(f"predict stack {frames=} {spatial=} {rgb=}")
+
+    def produce(index):
+        # read and preprocess a frame (runs in the background thread)
+        return preprocess(
+            np.asarray(image[index]),
+            model_in_channels=model_meta.in_channels,
+            normalize_image=normalize_image,
+            percentile_low=percentile_low,
+            percentile_high=percentile_high,
+            invert_image=invert_image,
+            normalize_mode=normalize_mode,
+        )
+
+    details_list = []
+    for k, (index, img) in enumerate(
+        zip(indices, _prefetched(produce, indices))
+    ):
+        # the frame is already preprocessed
+        labels, details = predict(
+            img,
+            model_path=model_path,
+            normalize_image=False,
+            percentile_low=percentile_low,
+            percentile_high=percentile_high,
+            invert_image=False,
+            prob_thresh=prob_thresh,
+            nms_thresh=nms_thresh,
+            model_meta=model_meta,
+            grid=grid,
+            n_tiles=n_tiles,
+            memory_budget=memory_budget,
+        )
+        labels_out[index] = labels
+        details_list.append(details)
+        if progress_callback is not None:
+            progress_callback("predict", 100 * (k + 1) / len(indices))
+        yield labels_out, details_list
+    if not indices:
+        # an empty stack
+        yield labels_out, details_list
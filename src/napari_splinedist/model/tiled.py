@@ -0,0 +1,784 @@
+import math
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from .._logging import logger
+from ..config.appdir import APPDIR
+from .normalize import DEFAULT_MAX_SAMPLES, rescale
+from .predict import build_model
+from .preprocess import input_percentiles, preprocess, preprocessed_shape
+from .tiling import auto_n_tiles
+
+# Out-of-core (tiled) prediction for images which do not fit into memory.
+#
+# The image (a numpy array, `np.memmap`, zarr or dask array) is split
+# into a regular grid of "core" tiles. Each tile is read lazily together
+# with a `halo` around it and splinedist runs on this region. An object
+# is kept by the tile whose core contains the object's center, and since
+# the halo is larger than the objects, such an object is fully visible in
+# that tile. Objects detected twice close to a seam (ie when the centers
+# predicted by the two tiles fall on different sides of the seam) are
+# merged with the same IoU criterion as the non-maximum suppression.
+#
+# The labels are written tile by tile into an array-like output
+# (`np.memmap`, zarr, ...), st. neither the input nor the output
+# has to be in memory at once.
+
+DEFAULT_TILE_SHAPE = (1024, 1024)
+
+# should be larger than the diameter of the largest object
+DEFAULT_HALO = 64
+
+# where the widget writes the labels of out-of-core layers
+LABELS_DIR = APPDIR / "labels"
+
+
+def is_out_of_core(data):
+    """is the data of a layer not a plain in-memory numpy array
+    (ie a `np.memmap`, a zarr or a dask array)?
+    """
+    return isinstance(data, np.memmap) or not isinstance(data, np.ndarray)
+
+
+def new_labels_file(labels_dir=LABELS_DIR):
+    """create an (empty) file for the labels of an out-of-core layer
+
+    Args:
+        labels_dir (Path, optional): the directory of the file
+
+    Returns:
+        str: the path of a new `.npy` file (see `open_labels_output`)
+    """
+    labels_dir = Path(labels_dir)
+    labels_dir.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".npy", dir=labels_dir)
+    os.close(fd)
+    return path
+
+
+def remove_labels_file(path):
+    """remove a labels file which is not needed anymore
+
+    On windows a file can not be removed while it is memory mapped,
+    ie all references to the `np.memmap` have to be dropped first.
+
+    Args:
+        path (str|Path): the file (see `new_labels_file`)
+
+    Returns:
+        bool: true if the file is removed (or did not exist)
+    """
+    try:
+        Path(path).unlink(missing_ok=True)
+    except PermissionError:
+        logger.debug(f"can not remove {path} (yet), it is still in use")
+        return False
+    return True
+
+
+def clean_labels_dir(labels_dir=LABELS_DIR):
+    """remove the labels files left by earlier sessions
+
+    Files which are still memory mapped by another running napari
+    are kept on windows, on other platforms they stay readable until
+    they are closed.
+
+    Args:
+        labels_dir (Path, optional): the directory of the files
+    """
+    labels_dir = Path(labels_dir)
+    if labels_dir.is_dir():
+        for path in labels_dir.glob("*.npy"):
+            remove_labels_file(path)
+
+
+def open_labels_output(path, shape, dtype="int32", chunks=DEFAULT_TILE_SHAPE):
+    """create an (empty) out-of-core array for the labels
+
+    Args:
+        path (str|Path): a `.zarr` directory or a `.npy` file
+        shape (tuple): the spatial (YX) shape of the image
+        dtype (str, optional): dtype of the labels
+        chunks (tuple, optional): the chunks (zarr only)
+
+    Returns:
+        array-like: a zarr array or a `np.memmap` filled with zeros
+    """
+    path = Path(path)
+    if path.suffix == ".zarr":
+        try:
+            import zarr
+        except ImportError as e:
+            raise ImportError(
+                "writing labels to `.zarr` requires the `zarr` package"
+            ) from e
+        return zarr.open(
+            str(path),
+            mode="w",
+            shape=tuple(shape),
+            chunks=tuple(chunks),
+            dtype=dtype,
+            fill_value=0,
+        )
+    # `open_memmap` creates a sparse file, ie this is filled with zeros
+    return np.lib.format.open_memmap(
+        path, mode="w+", dtype=dtype, shape=tuple(shape)
+    )
+
+
+def tile_slices(shape, tile_shape=DEFAULT_TILE_SHAPE, halo=DEFAULT_HALO):
+    """split a (YX) shape into a regular grid of tiles
+
+    Args:
+        shape (tuple): the spatial shape of the image
+        tile_shape (tuple, optional): the shape of the (core) tiles
+        halo (int, optional): margin read around each tile
+
+    Returns:
+        List[Tuple[tuple, tuple, tuple]]: for each tile the tile index,
+            the slicing of the core and the slicing of the region read
+            (ie the core plus the halo, clipped to the image)
+    """
+    starts = [range(0, s, t) for s, t in zip(shape[0:2], tile_shape)]
+    tiles = []
+    for i, y0 in enumerate(starts[0]):
+        for j, x0 in enumerate(starts[1]):
+            y1 = min(y0 + tile_shape[0], shape[0])
+            x1 = min(x0 + tile_shape[1], shape[1])
+            core = (slice(y0, y1), slice(x0, x1))
+            read = (
+                slice(max(y0 - halo, 0), min(y1 + halo, shape[0])),
+                slice(max(x0 - halo, 0), min(x1 + halo, shape[1])),
+            )
+            tiles.append(((i, j), core, read))
+    return tiles
+
+
+class _PreprocessedImage(object):
+    """a lazy view of the preprocessed image (the channels collapsed,
+    integer images divided by the max value of their dtype) which is
+    preprocessed block by block when it is read (see
+    `normalize.compute_percentiles`)
+    """
+
+    def __init__(self, image, model_in_channels):
+        self._image = image
+        self._in_channels = model_in_channels
+        self.shape = preprocessed_shape(image, model_in_channels)
+        self.ndim = len(self.shape)
+        self.dtype = np.dtype("float32")
+
+    def __getitem__(self, rows):
+        return preprocess(
+            np.asarray(self._image[rows]),
+            self._in_channels,
+            False,
+            0,
+            0,
+            False,
+        )
+
+    def __array__(self, dtype=None):
+        return np.asarray(self[:], dtype=dtype)
+
+
+def _statistics(
+    image,
+    tiles,
+    model_in_channels,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    normalize_mode,
+    max_samples,
+    progress_callback,
+):
+    """the max value (for the inversion) and the percentiles (for the
+    normalization) of the preprocessed image
+
+    The max value is found in a (streaming) pass over the tiles. The
+    percentiles are computed by `normalize.compute_percentiles`, ie
+    in "fast" mode block by block (with the histogram of 8/16 bit
+    inputs) while the "exact" mode needs the whole image in memory.
+    """
+    mx = -np.inf
+    if invert_image:
+        for k, (_, core, _) in enumerate(tiles):
+            tile = preprocess(
+                np.asarray(image[core]), model_in_channels, False, 0, 0, False
+            )
+            mx = max(mx, float(tile.max()))
+            if progress_callback is not None:
+                progress_callback("statistics", 100 * (k + 1) / len(tiles))
+
+    lo, hi = None, None
+    if normalize_image:
+        # the percentiles of the input are mapped to the preprocessed
+        # image unless the channels are collapsed
+        collapse = len(preprocessed_shape(image, model_in_channels)) != (
+            image.ndim
+        )
+        if collapse:
+            image = _PreprocessedImage(image, model_in_channels)
+        lo, hi, rank_error = input_percentiles(
+            image,
+            percentile_low,
+            percentile_high,
+            mode=normalize_mode,
+            max_value=mx if invert_image else None,
+            max_samples=max_samples,
+        )
+        logger.info(
+            f"tiled normalize {normalize_mode=} {percentile_low=} "
+            f"{percentile_high=} low={lo} high={hi} "
+            f"rank_error={rank_error:.4f}%"
+        )
+        if progress_callback is not None:
+            progress_callback("statistics", 100)
+    return lo, hi, mx
+
+
+def _bboxes(coefs):
+    """bounding boxes (y0, x0, y1, x1) of the splines.
+    A B-spline lies in the convex hull of its coefficients,
+    so this is a conservative bounding box
+    """
+    return np.concatenate([coefs.min(axis=2), coefs.max(axis=2)], axis=1)
+
+
+def _overlapping(bbox, bboxes):
+    return np.flatnonzero(
+        (bboxes[:, 0] <= bbox[2])
+        & (bbox[0] <= bboxes[:, 2])
+        & (bboxes[:, 1] <= bbox[3])
+        & (bbox[1] <= bboxes[:, 3])
+    )
+
+
+def _bbox_slicing(bbox, shape):
+    y0 = max(int(math.floor(bbox[0])), 0)
+    x0 = max(int(math.floor(bbox[1])), 0)
+    y1 = min(int(math.ceil(bbox[2])) + 1, shape[0])
+    x1 = min(int(math.ceil(bbox[3])) + 1, shape[1])
+    return slice(y0, max(y0, y1)), slice(x0, max(x0, x1))
+
+
+class _SeamMerger(object):
+    """keeps track of the objects which cross the seam of their tile
+    and suppresses duplicates of them in the neighbouring tiles
+    """
+
+    def __init__(self, labels_out, nms_thresh):
+        self.labels_out = labels_out
+        self.nms_thresh = nms_thresh
+        # tile index -> (label ids, bboxes, probs) of the seam objects
+        self.seam_objects = dict()
+        self.removed = set()
+        self.n_duplicates = 0
+
+    def _candidates(self, tile_index):
+        i, j = tile_index
+        ids, bboxes, probs = [], [], []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                entry = self.seam_objects.get((i + di, j + dj))
+                if entry is not None:
+                    ids.append(entry[0])
+                    bboxes.append(entry[1])
+                    probs.append(entry[2])
+        if not ids:
+            return None
+        return (
+            np.concatenate(ids),
+            np.concatenate(bboxes),
+            np.concatenate(probs),
+        )
+
+    def _iou(self, bbox, other_id, other_bbox, mask_fn):
+        union = (
+            min(bbox[0], other_bbox[0]),
+            min(bbox[1], other_bbox[1]),
+            max(bbox[2], other_bbox[2]),
+            max(bbox[3], other_bbox[3]),
+        )
+        slicing = _bbox_slicing(union, self.labels_out.shape)
+        mask = mask_fn(slicing)
+        other = np.asarray(self.labels_out[slicing]) == other_id
+        union_area = np.count_nonzero(mask | other)
+        if union_area == 0:
+            return 0.0
+        return np.count_nonzero(mask & other) / union_area
+
+    def erase(self, label_id, bbox):
+        slicing = _bbox_slicing(bbox, self.labels_out.shape)
+        block = np.array(self.labels_out[slicing])
+        block[block == label_id] = 0
+        self.labels_out[slicing] = block
+        self.removed.add(label_id)
+
+    def merge(self, tile_index, label_ids, bboxes, probs, on_seam, mask_fn):
+        """decide which of the seam objects of a tile are kept
+
+        Args:
+            tile_index (tuple): index of the tile
+            label_ids (np.ndarray): global label ids of the objects
+            bboxes (np.ndarray): bounding boxes of the objects
+            probs (np.ndarray): probabilities of the objects
+            on_seam (np.ndarray): bool mask, which objects cross the seam
+            mask_fn (callable): `mask_fn(k, slicing)` gives the pixel
+                mask of the k-th object in a (global) slicing
+
+        Returns:
+            np.ndarray: bool mask of the objects which are kept
+        """
+        keep = np.ones(len(label_ids), dtype=bool)
+        candidates = self._candidates(tile_index)
+        for k in np.flatnonzero(on_seam):
+            if candidates is None:
+                break
+            other_ids, other_bboxes, other_probs = candidates
+            for o in _overlapping(bboxes[k], other_bboxes):
+                if other_ids[o] in self.removed:
+                    continue
+                iou = self._iou(
+                    bboxes[k],
+                    other_ids[o],
+                    other_bboxes[o],
+                    lambda slicing: mask_fn(k, slicing),
+                )
+                if iou <= self.nms_thresh:
+                    continue
+                self.n_duplicates += 1
+                if probs[k] > other_probs[o]:
+                    self.erase(other_ids[o], other_bboxes[o])
+                else:
+                    keep[k] = False
+                    break
+
+        on_seam = on_seam & keep
+        self.seam_objects[tile_index] = (
+            label_ids[on_seam],
+            bboxes[on_seam],
+            probs[on_seam],
+        )
+        return keep
+
+
+def sliced_shape(shape, slicing):
+    """the shape of `data[slicing]` without reading the data
+    (ie for zarr / dask arrays)
+
+    Args:
+        shape (tuple): the shape of the data
+        slicing (tuple): the slices of the leading axes
+
+    Returns:
+        tuple: the shape
+    """
+    return tuple(
+        len(range(*s.indices(n))) for s, n in zip(slicing, shape)
+    ) + tuple(shape[len(slicing) :])
+
+
+def tiles_in_view(tiles, slicing):
+    """the tiles whose core intersects a (visible) region
+
+    Args:
+        tiles (List[tuple]): the tiles (see `tile_slices`)
+        slicing (tuple): the (YX) slicing of the region
+
+    Returns:
+        List[tuple]: the indices of the tiles, the tiles closest to the
+            center of the region first
+    """
+    center = [(s.start + s.stop) / 2 for s in slicing]
+    visible = []
+    for tile_index, core, _ in tiles:
+        if all(
+            c.start < s.stop and s.start < c.stop
+            for c, s in zip(core, slicing)
+        ):
+            distance = sum(
+                ((c.start + c.stop) / 2 - m) ** 2 for c, m in zip(core, center)
+            )
+            visible.append((distance, tile_index))
+    return [tile_index for _, tile_index in sorted(visible)]
+
+
+class TiledPrediction(object):
+    """a tile by tile prediction of an (out-of-core) image where the
+    tiles are predicted on demand and in any order.
+
+    Finished tiles are kept (ie the labels and the objects of the
+    whole image build up tile by tile), predicting a tile a second time
+    costs nothing. The statistics for the normalization and the model
+    are computed once when the prediction is created.
+
+    Attributes:
+        tiles (List[tuple]): the tiles (see `tile_slices`)
+        done (set): the indices of the predicted tiles
+        labels_out (array-like): the labels of the predicted tiles
+    """
+
+    def __init__(
+        self,
+        image,
+        model_path,
+        normalize_image,
+        percentile_low,
+        percentile_high,
+        invert_image,
+        prob_thresh,
+        nms_thresh,
+        model_meta,
+        grid=(2, 2),
+        progress_callback=None,
+        n_tiles=None,
+        normalize_mode="fast",
+        tile_shape=DEFAULT_TILE_SHAPE,
+        halo=DEFAULT_HALO,
+        labels_out=None,
+        max_samples=DEFAULT_MAX_SAMPLES,
+        memory_budget=None,
+    ):
+        """
+        The arguments are the same as for `predict_tiled`
+        """
+        self.shape = tuple(image.shape[0:2])
+        # raises early if the channels do not match
+        preprocessed_shape(image, model_meta.in_channels)
+
+        if labels_out is None:
+            labels_out = np.zeros(self.shape, dtype="int32")
+        elif tuple(labels_out.shape) != self.shape:
+            raise ValueError(
+                f"labels_out has shape {labels_out.shape}, "
+                f"expected {self.shape}"
+            )
+
+        self.image = image
+        self.model_path = model_path
+        self.model_meta = model_meta
+        self.normalize_image = normalize_image
+        self.invert_image = invert_image
+        self.prob_thresh = prob_thresh
+        self.grid = grid
+        self.n_tiles = n_tiles
+        self.memory_budget = memory_budget
+        self.halo = halo
+        self.labels_out = labels_out
+
+        self.tiles = tile_slices(self.shape, tile_shape, halo)
+        self._tiles = {index: (core, read) for index, core, read in self.tiles}
+        self.done = set()
+        logger.info(f"tiled prediction {self.shape=} {tile_shape=} {halo=}")
+
+        self._lo, self._hi, self._mx = _statistics(
+            image,
+            self.tiles,
+            model_in_channels=model_meta.in_channels,
+            normalize_image=normalize_image,
+            percentile_low=percentile_low,
+            percentile_high=percentile_high,
+            invert_image=invert_image,
+            normalize_mode=normalize_mode,
+            max_samples=max_samples,
+            progress_callback=progress_callback,
+        )
+
+        if progress_callback is not None:
+            progress_callback("build-model", 0)
+        self._model = build_model(model_path=model_path, grid=grid)
+        if progress_callback is not None:
+            progress_callback("build-model", 100)
+
+        self._merger = _SeamMerger(labels_out, nms_thresh)
+        self._results = dict(coord=[], points=[], prob=[], label=[])
+        self._next_label = 1
+        self.n_truncated = 0
+        self._buffer = None
+        self._tile_n_tiles = n_tiles
+
+    def predict_tile(self, tile_index):
+        """predict a tile (unless it is done already) and paint its
+        objects into the labels
+
+        Args:
+            tile_index (tuple): the index of the tile
+
+        Returns:
+            bool: false if the tile was done already
+        """
+        if tile_index in self.done:
+            return False
+        core, read = self._tiles[tile_index]
+        in_channels = self.model_meta.in_channels
+        offset = np.array([read[0].start, read[1].start])
+        tile = np.asarray(self.image[read])
+
+        # the buffer is reused for all tiles with the same shape
+        buffer_shape = preprocessed_shape(tile, in_channels)
+        if self._buffer is None or self._buffer.shape != buffer_shape:
+            self._buffer = np.empty(buffer_shape, dtype="float32")
+            if self.n_tiles == "auto":
+                self._tile_n_tiles, _ = auto_n_tiles(
+                    self.model_path,
+                    buffer_shape,
+                    grid=self.grid,
+                    budget=self.memory_budget,
+                )
+        img = preprocess(
+            tile, in_channels, False, 0, 0, False, out=self._buffer
+        )
+        if self.invert_image:
+            np.subtract(self._mx, img, out=img)
+        if self.normalize_image:
+            img = rescale(img, self._lo, self._hi, inplace=True)
+
+        tile_labels, details = self._model.predict_instances(
+            img,
+            prob_thresh=self.prob_thresh,
+            nms_thresh=self._merger.nms_thresh,
+            n_tiles=self._tile_n_tiles,
+        )
+
+        # only keep the objects with their center in the core
+        points = details["points"] + offset
+        owned = np.flatnonzero(
+            (points[:, 0] >= core[0].start)
+            & (points[:, 0] < core[0].stop)
+            & (points[:, 1] >= core[1].start)
+            & (points[:, 1] < core[1].stop)
+        )
+        coefs = details["coord"][owned] + offset[None, :, None]
+        bboxes = _bboxes(coefs)
+        probs = details["prob"][owned]
+        label_ids = np.arange(self._next_label, self._next_label + len(owned))
+        self._next_label += len(owned)
+
+        # objects reaching beyond the region we have read are cut off
+        shape = self.shape
+        truncated = (
+            ((bboxes[:, 0] < read[0].start) & (read[0].start > 0))
+            | ((bboxes[:, 1] < read[1].start) & (read[1].start > 0))
+            | ((bboxes[:, 2] >= read[0].stop) & (read[0].stop < shape[0]))
+            | ((bboxes[:, 3] >= read[1].stop) & (read[1].stop < shape[1]))
+        )
+        self.n_truncated += int(np.count_nonzero(truncated))
+
+        on_seam = (
+            (bboxes[:, 0] < core[0].start)
+            | (bboxes[:, 1] < core[1].start)
+            | (bboxes[:, 2] >= core[0].stop)
+            | (bboxes[:, 3] >= core[1].stop)
+        )
+
+        # the ids in `tile_labels` are the indices in `details` + 1
+        def mask_fn(o, slicing):
+            local = tuple(
+                slice(s.start - r.start, s.stop - r.start)
+                for s, r in zip(slicing, read)
+            )
+            mask = np.zeros(
+                (
+                    slicing[0].stop - slicing[0].start,
+                    slicing[1].stop - slicing[1].start,
+                ),
+                dtype=bool,
+            )
+            # the part of the slicing which is inside the tile
+            inner = tuple(
+                slice(max(s.start, 0), min(s.stop, n))
+                for s, n in zip(local, tile_labels.shape)
+            )
+            target = tuple(
+                slice(i.start - s.start, i.stop - s.start)
+                for i, s in zip(inner, local)
+            )
+            mask[target] = tile_labels[inner] == owned[o] + 1
+            return mask
+
+        keep = self._merger.merge(
+            tile_index, label_ids, bboxes, probs, on_seam, mask_fn
+        )
+
+        # paint the kept objects into the output
+        labels_out = self.labels_out
+        lut = np.zeros(len(details["prob"]) + 1, dtype=labels_out.dtype)
+        lut[owned[keep] + 1] = label_ids[keep]
+        remapped = lut[tile_labels]
+        block = np.array(labels_out[read])
+        np.copyto(block, remapped, where=remapped > 0)
+        labels_out[read] = block
+
+        self._results["coord"].append(coefs[keep])
+        self._results["points"].append(details["points"][owned[keep]] + offset)
+        self._results["prob"].append(probs[keep])
+        self._results["label"].append(label_ids[keep])
+        self.done.add(tile_index)
+        return True
+
+    def results(self):
+        """the labels and the objects of the tiles predicted so far
+        (at least one tile must be predicted)
+
+        Returns:
+            Tuple[array-like, dict]: the labels and the details (as for
+                `predict_tiled`)
+        """
+        results = {
+            key: np.concatenate(value) for key, value in self._results.items()
+        }
+        # drop the objects which were replaced by a duplicate in a later tile
+        valid = ~np.isin(results["label"], list(self._merger.removed))
+        return self.labels_out, {
+            key: value[valid] for key, value in results.items()
+        }
+
+    @property
+    def n_duplicates(self):
+        """the number of objects found twice at a seam"""
+        return self._merger.n_duplicates
+
+
+def predict_tiled(
+    image,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    prob_thresh,
+    nms_thresh,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    n_tiles=None,
+    normalize_mode="fast",
+    tile_shape=DEFAULT_TILE_SHAPE,
+    halo=DEFAULT_HALO,
+    labels_out=None,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    memory_budget=None,
+):
+    """run splinedist tile by tile on an (out-of-core) image
+
+    The parameters are the same as for `predict`. The image is never
+    loaded as a whole, unless the percentiles for the normalization are
+    computed with `normalize_mode="exact"` (the default "fast" mode
+    reads the image block by block, see `normalize.compute_percentiles`).
+
+    Args:
+        image (array-like): the image (YX or YXC), ie a numpy array,
+            `np.memmap`, zarr or dask array
+        n_tiles (tuple|str, optional): tiles *within* each tile
+            (as for `predict`)
+        memory_budget (int, optional): the memory budget for
+            `n_tiles="auto"`
+        tile_shape (tuple, optional): shape of the (core) tiles
+        halo (int, optional): margin read around each tile, this should
+            be larger than the diameter of the largest object
+        labels_out (array-like, optional): the output for the labels
+            (see `open_labels_output`), filled with zeros. When not
+            given, an in-memory array is used
+        max_samples (int, optional): the number of pixels used to
+            estimate the percentiles (of non 8/16 bit images)
+
+    Returns:
+        Tuple[array-like, dict]: the labels and the details (as for
+            `predict`) in the coordinates of the full image. The extra
+            entry `label` holds the label id of each object
+    """
+    for prediction in iter_predict_tiled(
+        image,
+        model_path=model_path,
+        normalize_image=normalize_image,
+        percentile_low=percentile_low,
+        percentile_high=percentile_high,
+        invert_image=invert_image,
+        prob_thresh=prob_thresh,
+        nms_thresh=nms_thresh,
+        model_meta=model_meta,
+        grid=grid,
+        progress_callback=progress_callback,
+        n_tiles=n_tiles,
+        normalize_mode=normalize_mode,
+        tile_shape=tile_shape,
+        halo=halo,
+        labels_out=labels_out,
+        max_samples=max_samples,
+        memory_budget=memory_budget,
+    ):
+        pass
+    return prediction.results()
+
+
+def iter_predict_tiled(
+    image,
+    model_path,
+    normalize_image,
+    percentile_low,
+    percentile_high,
+    invert_image,
+    prob_thresh,
+    nms_thresh,
+    model_meta,
+    grid=(2, 2),
+    progress_callback=None,
+    n_tiles=None,
+    normalize_mode="fast",
+    tile_shape=DEFAULT_TILE_SHAPE,
+    halo=DEFAULT_HALO,
+    labels_out=None,
+    max_samples=DEFAULT_MAX_SAMPLES,
+    memory_budget=None,
+):
+    """the same as `predict_tiled`, yielding the prediction after
+    each tile (ie to show the results while the prediction runs)
+
+    Yields:
+        TiledPrediction: the prediction, `results()` gives the labels
+            and the objects of the tiles predicted so far
+    """
+    prediction = TiledPrediction(
+        image,
+        model_path=model_path,
+        normalize_image=normalize_image,
+        percentile_low=percentile_low,
+        percentile_high=percentile_high,
+        invert_image=invert_image,
+        prob_thresh=prob_thresh,
+        nms_thresh=nms_thresh,
+        model_meta=model_meta,
+        grid=grid,
+        progress_callback=progress_callback,
+        n_tiles=n_tiles,
+        normalize_mode=normalize_mode,
+        tile_shape=tile_shape,
+        halo=halo,
+        labels_out=labels_out,
+        max_samples=max_samples,
+        memory_budget=memory_budget,
+    )
+    tiles = prediction.tiles
+    for k, (tile_index, _, _) in enumerate(tiles):
+        prediction.predict_tile(tile_index)
+        if progress_callback is not None:
+            progress_callback("predict", 100 * (k + 1) / len(tiles))
+        yield prediction
+
+    if prediction.n_truncated > 0:
+        logger.warning(
+            f"{prediction.n_truncated} objects are larger than the "
+            f"{halo=} and might be cut off at the tile borders"
+        )
+
+    _, results = prediction.results()
+    logger.info(
+        f"tiled prediction found {len(results['label'])} objects "
+        f"({prediction.n_duplicates} seam duplicates removed)"
+    )
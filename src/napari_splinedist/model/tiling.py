@@ -0,0 +1,262 @@
+import itertools
+import json
+import math
+from pathlib import Path
+
+from .._logging import logger
+
+# Automatic selection of `n_tiles` from a memory budget.
+#
+# The memory needed to run the network on a tile is estimated from
+# the model config (ie the architecture of the U-Net) and the shape
+# of the tile: we sum up the float32 activations of all layers, which
+# is an upper bound of what tensorflow keeps alive at the same time.
+# The outputs (prob / dist) for the whole image and the preprocessed
+# image do not depend on the tiling and are counted once.
+# Of all tilings which fit into the budget, we pick the one which
+# processes the fewest pixels (tiles overlap, so more tiles means
+# more work).
+
+# fraction of the available memory used when no budget is given
+DEFAULT_BUDGET_FRACTION = 0.5
+
+# we never split an axis into more tiles than this
+MAX_TILES_PER_AXIS = 32
+
+# same defaults as `splinedist.models.Config2D`
+_CONFIG_DEFAULTS = dict(
+    grid=(2, 2),
+    n_channel_in=1,
+    unet_n_depth=3,
+    unet_kernel_size=(3, 3),
+    unet_n_filter_base=32,
+    unet_n_conv_per_depth=2,
+    unet_pool=(2, 2),
+    net_conv_after_unet=128,
+)
+
+
+def available_memory():
+    """the available memory (in bytes)"""
+    import psutil
+
+    return psutil.virtual_memory().available
+
+
+def total_memory():
+    """the total (physical) memory (in bytes)"""
+    import psutil
+
+    return psutil.virtual_memory().total
+
+
+def default_memory_budget():
+    """the default memory budget (in bytes)"""
+    return int(DEFAULT_BUDGET_FRACTION * available_memory())
+
+
+def load_network_config(model_path, grid=None):
+    """the parts of the model config which determine the memory usage
+
+    Args:
+        model_path (Path): the model directory
+        grid (tuple, optional): the grid the model is built with
+            (overrides the grid of the config)
+
+    Returns:
+        dict: the config
+    """
+    with open(Path(model_path) / "config.json") as f:
+        config = json.load(f)
+    n_params = config["n_params"]
+    config = {
+        key: config.get(key, default)
+        for key, default in _CONFIG_DEFAULTS.items()
+    }
+    config["n_params"] = n_params
+    if grid is not None:
+        config["grid"] = tuple(grid)
+    return config
+
+
+def div_by(config):
+    """the (YX) shape of the network input must be divisible by this"""
+    return tuple(
+        p ** config["unet_n_depth"] * g
+        for p, g in zip(config["unet_pool"], config["grid"])
+    )
+
+
+def tile_overlap(config):
+    """an estimate of the receptive field radius (per axis), ie the
+    overlap the tiles need st. the results do not change
+    """
+    overlaps = []
+    for axis in range(2):
+        k = config["unet_kernel_size"][axis] // 2
+        n_conv = config["unet_n_conv_per_depth"]
+        grid = config["grid"][axis]
+        pool = config["unet_pool"][axis]
+
+        # convs before pooling to the grid
+        radius, scale = 0, 1
+        while scale < grid:
+            radius += n_conv * k * scale
+            scale *= 2
+        # down / up path of the U-Net and the bottom
+        for d in range(config["unet_n_depth"]):
+            radius += 2 * n_conv * k * scale * pool**d
+        radius += n_conv * k * scale * pool ** config["unet_n_depth"]
+        # the features
+        if config["net_conv_after_unet"] > 0:
+            radius += k * scale
+        overlaps.append(radius)
+    return tuple(overlaps)
+
+
+def estimate_activation_bytes(config, tile_shape):
+    """estimate the memory the network needs for a tile
+
+    Args:
+        config (dict): the network config (see `load_network_config`)
+        tile_shape (tuple): the (YX) shape of the tile
+
+    Returns:
+        int: the estimated number of bytes
+    """
+    h, w = (math.ceil(s / d) * d for s, d in zip(tile_shape, div_by(config)))
+    n_conv = config["unet_n_conv_per_depth"]
+    n_filter = config["unet_n_filter_base"]
+
+    # the input
+    n_values = h * w * config["n_channel_in"]
+
+    # convs and pooling to the grid
+    scale = (1, 1)
+    while scale != tuple(config["grid"]):
+        pixels = (h // scale[0]) * (w // scale[1])
+        n_values += n_conv * pixels * n_filter
+        scale = tuple(
+            s * (2 if s < g else 1) for s, g in zip(scale, config["grid"])
+        )
+        n_values += (h // scale[0]) * (w // scale[1]) * n_filter
+
+    # the U-Net: at each depth the convs on the way down and
+    # the concatenation plus the convs on the way up
+    h, w = h // scale[0], w // scale[1]
+    for d in range(config["unet_n_depth"] + 1):
+        pixels = (h // config["unet_pool"][0] ** d) * (
+            w // config["unet_pool"][1] ** d
+        )
+        channels = n_filter * 2**d
+        n_values += n_conv * pixels * channels
+        if d < config["unet_n_depth"]:
+            n_values += pixels * (3 * channels + n_conv * channels)
+
+    # the features and the outputs (on the grid)
+    n_values += (
+        h * w * (config["net_conv_after_unet"] + 1 + config["n_params"])
+    )
+    return 4 * n_values
+
+
+def _tile_shape(shape, n_tiles, config):
+    # the shape of a tile as `csbdeep.internals.predict.tile_iterator`
+    # produces it: a multiple of `div_by` plus the overlap on both sides
+    tile_shape = []
+    for s, n, d, o in zip(
+        shape, n_tiles, div_by(config), tile_overlap(config)
+    ):
+        if n == 1:
+            tile_shape.append(s)
+            continue
+        block = math.ceil(math.ceil(s / d) / n) * d
+        overlap = math.ceil(o / d) * d
+        tile_shape.append(min(s, block + 2 * overlap))
+    return tuple(tile_shape)
+
+
+def estimate_prediction_bytes(config, shape, n_tiles=None):
+    """estimate the memory needed to predict an image
+
+    Args:
+        config (dict): the network config (see `load_network_config`)
+        shape (tuple): the (YX) shape of the image
+        n_tiles (tuple, optional): the tiling
+
+    Returns:
+        int: the estimated number of bytes
+    """
+    n_tiles = (1, 1) if n_tiles is None else tuple(n_tiles)
+    h, w = shape[0:2]
+    # the preprocessed image and the prob / dist for the whole image
+    fixed = 4 * h * w * config["n_channel_in"]
+    grid_pixels = (h // config["grid"][0]) * (w // config["grid"][1])
+    fixed += 4 * grid_pixels * (1 + config["n_params"])
+
+    tile_shape = _tile_shape(shape[0:2], n_tiles, config)
+    return fixed + estimate_activation_bytes(config, tile_shape)
+
+
+def choose_n_tiles(config, shape, budget=None, max_tiles=MAX_TILES_PER_AXIS):
+    """the cheapest tiling which fits into the memory budget
+
+    Args:
+        config (dict): the network config (see `load_network_config`)
+        shape (tuple): the (YX) shape of the image
+        budget (int, optional): the memory budget in bytes,
+            defaults to `default_memory_budget()`
+        max_tiles (int, optional): maximum number of tiles per axis
+
+    Returns:
+        Tuple[tuple|None, int]: the tiling (none if no tiling is needed)
+            and the estimated number of bytes
+    """
+    budget = default_memory_budget() if budget is None else int(budget)
+
+    best, best_cost, lowest = None, None, None
+    for n_tiles in itertools.product(range(1, max_tiles + 1), repeat=2):
+        n_bytes = estimate_prediction_bytes(config, shape, n_tiles)
+        if lowest is None or n_bytes < lowest[1]:
+            lowest = n_tiles, n_bytes
+        if n_bytes > budget:
+            continue
+        # the number of pixels processed (overlapping tiles
+        # are processed more than once), fewer tiles for ties
+        tile_shape = _tile_shape(shape[0:2], n_tiles, config)
+        cost = (n_tiles[0] * n_tiles[1] * tile_shape[0] * tile_shape[1],)
+        cost += (n_tiles[0] * n_tiles[1],)
+        if best_cost is None or cost < best_cost:
+            best, best_cost = (n_tiles, n_bytes), cost
+
+    if best is None:
+        logger.warning(
+            f"no tiling of {shape=} fits into the budget of "
+            f"{budget / 1024**3:.2f} GB, use the tiling with the "
+            "smallest memory footprint"
+        )
+        best = lowest
+
+    n_tiles, n_bytes = best
+    logger.info(
+        f"auto tiling {shape=} {n_tiles=} estimated memory "
+        f"{n_bytes / 1024**3:.2f} GB (budget {budget / 1024**3:.2f} GB)"
+    )
+    return (None if n_tiles == (1, 1) else n_tiles), n_bytes
+
+
+def auto_n_tiles(model_path, shape, grid=None, budget=None):
+    """the cheapest tiling for a model which fits into the memory budget
+
+    Args:
+        model_path (Path): the model directory
+        shape (tuple): the shape of the image (YX or YXC)
+        grid (tuple, optional): the grid the model is built with
+        budget (int, optional): the memory budget in bytes
+
+    Returns:
+        Tuple[tuple|None, int]: the tiling (none if no tiling is needed)
+            and the estimated number of bytes
+    """
+    config = load_network_config(model_path, grid=grid)
+    return choose_n_tiles(config, tuple(shape[0:2]), budget=budget)
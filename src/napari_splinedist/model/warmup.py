@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+from .._logging import logger
+from .predict import build_model
+from .tiled import DEFAULT_TILE_SHAPE
+from .tiling import div_by, load_network_config
+
+# The first prediction pays for importing tensorflow, building the model
+# and tracing the forward pass of keras. `warm_up` does all of this
+# ahead of time (ie in a worker thread once a model is selected): the
+# model ends up in `MODEL_CACHE` and keras has traced the forward pass
+# for the shape the network will most likely see (the padded shape of
+# the image, keras traces again for other shapes).
+
+# the tile shape of the dummy forward pass if the image is not known
+WARMUP_TILE_SHAPE = (256, 256)
+
+
+def warmup_shape(model_path, image_shape=None, grid=(2, 2)):
+    """the (YX) shape of the network input for an image, ie the shape
+    padded to be divisible as the network requires (the image is split
+    into tiles of `DEFAULT_TILE_SHAPE` at most)
+
+    Args:
+        model_path (Path): the model directory
+        image_shape (tuple, optional): the (YX) shape of the image
+        grid (tuple, optional): the grid of the model
+
+    Returns:
+        tuple: the shape
+    """
+    if image_shape is None:
+        image_shape = WARMUP_TILE_SHAPE
+    divisor = div_by(load_network_config(model_path, grid))
+    return tuple(
+        int(math.ceil(min(s, t) / d)) * d
+        for s, t, d in zip(image_shape, DEFAULT_TILE_SHAPE, divisor)
+    )
+
+
+def warm_up(model_path, image_shape=None, grid=(2, 2)):
+    """build the model (into the model cache) and run the network once
+    on zeros
+
+    Args:
+        model_path (Path): the model directory
+        image_shape (tuple, optional): the (YX) shape of the image
+            which is likely predicted next (see `warmup_shape`)
+        grid (tuple, optional): the grid of the model
+
+    Returns:
+        SplineDist2D: the model
+    """
+    model = build_model(model_path, grid)
+    shape = warmup_shape(model_path, image_shape, grid)
+    x = np.zeros((1,) + shape + (model.config.n_channel_in,), dtype=np.float32)
+    model.keras_model.predict(x, verbose=0)
+    logger.info(f"warmed up {model_path} for {shape}")
+    return model
@@ -1,48 +1,193 @@
-import requests
+import hashlib
+import os
+import time
+from pathlib import Path
 
+from .._logging import logger
+from ..exceptions import ChecksumMismatch
 
-def download_file(url, path, status_callback, chunk_size=4096):
+# The file is streamed into `<path>.part` and only renamed to `path`
+# once it is complete (and matches the checksum), ie `path` is either
+# missing or complete. A cancelled or failed download keeps the
+# `.part` file and the next download continues from there (with a
+# http `Range` request, servers which ignore it send the whole file).
+
+# suffix of the file we download into
+PART_SUFFIX = ".part"
+
+# the chunk size adapts to the speed of the connection st. we get
+# the control back (to report progress or to cancel) about every
+# `CHUNK_SECONDS`
+MIN_CHUNK_SIZE = 64 * 2**10
+MAX_CHUNK_SIZE = 8 * 2**20
+CHUNK_SECONDS = 0.25
+
+# timeout (in seconds) to connect / to wait for data
+TIMEOUT = 30
+
+
+def part_path(path):
+    """the path of the file a download into `path` is streamed to"""
+    path = Path(path)
+    return path.with_name(path.name + PART_SUFFIX)
+
+
+def file_checksum(path, algorithm="sha256"):
+    """the hex digest of a file
+
+    Args:
+        path (str|Path): the file
+        algorithm (str, optional): a `hashlib` algorithm
+
+    Returns:
+        str: the hex digest
+    """
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(MAX_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def verify_checksum(path, checksum):
+    """check a file against a checksum
+
+    Args:
+        path (str|Path): the file
+        checksum (str): `<algorithm>:<hex digest>`, ie `sha256:9f86...`
+            (zenodo lists `md5:...` checksums)
+
+    Raises:
+        ChecksumMismatch: if the file does not match
+    """
+    algorithm, _, expected = checksum.partition(":")
+    actual = file_checksum(path, algorithm.lower())
+    if actual != expected.lower():
+        raise ChecksumMismatch(
+            f"`{path}` has the {algorithm} checksum {actual} "
+            f"but {expected} was expected"
+        )
+
+
+def _next_chunk_size(chunk_size, seconds):
+    # double / halve the chunk size when a chunk took
+    # much less / more time than `CHUNK_SECONDS`
+    if seconds < CHUNK_SECONDS / 2:
+        chunk_size *= 2
+    elif seconds > CHUNK_SECONDS * 2:
+        chunk_size //= 2
+    return min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, chunk_size))
+
+
+def download_file(
+    url, path, status_callback, chunk_size=None, checksum=None, session=None
+):
     """download a file from an url and save it to a path.
 
         we implement this as a generator, since this allows
         us to cancel the download. This is particular usefull
         when this function is run in a worker thread.
+        The data is streamed into `<path>.part` (see `part_path`),
+        ie a cancelled or failed download continues where it stopped
+        the next time.
 
-    Parameters
-    ----------
-    url : TYPE
-        Description
-    path : TYPE
-        Description
-    status_callback : TYPE
-        Description
-    chunk_size : int, optional
-        Description
-
-    Yields
-    ------
-    TYPE
-        Description
+    Args:
+        url (str): the url
+        path (str|Path): the output path
+        status_callback (callable): called with (progress, total,
+            downloaded) after each chunk, ie the progress in [0,100]
+            and the total / downloaded bytes (only when the server
+            sends the size of the file)
+        chunk_size (int, optional): a fixed chunk size in bytes,
+            by default the chunk size adapts to the connection
+        checksum (str, optional): `<algorithm>:<hex digest>` the
+            file has to match (see `verify_checksum`)
+        session (requests.Session, optional): the session to use
+
+    Yields:
+        None: yields after each chunk
+
+    Raises:
+        ChecksumMismatch: if the file does not match the checksum
+            (the partial file is removed, ie the next download
+            starts from scratch)
+        requests.HTTPError: for failed requests
     """
-    chunks = []
-
-    response = requests.get(url, stream=True)
-    total_length = response.headers.get("content-length")
-
-    if total_length is None:  # no content length header
-        chunks.append(response.content)
-    else:
-        dl = 0
-        total_length = int(total_length)
-        status_callback(0, total_length, dl)
-        for data in response.iter_content(chunk_size=chunk_size):
-            dl += len(data)
-            chunks.append(data)
-            percent = 100.0 * dl / total_length
-            status_callback(percent, total_length, dl)
-
-            yield
-
-    with open(path, "wb") as f:
-        for chunk in chunks:
-            f.write(chunk)
+    import requests
+
+    path = Path(path)
+    part = part_path(path)
+    get = requests.get if session is None else session.get
+
+    # continue a cancelled / failed download
+    offset = part.stat().st_size if part.exists() else 0
+    # byte offsets are only meaningful without content encoding
+    headers = {"Accept-Encoding": "identity"}
+    if offset > 0:
+        headers["Range"] = f"bytes={offset}-"
+
+    response = get(url, stream=True, headers=headers, timeout=TIMEOUT)
+    try:
+        if response.status_code == 416:
+            # the range starts at (or after) the end of the file, ie
+            # the partial file is complete (or bigger than the file)
+            response.close()
+            part.unlink()
+            yield from download_file(
+                url, path, status_callback, chunk_size, checksum, session
+            )
+            return
+        response.raise_for_status()
+        if response.status_code != 206:
+            # the server ignored the range and sends the whole file
+            offset = 0
+        elif offset > 0:
+            logger.info(f"resume the download of {url} at {offset} bytes")
+
+        total_length = response.headers.get("content-length")
+        if total_length is not None:
+            total_length = offset + int(total_length)
+            status_callback(
+                100.0 * offset / total_length, total_length, offset
+            )
+
+        adaptive = chunk_size is None
+        if adaptive:
+            chunk_size = MIN_CHUNK_SIZE
+        dl = offset
+        with open(part, "ab" if offset > 0 else "wb") as f:
+            while True:
+                t0 = time.perf_counter()
+                data = response.raw.read(chunk_size)
+                if not data:
+                    break
+                f.write(data)
+                dl += len(data)
+                if adaptive:
+                    chunk_size = _next_chunk_size(
+                        chunk_size, time.perf_counter() - t0
+                    )
+                if total_length is not None:
+                    percent = 100.0 * dl / total_length
+                    status_callback(percent, total_length, dl)
+
+                yield
+    finally:
+        response.close()
+
+    if total_length is not None and dl < total_length:
+        # the partial file is kept to continue later
+        raise IOError(
+            f"the download of {url} stopped after {dl} of "
+            f"{total_length} bytes"
+        )
+
+    if checksum is not None:
+        try:
+            verify_checksum(part, checksum)
+        except ChecksumMismatch:
+            part.unlink()
+            raise
+
+    # only complete (and verified) files are at `path`
+    os.replace(part, path)
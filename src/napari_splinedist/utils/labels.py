@@ -0,0 +1,41 @@
+import numpy as np
+
+# the dtypes for labels, from the smallest to the largest
+LABEL_DTYPES = (np.uint8, np.uint16, np.uint32, np.uint64)
+
+
+def label_dtype(max_label):
+    """the smallest unsigned integer dtype which holds all labels
+
+    Args:
+        max_label (int): the largest label
+
+    Returns:
+        np.dtype: the dtype
+    """
+    for dtype in LABEL_DTYPES:
+        if max_label <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"labels up to {max_label} do not fit into uint64")
+
+
+def compact_labels(labels, max_label=None):
+    """convert labels to the smallest sufficient unsigned dtype
+
+    The labels keep their values, ie the label of the i-th object
+    stays i + 1. Out-of-core labels (memmap, zarr, dask) are returned
+    as they are, converting them would load them into memory.
+
+    Args:
+        labels (array-like): the labels
+        max_label (int, optional): the largest label, computed from
+            the labels if not given
+
+    Returns:
+        array-like: the labels
+    """
+    if not isinstance(labels, np.ndarray) or isinstance(labels, np.memmap):
+        return labels
+    if max_label is None:
+        max_label = int(labels.max()) if labels.size else 0
+    return labels.astype(label_dtype(max_label), copy=False)
@@ -0,0 +1,402 @@
+import numpy as np
+
+# Rasterization of (interpolated) spline contours to labels.
+#
+# The `to_labels` of splineit's interpolated layer (like the one of
+# napari's shapes layer) draws every shape into a mask of the
+# size of the whole image (`skimage.draw.polygon2mask`), which is
+# quadratic in practice for images with many objects. Here we compute
+# the scanline intersections of the edges of all polygons at once and
+# only write the pixels inside the polygons.
+# The pixels are exactly the ones `polygon2mask` finds: skimage tests
+# each pixel center with the crossing rule of O'Rourke, ie a pixel is
+# drawn if the number of edges crossing its row to the right (or the
+# number crossing to the left) is odd or if it lies on a vertex.
+# Crossings which are (almost) on a pixel center are decided with
+# the very same floating point expression skimage uses.
+
+# vertices closer than this to a pixel center draw the pixel
+# (the tolerance of skimage)
+_VERTEX_EPS = 1e-12
+
+# crossings closer than this to a pixel center are checked with
+# the expression of skimage
+_NEAR = 1e-6
+
+
+def _edges(polygons):
+    # all edges of all polygons, each edge goes from vertex i to the
+    # previous vertex j of the same polygon (as in `point_in_polygon`
+    # of skimage)
+    n_vertices = np.array([len(p) for p in polygons], dtype=np.int64)
+    vertices = np.concatenate(
+        [np.asarray(p, dtype="float64")[:, -2:] for p in polygons]
+    )
+    obj = np.repeat(np.arange(len(polygons)), n_vertices)
+    starts = np.cumsum(n_vertices) - n_vertices
+    i = np.arange(len(vertices))
+    j = i - 1
+    j[starts] += n_vertices
+    return vertices, obj, vertices[i], vertices[j]
+
+
+def _expand(start, stop):
+    # the integers of all ranges [start, stop) and the range they belong to
+    lengths = np.maximum(stop - start, 0)
+    owner = np.repeat(np.arange(len(start)), lengths)
+    offsets = np.arange(owner.size) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    return start[owner] + offsets, owner
+
+
+def _crossing_runs(obj, p_i, p_j, first, stop, right):
+    # the runs of pixels with an odd number of crossings to their right
+    # (or left) for the rows [first, stop) each edge crosses
+    y, edge = _expand(first, stop)
+    yi, xi = p_i[edge, 0], p_i[edge, 1]
+    yj, xj = p_j[edge, 0], p_j[edge, 1]
+    x = (xj - xi) * (y - yi) / (yj - yi) + xi
+
+    # the crossing counts for the pixels c < k (right) or c >= k (left)
+    if right:
+        k = np.ceil(x)
+    else:
+        k = np.floor(x) + 1
+    n = np.round(x)
+    near = np.abs(x - n) < _NEAR
+    if np.any(near):
+        # the same expression as `point_in_polygon` of skimage
+        x0, y0 = xi[near] - n[near], yi[near] - y[near]
+        x1, y1 = xj[near] - n[near], yj[near] - y[near]
+        side = (x0 * y1 - x1 * y0) / (y1 - y0)
+        if right:
+            k[near] = np.where(side > 0, n[near] + 1, n[near])
+        else:
+            k[near] = np.where(side < 0, n[near], n[near] + 1)
+
+    # each row is crossed an even number of times, the pixels with an
+    # odd count lie between consecutive pairs of the sorted crossings
+    order = np.lexsort((k, y, obj[edge]))
+    k, y, edge = k[order], y[order], edge[order]
+    return obj[edge][0::2], y[0::2], k[0::2], k[1::2] - 1
+
+
+def _runs(polygons, window):
+    """the pixel runs of the insides of all polygons
+
+    Args:
+        polygons (List[np.ndarray]): the (K, 2) vertices of each polygon
+        window (tuple): the pixels (y0, x0, y1, x1) runs are clipped to
+
+    Returns:
+        Tuple[np.ndarray, ...]: object, row, first and last column
+            of each run
+    """
+    y0, x0, y1, x1 = window
+    vertices, obj, p_i, p_j = _edges(polygons)
+    lo = np.minimum(p_i[:, 0], p_j[:, 0])
+    hi = np.maximum(p_i[:, 0], p_j[:, 0])
+    runs = []
+
+    # crossings to the right count for the rows in [lo, hi)
+    first = np.maximum(np.ceil(lo), y0).astype(np.int64)
+    stop = np.minimum(np.ceil(hi), y1).astype(np.int64)
+    runs.append(_crossing_runs(obj, p_i, p_j, first, stop, right=True))
+
+    # crossings to the left count for the rows in (lo, hi]
+    first = np.maximum(np.floor(lo) + 1, y0).astype(np.int64)
+    stop = np.minimum(np.floor(hi) + 1, y1).astype(np.int64)
+    runs.append(_crossing_runs(obj, p_i, p_j, first, stop, right=False))
+
+    # pixels on vertices
+    center = np.round(vertices)
+    on_pixel = np.all(np.abs(vertices - center) < _VERTEX_EPS, axis=1)
+    runs.append(
+        (
+            obj[on_pixel],
+            center[on_pixel, 0],
+            center[on_pixel, 1],
+            center[on_pixel, 1],
+        )
+    )
+
+    obj, y, c0, c1 = (np.concatenate(r) for r in zip(*runs))
+    # clip to the window
+    c0 = np.maximum(c0, x0)
+    c1 = np.minimum(c1, x1 - 1)
+    keep = (y >= y0) & (y < y1) & (c0 <= c1)
+    return (
+        obj[keep],
+        y[keep].astype(np.int64),
+        c0[keep].astype(np.int64),
+        c1[keep].astype(np.int64),
+    )
+
+
+def _rank(z_index):
+    # splineit draws the shapes in the order of `argsort(z_index)`
+    rank = np.empty(len(z_index), dtype=np.int64)
+    rank[np.argsort(np.asarray(z_index, dtype=int))] = np.arange(len(z_index))
+    return rank
+
+
+def _paint(labels, polygons, rank, values, window):
+    # draw the polygons into the window (y0, x0, y1, x1) of the labels,
+    # we write the runs in the order of the rank, for overlapping
+    # objects the one written last wins
+    obj, y, c0, c1 = _runs(polygons, window)
+    order = np.argsort(rank[obj], kind="stable")
+    obj, y, c0, c1 = obj[order], y[order], c0[order], c1[order]
+    x, run = _expand(c0, c1 + 1)
+    labels[y[run] - window[0], x - window[1]] = values[obj[run]]
+
+
+def rasterize_polygons(polygons, shape, z_index=None, dtype=int):
+    """convert polygons to labels, the same as `to_labels` of the
+        interpolated layer of splineit
+
+    The polygon at index i gets the label i + 1. Overlapping polygons
+    are drawn in the order of the z-index, ie the polygon with the
+    highest z-index is on top.
+
+    Args:
+        polygons (List[np.ndarray]): the (K, 2) vertices of each polygon
+        shape (tuple): the (YX) shape of the labels
+        z_index (List[int], optional): the z-index of each polygon
+        dtype (optional): dtype of the labels
+
+    Returns:
+        np.ndarray: the labels
+    """
+    shape = tuple(int(s) for s in np.ceil(shape))
+    labels = np.zeros(shape, dtype=dtype)
+    polygons = [p for p in polygons]
+    if not polygons:
+        return labels
+    if z_index is None:
+        z_index = np.zeros(len(polygons), dtype=int)
+
+    _paint(
+        labels,
+        polygons,
+        _rank(z_index),
+        np.arange(1, len(polygons) + 1),
+        (0, 0) + shape,
+    )
+    return labels
+
+
+def labels_from_shapes(layer, shape, downsample=None):
+    """the labels of the interpolated layer of splineit, a fast
+        replacement of `layer.to_labels(labels_shape=shape)`
+
+    Args:
+        layer (Shapes): the layer
+        shape (tuple): the (YX) shape of the labels
+        downsample (array-like, optional): the (YX) downsample factors
+            of labels at a lower resolution than the shapes (ie the
+            labels of a pyramid level)
+
+    Returns:
+        np.ndarray: the labels
+    """
+    return rasterize_polygons(
+        scaled_polygons(layer.data, downsample), shape, z_index=layer.z_index
+    )
+
+
+def scaled_polygons(polygons, downsample=None):
+    """the polygons in the pixels of labels at a lower resolution
+
+    Args:
+        polygons (List[np.ndarray]): the (K, 2) vertices of each polygon
+        downsample (array-like, optional): the (YX) downsample factors
+
+    Returns:
+        List[np.ndarray]: the polygons (unchanged without downsampling)
+    """
+    if downsample is None:
+        return polygons
+    downsample = np.asarray(downsample, dtype="float64")
+    return [np.asarray(p)[:, -2:] / downsample for p in polygons]
+
+
+def _flatten(polygons):
+    # the (YX) vertices of all polygons and the number of vertices
+    # of each polygon
+    n_vertices = np.array([len(p) for p in polygons], dtype=np.int64)
+    if not polygons:
+        return np.zeros((0, 2)), n_vertices
+    vertices = np.concatenate(
+        [np.asarray(p, dtype="float64")[:, -2:] for p in polygons]
+    )
+    return vertices, n_vertices
+
+
+def _bboxes(vertices, n_vertices, shape):
+    # the pixels (y0, x0, y1, x1) each polygon can draw, clipped to the
+    # image (we add a pixel st. vertices within `_VERTEX_EPS` of a
+    # pixel center are inside)
+    if not len(n_vertices):
+        return np.zeros((0, 4), dtype=np.int64)
+    starts = np.cumsum(n_vertices) - n_vertices
+    lo = np.minimum.reduceat(vertices, starts, axis=0)
+    hi = np.maximum.reduceat(vertices, starts, axis=0)
+    lo = np.clip(np.floor(lo), 0, shape)
+    hi = np.clip(np.ceil(hi) + 1, 0, shape)
+    return np.concatenate([lo, hi], axis=1).astype(np.int64)
+
+
+class LabelsSync(object):
+    """keep labels in sync with the polygons of a layer by only
+    redrawing the objects which changed since the last sync
+
+    The changed objects are found by comparing the polygons and the
+    z-indices with the ones of the last sync, which is linear in the
+    number of vertices, and only the bounding boxes of the old and the
+    new versions of the changed objects are redrawn. The result is the
+    same as `rasterize_polygons` of all polygons (as long as
+    overlapping objects have distinct z-indices, the order of objects
+    with the same z-index is not defined).
+
+    Attributes:
+        labels (np.ndarray): the (YX) labels, updated in place
+    """
+
+    # above this fraction of changed objects we redraw everything
+    MAX_CHANGED_FRACTION = 0.25
+
+    def __init__(self, labels, polygons, z_index):
+        """
+        Args:
+            labels (np.ndarray): the labels of the polygons, ie the
+                result of `rasterize_polygons`
+            polygons (List[np.ndarray]): the (K, 2) vertices of each
+                polygon
+            z_index (List[int]): the z-index of each polygon
+        """
+        self.labels = labels
+        vertices, n_vertices = _flatten(polygons)
+        self._set_state(
+            vertices,
+            n_vertices,
+            z_index,
+            _bboxes(vertices, n_vertices, labels.shape),
+        )
+
+    def _set_state(self, vertices, n_vertices, z_index, bboxes):
+        # the concatenated vertices are a copy, the layer might
+        # change its arrays in place
+        self._vertices = vertices
+        self._n_vertices = n_vertices
+        self._starts = np.cumsum(n_vertices) - n_vertices
+        self._z_index = np.array(z_index, dtype=int).reshape(-1)
+        self._bboxes = bboxes
+
+    def _polygon(self, i):
+        # the vertices of the i-th polygon of the last sync
+        start = self._starts[i]
+        return self._vertices[start : start + self._n_vertices[i]]
+
+    def _changed(self, vertices, n_vertices, z_index):
+        # the objects which changed (for the same number of objects)
+        changed = self._z_index != z_index
+        if np.array_equal(n_vertices, self._n_vertices):
+            if len(n_vertices):
+                same = np.all(vertices == self._vertices, axis=1)
+                changed |= ~np.logical_and.reduceat(same, self._starts)
+        else:
+            starts = np.cumsum(n_vertices) - n_vertices
+            for i, (start, n) in enumerate(zip(starts, n_vertices)):
+                changed[i] |= not np.array_equal(
+                    self._polygon(i), vertices[start : start + n]
+                )
+        return np.flatnonzero(changed)
+
+    def _match(self, vertices, n_vertices):
+        # the index of each old polygon in the new ones (-1 if removed),
+        # shapes are removed anywhere and added at the end
+        matches = np.full(len(self._n_vertices), -1, dtype=np.int64)
+        starts = np.cumsum(n_vertices) - n_vertices
+        j = 0
+        for i in range(len(self._n_vertices)):
+            if j < len(n_vertices) and np.array_equal(
+                self._polygon(i),
+                vertices[starts[j] : starts[j] + n_vertices[j]],
+            ):
+                matches[i] = j
+                j += 1
+        return matches
+
+    def update(self, polygons, z_index):
+        """redraw the labels of the objects which changed
+
+        Args:
+            polygons (List[np.ndarray]): the (K, 2) vertices of each
+                polygon
+            z_index (List[int]): the z-index of each polygon
+
+        Returns:
+            int: the number of changed objects
+        """
+        polygons = [np.asarray(p, dtype="float64") for p in polygons]
+        z_index = np.array(z_index, dtype=int).reshape(-1)
+        vertices, n_vertices = _flatten(polygons)
+        bboxes = _bboxes(vertices, n_vertices, self.labels.shape)
+
+        if len(polygons) == len(self._n_vertices):
+            matches = np.arange(len(polygons))
+            changed = self._changed(vertices, n_vertices, z_index)
+        else:
+            matches = self._match(vertices, n_vertices)
+            changed = np.flatnonzero(matches < 0)
+        added = np.setdiff1d(np.arange(len(polygons)), matches)
+        n_changed = len(changed) + len(added)
+
+        if n_changed > self.MAX_CHANGED_FRACTION * max(len(polygons), 1):
+            self.labels[...] = rasterize_polygons(
+                polygons,
+                self.labels.shape,
+                z_index=z_index,
+                dtype=self.labels.dtype,
+            )
+        elif n_changed:
+            # the label of an object is its index + 1, the labels of
+            # the objects after removed ones change
+            if not np.array_equal(matches, np.arange(len(matches))):
+                lut = np.concatenate([[0], matches + 1])
+                self.labels[...] = lut[self.labels]
+
+            # the old and the new bounding boxes of all changed objects
+            windows = [self._bboxes[i] for i in changed]
+            windows += [bboxes[matches[i]] for i in changed if matches[i] >= 0]
+            windows += [bboxes[j] for j in added]
+            self._redraw(windows, polygons, z_index, bboxes)
+
+        self._set_state(vertices, n_vertices, z_index, bboxes)
+        return n_changed
+
+    def _redraw(self, windows, polygons, z_index, bboxes):
+        # redraw all objects in each window, the labels of a pixel only
+        # depend on the polygons covering it
+        rank = _rank(z_index)
+        values = np.arange(1, len(polygons) + 1)
+        for y0, x0, y1, x1 in windows:
+            if y0 >= y1 or x0 >= x1:
+                continue
+            self.labels[y0:y1, x0:x1] = 0
+            inside = np.flatnonzero(
+                (bboxes[:, 0] < y1)
+                & (bboxes[:, 2] > y0)
+                & (bboxes[:, 1] < x1)
+                & (bboxes[:, 3] > x0)
+            )
+            if len(inside):
+                _paint(
+                    self.labels[y0:y1, x0:x1],
+                    [polygons[i] for i in inside],
+                    rank[inside],
+                    values[inside],
+                    (y0, x0, y1, x1),
+                )
@@ -0,0 +1,345 @@
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from .._logging import logger
+from .labels import label_dtype
+from .splineit_io import UHLMANN_INTERPOLATOR_NAME
+
+# A compact binary container for the results (labels and splines).
+#
+# The `.splineit` json and the png labels are easy to read by other tools
+# but slow and huge for many objects, and png labels are limited to
+# uint16. The container is a compressed `.npz` with flat arrays:
+#
+#   labels      the labels in the smallest sufficient unsigned dtype
+#   points      the control points of all objects, shape (n_points, 2)
+#   n_points    the number of control points of each object
+#   z_index     the z-index of each object
+#   edge_color  the RGBA edge color of each object, shape (n_objects, 4)
+#   face_color  the RGBA face color of each object, shape (n_objects, 4)
+#   edge_width  the edge width of each object
+#   opacity     the opacity of the layer (a scalar)
+#   frame       the (ravelled) frame index of each object (for stacks)
+#   method      the interpolator as json (as in the `.splineit` format)
+#
+# Only `labels`, `points`, `n_points` and `method` are always present.
+
+RESULTS_FORMAT = "splinedist-results"
+RESULTS_VERSION = 1
+RESULTS_SUFFIX = ".npz"
+
+# the largest label a png can hold
+PNG_MAX_LABEL = np.iinfo(np.uint16).max
+
+# large labels are written in blocks of about this many bytes
+# (ie out-of-core labels are never loaded as a whole)
+CHUNK_BYTES = 64 * 2**20
+
+# the tile shape of tif labels
+TIF_TILE_SHAPE = (512, 512)
+
+
+def _row_blocks(labels, n_rows, edited_frame=None):
+    """the labels in blocks of up to `n_rows` rows of a frame (the frames
+    in C order, ie the order of `np.ndindex`)
+
+    Args:
+        labels (array-like): the labels (YX or frame axes plus YX)
+        n_rows (int): the number of rows of a block
+        edited_frame (tuple, optional): the (ravelled) index and the
+            labels of a frame which replaces the frame of `labels`
+
+    Yields:
+        np.ndarray: the blocks
+    """
+    # only the blocks are read (ie for zarr / dask labels)
+    n_y = labels.shape[-2]
+    for f, index in enumerate(np.ndindex(tuple(labels.shape[:-2]))):
+        frame = labels
+        if edited_frame is not None and edited_frame[0] == f:
+            frame, index = edited_frame[1], ()
+        for y in range(0, n_y, n_rows):
+            yield np.asarray(frame[index + (slice(y, y + n_rows),)])
+
+
+def _n_rows(labels, itemsize):
+    # the rows of a block of about `CHUNK_BYTES`
+    row_bytes = max(1, labels.shape[-1] * itemsize)
+    return max(1, CHUNK_BYTES // row_bytes)
+
+
+def max_label(labels, edited_frame=None):
+    """the largest label (computed block by block)
+
+    Args:
+        labels (array-like): the labels
+        edited_frame (tuple, optional): see `_row_blocks`
+
+    Returns:
+        int: the largest label (0 for empty labels)
+    """
+    if np.size(labels) == 0:
+        return 0
+    n_rows = _n_rows(labels, np.dtype(labels.dtype).itemsize)
+    return max(
+        int(block.max()) if block.size else 0
+        for block in _row_blocks(labels, n_rows, edited_frame)
+    )
+
+
+def _write_npy(f, labels, dtype, edited_frame=None, progress_callback=None):
+    """write labels in the `.npy` format block by block"""
+    np.lib.format.write_array_header_2_0(
+        f,
+        dict(
+            descr=np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            fortran_order=False,
+            shape=tuple(labels.shape),
+        ),
+    )
+    n_rows = _n_rows(labels, np.dtype(labels.dtype).itemsize)
+    n_total = int(np.prod(labels.shape[:-1]))
+    n_done = 0
+    for block in _row_blocks(labels, n_rows, edited_frame):
+        f.write(block.astype(dtype, copy=False).tobytes())
+        n_done += len(block)
+        if progress_callback is not None:
+            progress_callback("save labels", 100 * n_done / n_total)
+
+
+def pack_polygons(data):
+    """pack the control points of all objects into flat arrays
+
+    Args:
+        data (List[np.ndarray]): the control points of each
+            object, shape (n_points_i, 2)
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: the control points of all
+            objects (float64, shape (n_points, 2)) and the number of
+            control points of each object
+    """
+    n_points = np.array([len(polygon) for polygon in data], dtype=np.int32)
+    if len(data) == 0:
+        return np.zeros((0, 2)), n_points
+    points = np.concatenate(
+        [np.asarray(polygon, dtype=np.float64) for polygon in data]
+    )
+    return points.reshape(-1, 2), n_points
+
+
+def unpack_polygons(points, n_points):
+    """the inverse of `pack_polygons`
+
+    Returns:
+        List[np.ndarray]: the control points of each object
+    """
+    if len(n_points) == 0:
+        return []
+    return np.split(points, np.cumsum(n_points)[:-1])
+
+
+def write_results(
+    path,
+    labels,
+    data,
+    z_index=None,
+    edge_color=None,
+    face_color=None,
+    edge_width=None,
+    opacity=None,
+    frame=None,
+    interpolator_name=UHLMANN_INTERPOLATOR_NAME,
+    interpolator_args=None,
+    edited_frame=None,
+    progress_callback=None,
+):
+    """write labels and control points into a compressed `.npz`
+
+    The file can be read with `np.load` (the same layout as
+    `np.savez_compressed`), the labels are written block by block.
+
+    Args:
+        path (str|Path): the output path
+        labels (array-like): the labels (YX or frame axes plus YX)
+        data (List[np.ndarray]): the control points of all objects
+        z_index (List[int], optional): z-index of each object
+        edge_color (List, optional): edge color of each object
+        face_color (List, optional): face color of each object
+        edge_width (List[float], optional): edge width of each object
+        opacity (float, optional): opacity of the layer
+        frame (List[int], optional): the (ravelled) frame index of each
+            object when the labels are a stack
+        interpolator_name (str, optional): name of the interpolator
+        interpolator_args (dict, optional): arguments of the interpolator
+        edited_frame (tuple, optional): the (ravelled) index and the
+            labels of a frame which replaces this frame of `labels`
+        progress_callback (callable, optional): called with the name
+            and the progress (in [0,100]) while the labels are written
+
+    Returns:
+        str|Path: the output path
+    """
+    dtype = label_dtype(max_label(labels, edited_frame))
+    points, n_points = pack_polygons(data)
+    method = {"name": interpolator_name, "args": interpolator_args or {}}
+
+    arrays = dict(
+        format=np.array(RESULTS_FORMAT),
+        version=np.array(RESULTS_VERSION),
+        points=points,
+        n_points=n_points,
+        method=np.array(json.dumps(method)),
+    )
+    if z_index is not None:
+        arrays["z_index"] = np.asarray(z_index, dtype=np.int32)
+    if edge_color is not None:
+        arrays["edge_color"] = np.asarray(edge_color, dtype=np.float32)
+    if face_color is not None:
+        arrays["face_color"] = np.asarray(face_color, dtype=np.float32)
+    if edge_width is not None:
+        arrays["edge_width"] = np.asarray(edge_width, dtype=np.float32)
+    if opacity is not None:
+        arrays["opacity"] = np.array(float(opacity))
+    if frame is not None:
+        arrays["frame"] = np.asarray(frame, dtype=np.int64)
+
+    with zipfile.ZipFile(
+        path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True
+    ) as archive:
+        for key, value in arrays.items():
+            with archive.open(f"{key}.npy", "w") as f:
+                np.lib.format.write_array(f, value, allow_pickle=False)
+        with archive.open("labels.npy", "w", force_zip64=True) as f:
+            _write_npy(f, labels, dtype, edited_frame, progress_callback)
+    return path
+
+
+def read_results(path):
+    """read the results written by `write_results`
+
+    Args:
+        path (str|Path): the path of the `.npz`
+
+    Returns:
+        dict: the entries (see the top of this module) where `points`
+            and `n_points` are unpacked into `data`, the list of the
+            control points of each object. Missing optional entries
+            are None
+
+    Raises:
+        ValueError: if the file is not a results container
+    """
+    with np.load(path, allow_pickle=False) as f:
+        if "format" not in f or str(f["format"]) != RESULTS_FORMAT:
+            raise ValueError(f"`{path}` is not a splinedist results file")
+        if int(f["version"]) > RESULTS_VERSION:
+            raise ValueError(
+                f"`{path}` has version {int(f['version'])}, "
+                f"only up to {RESULTS_VERSION} is supported"
+            )
+        results = {
+            key: f[key] if key in f else None
+            for key in (
+                "labels",
+                "z_index",
+                "edge_color",
+                "face_color",
+                "edge_width",
+                "opacity",
+                "frame",
+            )
+        }
+        results["data"] = unpack_polygons(f["points"], f["n_points"])
+        results["method"] = json.loads(str(f["method"]))
+    if results["opacity"] is not None:
+        results["opacity"] = float(results["opacity"])
+    return results
+
+
+def labels_image_path(path, max_label):
+    """the path to save labels as an image: the png at `path` if the
+    labels fit into uint16, a tif next to it otherwise
+
+    Args:
+        path (str|Path): the path of the png
+        max_label (int): the largest label (see `max_label`)
+
+    Returns:
+        Path: the path
+    """
+    path = Path(path)
+    if max_label > PNG_MAX_LABEL:
+        logger.warning(
+            f"the labels go up to {max_label}, more than a png can hold, "
+            f"they are saved as tif"
+        )
+        return path.with_suffix(".tif")
+    return path
+
+
+def write_labels_image(
+    path, labels, edited_frame=None, progress_callback=None
+):
+    """save labels as png (uint16) or tif (in the smallest sufficient
+    dtype), depending on the suffix of the path (see `labels_image_path`)
+
+    Tifs are written tile by tile (ie out-of-core labels are never
+    loaded as a whole), a png holds a single 2D image.
+
+    Args:
+        path (str|Path): the output path
+        labels (array-like): the labels (YX or frame axes plus YX)
+        edited_frame (tuple, optional): the (ravelled) index and the
+            labels of a frame which replaces this frame of `labels`
+        progress_callback (callable, optional): called with the name
+            and the progress (in [0,100]) while the labels are written
+
+    Returns:
+        str|Path: the output path
+    """
+    biggest = max_label(labels, edited_frame)
+    if Path(path).suffix.lower() == ".png":
+        from skimage import io as skimage_io
+
+        if biggest > PNG_MAX_LABEL:
+            raise ValueError(f"labels up to {biggest} do not fit into a png")
+        if edited_frame is not None:
+            labels = edited_frame[1]
+        # we need to disable check_contrast, otherwise
+        # we get some false postive warnings
+        skimage_io.imsave(
+            path, np.asarray(labels).astype(np.uint16), check_contrast=False
+        )
+    else:
+        import tifffile
+
+        dtype = label_dtype(biggest)
+        tile_rows, tile_cols = TIF_TILE_SHAPE
+        n_total = int(np.prod(labels.shape[:-1]))
+
+        def tiles():
+            n_done = 0
+            for block in _row_blocks(labels, tile_rows, edited_frame):
+                block = block.astype(dtype, copy=False)
+                for x in range(0, block.shape[1], tile_cols):
+                    yield block[:, x : x + tile_cols]
+                n_done += len(block)
+                if progress_callback is not None:
+                    progress_callback("save labels", 100 * n_done / n_total)
+
+        tifffile.imwrite(
+            path,
+            tiles(),
+            shape=tuple(labels.shape),
+            dtype=dtype,
+            tile=TIF_TILE_SHAPE,
+            # ie 3 frames are not taken for rgb
+            photometric="minisblack",
+        )
+    if progress_callback is not None:
+        progress_callback("save labels", 100)
+    return path
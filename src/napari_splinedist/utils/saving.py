@@ -0,0 +1,260 @@
+from pathlib import Path
+
+import numpy as np
+
+from .rasterize import rasterize_polygons
+from .results_io import (
+    RESULTS_SUFFIX,
+    labels_image_path,
+    max_label,
+    write_labels_image,
+    write_results,
+)
+from .splineit_io import UHLMANN_INTERPOLATOR_NAME, write_splineit
+
+# Saving runs in a worker thread while the user keeps editing the
+# layers. Therefore everything we save is copied into a `ResultsSnapshot`
+# on the Qt thread first (the layers are not thread safe and might change
+# while we write). Only out-of-core labels (memmap, zarr, dask) are
+# referenced instead of copied since they might not fit into memory. The edited
+# frame is rasterized in the worker, ie the snapshot only holds its
+# polygons.
+
+
+class FrameSplines(object):
+    """the splines of a single frame (as written to a `.splineit` file)
+
+    Args:
+        data (List[np.ndarray]): the control points of each object
+        z_index (List[int], optional): z-index of each object
+        edge_color (List, optional): edge color of each object
+        face_color (List, optional): face color of each object
+        edge_width (List[float], optional): edge width of each object
+        opacity (float, optional): opacity of the layer
+        interpolator_name (str, optional): name of the interpolator
+        interpolator_args (dict, optional): arguments of the interpolator
+    """
+
+    def __init__(
+        self,
+        data,
+        z_index=None,
+        edge_color=None,
+        face_color=None,
+        edge_width=None,
+        opacity=None,
+        interpolator_name=UHLMANN_INTERPOLATOR_NAME,
+        interpolator_args=None,
+    ):
+        self.data = [np.array(polygon) for polygon in data]
+        if z_index is None:
+            z_index = range(len(self.data))
+        self.z_index = [int(z) for z in z_index]
+        self.edge_color = _copy_list(edge_color)
+        self.face_color = _copy_list(face_color)
+        self.edge_width = _copy_list(edge_width)
+        self.opacity = None if opacity is None else float(opacity)
+        self.interpolator_name = interpolator_name
+        self.interpolator_args = dict(interpolator_args or {})
+
+    def __len__(self):
+        return len(self.data)
+
+    def write_splineit(self, path, progress_callback=None):
+        """write the splines in the `.splineit` format
+
+        Args:
+            path (str|Path): the output path
+            progress_callback (callable, optional): see `write_splineit`
+
+        Returns:
+            str|Path: the output path
+        """
+        return write_splineit(
+            path,
+            data=self.data,
+            interpolator_name=self.interpolator_name,
+            interpolator_args=self.interpolator_args,
+            z_index=self.z_index,
+            edge_color=self.edge_color,
+            face_color=self.face_color,
+            edge_width=self.edge_width,
+            opacity=self.opacity,
+            progress_callback=progress_callback,
+        )
+
+
+def _copy_list(values):
+    if values is None:
+        return None
+    return [np.array(value) for value in values]
+
+
+class ResultsSnapshot(object):
+    """a copy of the results to save them in a worker thread
+
+    Args:
+        labels (array-like): the labels (YX or frame axes plus YX).
+            In-memory labels are copied, out-of-core labels (memmap,
+            zarr, dask) are referenced
+        splines (List[FrameSplines]): the splines of each frame
+            (a single entry for 2D images)
+        frame_shape (tuple, optional): the shape of the frame axes
+            (empty for 2D images)
+        edited_frame (tuple, optional): the index (along the frame
+            axes) of the frame whose labels are rasterized from the
+            `edited_polygons` instead of taken from `labels`
+        edited_polygons (List[np.ndarray], optional): the (interpolated)
+            polygons of the edited frame, in the pixels of the labels
+        edited_z_index (List[int], optional): z-index of each polygon
+    """
+
+    def __init__(
+        self,
+        labels,
+        splines,
+        frame_shape=(),
+        edited_frame=None,
+        edited_polygons=None,
+        edited_z_index=None,
+    ):
+        if isinstance(labels, np.ndarray) and not isinstance(
+            labels, np.memmap
+        ):
+            labels = np.array(labels)
+        self.labels = labels
+        self.splines = list(splines)
+        self.frame_shape = tuple(frame_shape)
+        self.edited_frame = edited_frame
+        if edited_frame is not None:
+            edited_polygons = [np.array(p) for p in edited_polygons]
+            edited_z_index = list(edited_z_index)
+        self.edited_polygons = edited_polygons
+        self.edited_z_index = edited_z_index
+
+    @property
+    def is_out_of_core(self):
+        """bool: are the labels referenced instead of copied?"""
+        return not isinstance(self.labels, np.ndarray) or isinstance(
+            self.labels, np.memmap
+        )
+
+    def edited_labels(self):
+        """rasterize the polygons of the edited frame
+
+        Returns:
+            tuple: the (ravelled) index of the edited frame and its
+                labels, `None` if no frame was edited (the
+                `edited_frame` argument of `write_results`)
+        """
+        if self.edited_frame is None:
+            return None
+        labels = rasterize_polygons(
+            self.edited_polygons,
+            self.labels.shape[-2:],
+            z_index=self.edited_z_index,
+        )
+        if not self.frame_shape:
+            return 0, labels
+        return (
+            np.ravel_multi_index(self.edited_frame, self.frame_shape),
+            labels,
+        )
+
+
+def save_results(snapshot, path, progress_callback=None):
+    """save a snapshot of the results, depending on the suffix of `path`:
+
+        * `.npz`: the labels and the splines of all frames in a single
+          file (see `write_results`)
+        * otherwise, 2D: the splines as `.splineit` and the labels as
+          png (tif if they do not fit into uint16) next to it
+        * otherwise, stacks: the splines of each frame as
+          `<stem>_<frame index>.splineit` and the labels as `<stem>.tif`
+
+    Args:
+        snapshot (ResultsSnapshot): the results
+        path (str|Path): the path selected by the user
+        progress_callback (callable, optional): called with the name
+            and the progress (in [0,100]) while saving
+
+    Returns:
+        List[Path]: the paths of the written files
+    """
+    path = Path(path)
+    edited = snapshot.edited_labels()
+
+    if path.suffix == RESULTS_SUFFIX:
+        splines = snapshot.splines
+        data = [polygon for frame in splines for polygon in frame.data]
+
+        def concatenated(attribute):
+            values = [getattr(frame, attribute) for frame in splines]
+            if any(v is None for v in values):
+                return None
+            return [value for v in values for value in v]
+
+        # all frames are shown with the same interpolator
+        first = splines[0] if splines else FrameSplines([])
+        frame = None
+        if snapshot.frame_shape:
+            frame = np.repeat(
+                np.arange(len(splines)), [len(s) for s in splines]
+            )
+        write_results(
+            path,
+            labels=snapshot.labels,
+            data=data,
+            z_index=concatenated("z_index"),
+            edge_color=concatenated("edge_color"),
+            face_color=concatenated("face_color"),
+            edge_width=concatenated("edge_width"),
+            opacity=first.opacity,
+            frame=frame,
+            interpolator_name=first.interpolator_name,
+            interpolator_args=first.interpolator_args,
+            edited_frame=edited,
+            progress_callback=progress_callback,
+        )
+        return [path]
+
+    stem = str(path)
+    if stem.endswith(".splineit"):
+        stem = stem[: -len(".splineit")]
+    if snapshot.frame_shape:
+        paths = []
+        for index, splines in zip(
+            np.ndindex(snapshot.frame_shape), snapshot.splines
+        ):
+            paths.append(
+                splines.write_splineit(
+                    Path(f"{stem}_{'_'.join(map(str, index))}.splineit")
+                )
+            )
+            if progress_callback is not None:
+                progress_callback(
+                    "save splines", 100 * len(paths) / len(snapshot.splines)
+                )
+        # tif can hold the labels of all frames without a wrap around
+        labels_path = Path(f"{stem}.tif")
+    else:
+        paths = [
+            snapshot.splines[0].write_splineit(
+                path,
+                progress_callback=progress_callback,
+            )
+        ]
+        # the labels are saved as uint16 png (st. we can save
+        # labels which are bigger that 255), labels which do
+        # not fit into uint16 are saved as tif
+        labels_path = labels_image_path(
+            f"{stem}.png", max_label(snapshot.labels, edited)
+        )
+
+    write_labels_image(
+        labels_path,
+        snapshot.labels,
+        edited_frame=edited,
+        progress_callback=progress_callback,
+    )
+    return paths + [labels_path]
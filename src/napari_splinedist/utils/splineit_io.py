@@ -0,0 +1,93 @@
+import json
+
+# name of the interpolator splinedist results are
+# shown with (see `SplineDistWidget._interpolator_factory`)
+UHLMANN_INTERPOLATOR_NAME = "UhlmannSplines"
+
+# the progress is reported after every `PROGRESS_EVERY` objects
+PROGRESS_EVERY = 1000
+
+
+def write_splineit(
+    path,
+    data,
+    interpolator_name=UHLMANN_INTERPOLATOR_NAME,
+    interpolator_args=None,
+    z_index=None,
+    edge_color=None,
+    face_color=None,
+    edge_width=None,
+    opacity=None,
+    progress_callback=None,
+):
+    """write control points in the `.splineit` format.
+
+        This writes the same json as `napari_splineit._writer.write_splineit`
+        but does not need an interpolator instance. Importing `napari_splineit`
+        pulls in napari and Qt which we want to avoid in headless code paths.
+        The objects are written one by one, ie the json of all objects
+        is never held in memory.
+
+    Args:
+        path (str|Path): the output path
+        data (List[np.ndarray]): the control points of all objects
+        interpolator_name (str, optional): name of the interpolator
+        interpolator_args (dict, optional): arguments of the interpolator
+        z_index (List[int], optional): z-index of each object
+        edge_color (List, optional): edge color of each object
+        face_color (List, optional): face color of each object
+        edge_width (List[float], optional): edge width of each object
+        opacity (float, optional): opacity of the layer
+        progress_callback (callable, optional): called with the name
+            and the progress (in [0,100]) while the objects are written
+
+    Returns:
+        str|Path: the output path
+    """
+
+    def array2list(coordinates):
+        return [[float(c) for c in coord] for coord in coordinates]
+
+    if interpolator_args is None:
+        interpolator_args = dict()
+
+    json_dict = {
+        "method": {"name": interpolator_name, "args": interpolator_args},
+    }
+
+    if z_index is not None:
+        json_dict["z_index"] = [int(z) for z in z_index]
+
+    if edge_color is not None:
+        json_dict["edge_color"] = [
+            [float(c) for c in color] for color in edge_color
+        ]
+
+    if face_color is not None:
+        json_dict["face_color"] = [
+            [float(c) for c in color] for color in face_color
+        ]
+
+    if edge_width is not None:
+        json_dict["edge_width"] = [float(w) for w in edge_width]
+
+    if opacity is not None:
+        json_dict["opacity"] = float(opacity)
+
+    with open(path, "w") as f:
+        # the same layout as `json.dump(..., indent=4)` but
+        # with one line per object
+        f.write('{\n    "data": [')
+        for i, polygon in enumerate(data):
+            f.write(",\n        " if i else "\n        ")
+            f.write(json.dumps(array2list(polygon)))
+            if progress_callback is not None and (i + 1) % PROGRESS_EVERY == 0:
+                progress_callback("save splines", 100 * (i + 1) / len(data))
+        f.write("\n    ]" if len(data) else "]")
+        for key, value in json_dict.items():
+            f.write(f',\n    "{key}": {json.dumps(value)}')
+        f.write("\n}\n")
+    if progress_callback is not None:
+        progress_callback("save splines", 100)
+
+    return path
@@ -0,0 +1,88 @@
+import functools
+
+import numpy as np
+
+# Qt-free helpers for the Uhlmann (cubic B-spline) representation
+# splinedist predicts. They mirror the functions in
+# `napari_splineit.interpolation.uhlmann`, but importing
+# `napari_splineit` pulls in napari and Qt, which we want to
+# avoid in headless code paths (ie batch prediction)
+
+
+def _wrap_index(t, k, M, half_support=2):
+    # same as `napari_splineit.interpolation.utils.wrapIndex`
+    wrapped_t = t - k
+    t_left = t - half_support
+    t_right = t + half_support
+    if k < t_left:
+        if t_left <= k + M <= t_right:
+            wrapped_t = t - (k + M)
+    elif k > t + half_support:
+        if t_left <= k - M <= t_right:
+            wrapped_t = t - (k - M)
+    return wrapped_t
+
+
+def _b3(x):
+    # the cubic B-spline basis function
+    x = abs(x)
+    if x < 1:
+        return 2.0 / 3.0 - x**2 + x**3 / 2.0
+    elif x <= 2:
+        return ((2.0 - x) ** 3) / 6.0
+    return 0.0
+
+
+@functools.lru_cache(maxsize=32)
+def knots_phi(M):
+    """the (M, M) matrix which maps spline coefficients to knots
+        (ie the points on the spline at the integer positions)
+
+    Args:
+        M (int): number of control points
+
+    Returns:
+        np.ndarray: float32 matrix of shape (M, M)
+    """
+    phi = np.array(
+        [[_b3(_wrap_index(t, k, M)) for k in range(M)] for t in range(M)],
+        dtype="float32",
+    )
+    # the result is cached, so we make sure it is never changed inplace
+    phi.setflags(write=False)
+    return phi
+
+
+def knots_from_coefs(coefs):
+    """convert the spline coefficients of a single object to knots
+
+    Args:
+        coefs (np.ndarray): coefficients with shape (M, 2)
+
+    Returns:
+        np.ndarray: knots with shape (M, 2)
+    """
+    return np.matmul(knots_phi(coefs.shape[0]), coefs)
+
+
+def knots_from_coefs_batched(coefs, offset=None):
+    """convert the spline coefficients of many objects to knots at once
+
+    The same as calling `knots_from_coefs` for each object, but
+    with a single (batched) matrix multiplication.
+
+    Args:
+        coefs (np.ndarray): coefficients with shape (N, 2, M)
+            (as splinedist returns them)
+        offset (array-like, optional): (2,) offset added to all knots
+
+    Returns:
+        np.ndarray: knots with shape (N, M, 2)
+    """
+    coefs = np.asarray(coefs)
+    # (N, 2, M) -> (N, M, 2) st. we can use the same matrix as for
+    # a single object
+    knots = np.matmul(knots_phi(coefs.shape[2]), coefs.transpose(0, 2, 1))
+    if offset is not None:
+        knots = knots + np.asarray(offset)
+    return knots
@@ -0,0 +1,28 @@
+import time
+
+
+class Throttle(object):
+    """limits how often something is done, ie showing the partial
+    results of a running prediction (each update of the layers
+    blocks the Qt event loop for a moment)
+
+    Args:
+        interval (float): the minimal time between two
+            updates (in seconds)
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = None
+
+    def __call__(self):
+        """should we update now? (the first call is always true)
+
+        Returns:
+            bool: true if the interval passed since the last update
+        """
+        now = time.monotonic()
+        if self._last is not None and now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
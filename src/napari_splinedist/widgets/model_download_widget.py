@@ -1,4 +1,4 @@
-import zipfile
+import threading
 from pathlib import Path
 
 from napari.qt.threading import GeneratorWorker as NapariGeneratorWorker
@@ -14,7 +14,11 @@ from qtpy.QtWidgets import (
     QWidget,
 )
 
-from ..utils.download_file import download_file
+from ..model.resolve import (
+    download_model,
+    model_path_from_source,
+    prefetch_models,
+)
 
 
 class DownloadWorker(NapariGeneratorWorker):
@@ -38,6 +42,8 @@ class ModelDownloadWidget(QWidget):
         self._download_dir = Path(download_dir)
         self._download_dir.mkdir(parents=True, exist_ok=True)
         self.worker = None
+        # set to cancel a running prefetch (see `_start_prefetch`)
+        self._prefetch_cancelled = None
 
         self._init_ui()
         self._connect_events()
@@ -68,6 +74,10 @@ class ModelDownloadWidget(QWidget):
         self._progress_widget = QProgressBar()
         self._cancel_button = QPushButton("cancel")
         self._restart_button = QPushButton("restart")
+        self._prefetch_button = QPushButton("prefetch all")
+        self._prefetch_button.setToolTip(
+            "download all models (with all numbers of control points)"
+        )
         self._cancel_button.setEnabled(False)
         self._restart_button.setEnabled(False)
         self._sample_image_label = QLabel()
@@ -78,7 +88,8 @@ class ModelDownloadWidget(QWidget):
         self.layout().addWidget(self._progress_widget, 1, 0, 1, 2)
         self.layout().addWidget(self._cancel_button, 2, 0)
         self.layout().addWidget(self._restart_button, 2, 1)
-        self.layout().addWidget(self._sample_image_label, 3, 0, 1, 2)
+        self.layout().addWidget(self._prefetch_button, 3, 0, 1, 2)
+        self.layout().addWidget(self._sample_image_label, 4, 0, 1, 2)
 
         if self._models_meta is not None:
             names = [meta["name"] for meta in self._models_meta]
@@ -107,7 +118,13 @@ class ModelDownloadWidget(QWidget):
         )
 
         def kill_worker():
-            self.worker.quit()
+            if self._prefetch_cancelled is not None:
+                # the prefetch stops its download threads and
+                # finishes once they are done
+                self._prefetch_cancelled.set()
+                self._cancel_button.setEnabled(False)
+            else:
+                self.worker.quit()
 
         self._cancel_button.clicked.connect(kill_worker)
 
@@ -115,6 +132,7 @@ class ModelDownloadWidget(QWidget):
             self._on_model_changed()
 
         self._restart_button.clicked.connect(restart_dl)
+        self._prefetch_button.clicked.connect(self._on_prefetch)
 
     def _on_model_name_changed(self, index):
         with QSignalBlocker(self._n_ctrl_points_combo_box):
@@ -141,6 +159,8 @@ class ModelDownloadWidget(QWidget):
         self._cancel_button.setEnabled(False)
 
     def _on_worker_errored(self, e):
+        # a failed download continues where it stopped on restart
+        self._restart_button.setEnabled(True)
         raise e
 
     def _on_worker_yielded_results(self, path):
@@ -169,15 +189,65 @@ class ModelDownloadWidget(QWidget):
         self._progress_widget.setValue(int(p))
         self.progress.emit(p)
 
+    def _on_prefetch(self):
+        # the download of the selected model is part of the prefetch,
+        # ie we stop it first (it continues where it stopped)
+        if self.worker is not None and self.worker.is_running:
+            self.worker.finished.connect(self._start_prefetch)
+            self.worker.quit()
+        else:
+            self._start_prefetch()
+
+    def _start_prefetch(self):
+        self.model_availablity_changed.emit(False)
+        self._name_combo_box.setEnabled(False)
+        self._n_ctrl_points_combo_box.setEnabled(False)
+        self._restart_button.setEnabled(False)
+        self._prefetch_button.setEnabled(False)
+        self._cancel_button.setEnabled(True)
+        self._progress_widget.setValue(0)
+        cancelled = threading.Event()
+        self._prefetch_cancelled = cancelled
+
+        @thread_worker(worker_class=DownloadWorker, start_thread=False)
+        def prefetch_function(models_meta):
+            # called from the download threads, ie this has to
+            # report to this worker (and not to `self.worker`)
+            def status(progress, n_models, n_done):
+                worker.extra_signals.progress.emit(progress, n_models, n_done)
+
+            for _ in prefetch_models(
+                models_meta, self._download_dir, status, cancelled=cancelled
+            ):
+                yield
+
+        worker = prefetch_function(self._models_meta)
+        self.worker = worker
+        worker.finished.connect(self._on_prefetch_finished)
+        worker.errored.connect(self._on_worker_errored)
+        worker.extra_signals.progress.connect(self._on_worker_progress)
+        # napari does not close the generator of an aborted (or deleted)
+        # worker, ie the download threads would continue
+        worker.aborted.connect(cancelled.set)
+        worker.finished.connect(cancelled.set)
+        worker.start()
+
+    def _on_prefetch_finished(self):
+        self._prefetch_button.setEnabled(True)
+        cancelled = self._prefetch_cancelled.is_set()
+        self._prefetch_cancelled = None
+        if cancelled or self.worker.abort_requested:
+            self._restart_button.setEnabled(True)
+            self._on_worker_finished()
+        else:
+            # the selected model is ready now (or is downloaded
+            # again if its download failed)
+            self._on_model_changed()
+
     def _current_model_path(self):
-        source = self._current_source()
-        source_type = source.source_type
-        if source_type == "url":
-            name = f"{self.getModelMeta().name}_{self._n_ctrl_points()}"
-            path = self._download_dir / name
-            return path
-        elif source_type == "path":
-            return source.source
+        return model_path_from_source(
+            self.getModelMeta(), self._current_source(), self._download_dir
+        )
 
     def _on_model_changed(self):
 
@@ -191,44 +261,27 @@ class ModelDownloadWidget(QWidget):
         self._sample_image_label.clear()
 
         @thread_worker(worker_class=DownloadWorker, start_thread=False)
-        def work_function(source):
-
-            if source.source_type == "url":
-                base_name = (
-                    f"{self.getModelMeta().name}_{self._n_ctrl_points()}"
-                )
-                name = f"{base_name}.zip"
-                zip_path = self._download_dir / name
-                unzipped_path = self._download_dir / base_name
-
-                if unzipped_path.exists():
-                    self._on_worker_progress(100)
-                    self.worker.extra_signals.resulted.emit(unzipped_path)
-                else:
-
-                    def status(progress, total, downloaded):
-                        self.worker.extra_signals.progress.emit(
-                            progress, total, downloaded
-                        )
-
-                    # the empty yield allows us to cancel the download
-                    for _ in download_file(source.source, zip_path, status):
-                        yield
-
-                    with zipfile.ZipFile(zip_path, "r") as zip_ref:
-                        zip_ref.extractall(self._download_dir)
-
-                    # yield unzipped_path
-                    self.worker.extra_signals.resulted.emit(unzipped_path)
-            elif source.source_type == "path":
+        def work_function(model_meta, source):
+
+            model_path = model_path_from_source(
+                model_meta, source, self._download_dir
+            )
+            if model_path.exists():
                 self._on_worker_progress(100)
-                if not Path(source.source).exists():
-                    raise FileNotFoundError(
-                        f"source directory `{source.source}` does not exist"
-                    )
-                self.worker.extra_signals.resulted.emit(source.source)
 
-        self.worker = work_function(self._current_source())
+            def status(progress, total, downloaded):
+                worker.extra_signals.progress.emit(progress, total, downloaded)
+
+            # the empty yield allows us to cancel the download
+            for _ in download_model(
+                model_meta, source, self._download_dir, status
+            ):
+                yield
+
+            worker.extra_signals.resulted.emit(model_path)
+
+        worker = work_function(self.getModelMeta(), self._current_source())
+        self.worker = worker
         self.worker.started.connect(self._on_worker_started)
         self.worker.finished.connect(self._on_worker_finished)
         self.worker.errored.connect(self._on_worker_errored)
@@ -1,7 +1,21 @@
+import time
+
 from qtpy.QtWidgets import QLabel, QProgressBar, QVBoxLayout, QWidget
 
 
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
 class ProgressWidget(QWidget):
+    # the remaining time is only shown once a step
+    # ran for a moment (the first tiles are not representative)
+    ETA_MIN_ELAPSED = 1.0
+
     def __init__(self, parent=None):
         super().__init__(parent=parent)
         self.label = QLabel("Status:")
@@ -13,6 +27,47 @@ class ProgressWidget(QWidget):
         self.layout.addWidget(self.pbar)
         self.setLayout(self.layout)
 
+        # the step we estimate the remaining time for
+        self._step = None
+        self._step_start = None
+        self._start_progress = 0
+        self._step_progress = 0
+
+    def eta(self, text, progress):
+        """the estimated remaining time of a step (assuming the
+        progress of the step grows linearly with the time)
+
+        The first report of a step usually arrives when its first
+        tile is done, the time of this tile is not known. The rate is
+        therefore estimated from the progress since the first report.
+
+        Args:
+            text (str): the name of the step
+            progress (int/float): the progress in range [0,100]
+
+        Returns:
+            float: the remaining seconds (None if not known yet)
+        """
+        now = time.perf_counter()
+        # a new step starts when the name changes or the progress
+        # goes back (ie for each frame / run)
+        if text != self._step or progress < self._step_progress:
+            self._step = text
+            self._step_start = now
+            self._start_progress = progress
+        self._step_progress = progress
+
+        elapsed = now - self._step_start
+        if progress <= self._start_progress or progress >= 100:
+            return None
+        if elapsed < self.ETA_MIN_ELAPSED:
+            return None
+        return elapsed * (100 - progress) / (progress - self._start_progress)
+
     def setProgress(self, text, progress):
-        self.label.setText(f"Status: {text}")
+        eta = self.eta(text, progress)
+        if eta is None:
+            self.label.setText(f"Status: {text}")
+        else:
+            self.label.setText(f"Status: {text} (ETA {_format_seconds(eta)})")
         self.pbar.setValue(progress)